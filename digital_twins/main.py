@@ -10,15 +10,15 @@ import websockets
 import logging
 from pathlib import Path
 
-from mdp_dp_rl.processes.mdp import MDP
-
 from digital_twins.Devices.base import Event, EventType
 from digital_twins.Devices.utils import service_from_json, target_from_json
 from digital_twins.target_simulator import TargetSimulator
 from digital_twins.things_api import config_from_json, ThingsAPI
 from digital_twins.wrappers import AbstractServiceWrapper
-from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.compiled_policy import CompiledPolicy
 from stochastic_service_composition.services import Service
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
 from stochastic_service_composition.target import Target
 
 
@@ -86,13 +86,15 @@ async def main(config: str, timeout: int):
         old_policy = None
         while True:
 
-            mdp: MDP = composition_mdp(target, *services)
-            orchestrator_policy = mdp.get_optimal_policy()
+            mdp: SparseMDP = composition_sparse_mdp(target, *services)
+            orchestrator_policy = solve(mdp)
             # detect when policy changes
             if old_policy is None:
                 old_policy = orchestrator_policy
+                compiled_policy = CompiledPolicy.from_policy(orchestrator_policy)
             if old_policy.policy_data != orchestrator_policy.policy_data:
                 print(f"Optimal Policy has changed!\nold_policy = {old_policy}\nnew_policy={orchestrator_policy}")
+                compiled_policy = CompiledPolicy.from_policy(orchestrator_policy)
             old_policy = orchestrator_policy
 
             # waiting for target action
@@ -112,7 +114,7 @@ async def main(config: str, timeout: int):
             print(f"Iteration: {iteration}, target action: {target_action}")
             current_state = (tuple(system_state), current_target_state, target_action)
 
-            orchestrator_choice = orchestrator_policy.get_action_for_state(current_state)
+            orchestrator_choice = compiled_policy.get_action_for_state(current_state)
             if orchestrator_choice == "undefined":
                 print(f"Execution failed: no service can execute {target_action} in system state {system_state}")
                 break
@@ -0,0 +1,264 @@
+"""
+Precomputed policy atlas over the lattice of degradation levels.
+
+A breakable service (see BreakableServiceWrapper) degrades in fixed steps:
+every execution from the "available" state increases the broken probability
+by the degradation probability, up to the maximum broken probability, and
+decreases the reward by the degradation cost. Hence, the transition functions
+observed online are the ones at degradation level k = 0, 1, 2, ... of every
+service, and the problem is determined by the vector of the degradation levels.
+
+The atlas solves, offline, the composition at every point (or at a random
+sample of the points) of this lattice, deduplicates the identical policies,
+and stores them compiled; online, the policy of the current degradation
+vector is looked up instead of being computed.
+
+Since the reward keeps decreasing also after the broken probability is
+capped, the lattice is truncated at max_level; for degradation vectors
+outside of the atlas, the lookup fails and the policy must be computed. The
+lattice grows exponentially with the number of services: above max_points
+points, the atlas is refused, and max_level or nb_samples must be set.
+"""
+import pickle  # nosec
+import random
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from digital_twins.constants import DEFAULT_MAX_BROKEN_PROB as MAX_BROKEN_PROB
+from digital_twins.wrappers import BreakableServiceWrapper
+from stochastic_service_composition.cache import canonical_key
+from stochastic_service_composition.compiled_policy import CompiledPolicy
+from stochastic_service_composition.composition import DEFAULT_GAMMA
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import MDPDynamics
+
+DegradationVector = Tuple[int, ...]
+DEFAULT_MAX_POINTS = 10_000
+
+# the context of the worker processes, set by the pool initializer
+_worker_context: Dict[str, Any] = {}
+
+
+class PolicyAtlas:
+    """A table from degradation vectors to (compiled) orchestrator policies."""
+
+    def __init__(
+        self,
+        levels: Sequence[Sequence[MDPDynamics]],
+        policies: Sequence[CompiledPolicy],
+        policy_ids: Dict[DegradationVector, int],
+    ):
+        """
+        Initialize the atlas.
+
+        :param levels: for every service, its transition function at every degradation level
+        :param policies: the distinct policies
+        :param policy_ids: the index of the policy of every degradation vector of the atlas
+        """
+        self.levels = [list(service_levels) for service_levels in levels]
+        self.policies = list(policies)
+        self.policy_ids = policy_ids
+        self._level_ids = [
+            {
+                canonical_key(transition_function): level
+                for level, transition_function in enumerate(service_levels)
+            }
+            for service_levels in self.levels
+        ]
+
+    @property
+    def nb_points(self) -> int:
+        """Get the number of degradation vectors in the atlas."""
+        return len(self.policy_ids)
+
+    def get_degradation_vector(
+        self, transition_functions: Sequence[MDPDynamics]
+    ) -> Optional[DegradationVector]:
+        """
+        Get the degradation vector of the current transition functions of the services.
+
+        :param transition_functions: the current transition function of every service
+        :return: the degradation vector, or None if some transition function is not in the lattice
+        """
+        vector = []
+        for level_ids, transition_function in zip(
+            self._level_ids, transition_functions
+        ):
+            level = level_ids.get(canonical_key(transition_function))
+            if level is None:
+                return None
+            vector.append(level)
+        return tuple(vector)
+
+    def get_policy(
+        self, transition_functions: Sequence[MDPDynamics]
+    ) -> Optional[CompiledPolicy]:
+        """
+        Look up the policy for the current transition functions of the services.
+
+        :param transition_functions: the current transition function of every service
+        :return: the compiled policy, or None if the degradation vector is not in the atlas
+        """
+        vector = self.get_degradation_vector(transition_functions)
+        policy_id = self.policy_ids.get(vector) if vector is not None else None
+        return self.policies[policy_id] if policy_id is not None else None
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Save the atlas to a file."""
+        Path(path).write_bytes(
+            pickle.dumps(
+                (self.levels, self.policies, self.policy_ids),
+                pickle.HIGHEST_PROTOCOL,
+            )
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "PolicyAtlas":
+        """Load an atlas from a file."""
+        levels, policies, policy_ids = pickle.loads(Path(path).read_bytes())  # nosec
+        return cls(levels, policies, policy_ids)
+
+
+def degradation_levels(
+    service: Service, max_level: Optional[int] = None
+) -> List[MDPDynamics]:
+    """
+    Get the transition functions of a service at every degradation level.
+
+    The levels are computed by replaying the updates of BreakableServiceWrapper,
+    so that they are equal to the ones observed online. Services that are not
+    breakable have only one level.
+
+    :param service: the service, with its initial transition function
+    :param max_level: the maximum degradation level (default: the first level with capped broken probability)
+    :return: the transition function at every level
+    """
+    try:
+        wrapper = BreakableServiceWrapper(service)
+    except AssertionError:
+        return [service.transition_function]
+    available_state = BreakableServiceWrapper.AVAILABLE_STATE_NAME
+    broken_state = BreakableServiceWrapper.BROKEN_STATE_NAME
+    (action,) = service.transition_function[available_state]
+
+    levels = [wrapper.current_transition_function]
+    while max_level is None or len(levels) <= max_level:
+        next_state_dist, _reward = levels[-1][available_state][action]
+        if max_level is None and next_state_dist[broken_state] >= MAX_BROKEN_PROB:
+            break
+        wrapper.update(available_state, action)
+        levels.append(wrapper.current_transition_function)
+    return levels
+
+
+def build_policy_atlas(
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    max_level: Optional[int] = None,
+    nb_samples: Optional[int] = None,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> PolicyAtlas:
+    """
+    Build the policy atlas, solving the lattice points in parallel.
+
+    :param target: the target service.
+    :param services: the community of services, with their initial transition functions.
+    :param gamma: the discount factor.
+    :param max_level: the maximum degradation level of every service (see degradation_levels).
+    :param nb_samples: the number of lattice points to solve (default: all of them);
+      the non-degraded point is always included.
+    :param seed: the seed of the sampling of lattice points.
+    :param max_workers: the maximum number of worker processes (default: the number of CPUs)
+    :param max_points: the maximum number of lattice points to solve.
+    :return: the policy atlas.
+    :raises ValueError: if more than max_points points should be solved; set max_level or nb_samples.
+    """
+    levels = [degradation_levels(service, max_level) for service in services]
+    radices = [len(service_levels) for service_levels in levels]
+    nb_points = 1
+    for radix in radices:
+        nb_points *= radix
+    if nb_samples is None or nb_samples >= nb_points:
+        indexes: Sequence[int] = range(nb_points)
+    else:
+        # sample the indexes of the points, without enumerating the lattice
+        indexes = [
+            0,
+            *random.Random(seed).sample(range(1, nb_points), max(nb_samples - 1, 0)),
+        ]
+    if len(indexes) > max_points:
+        raise ValueError(
+            f"the lattice of the radices {radices} has {nb_points} points, "
+            f"more than {max_points}: set max_level or nb_samples"
+        )
+    points = [_unravel(index, radices) for index in indexes]
+
+    policies: List[CompiledPolicy] = []
+    policy_ids: Dict[DegradationVector, int] = {}
+    known_policies: Dict[Tuple, int] = {}
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_initialize_worker,
+        initargs=(target, services, levels, gamma),
+    ) as executor:
+        for point, policy in zip(points, executor.map(_solve_point, points)):
+            # identical policies are stored only once
+            key = (
+                repr(policy.domains),
+                policy.keys.tobytes(),
+                policy.actions.tobytes(),
+            )
+            if key not in known_policies:
+                known_policies[key] = len(policies)
+                policies.append(policy)
+            policy_ids[point] = known_policies[key]
+    return PolicyAtlas(levels, policies, policy_ids)
+
+
+def _unravel(index: int, radices: Sequence[int]) -> DegradationVector:
+    """Get the point of the lattice with a given (row-major) index."""
+    point = []
+    for radix in reversed(radices):
+        index, level = divmod(index, radix)
+        point.append(level)
+    return tuple(reversed(point))
+
+
+def _initialize_worker(
+    target: Target,
+    services: Sequence[Service],
+    levels: Sequence[Sequence[MDPDynamics]],
+    gamma: float,
+) -> None:
+    """Initialize the context of a worker process."""
+    _worker_context["target"] = target
+    _worker_context["services"] = services
+    _worker_context["levels"] = levels
+    _worker_context["gamma"] = gamma
+
+
+def _solve_point(point: DegradationVector) -> CompiledPolicy:
+    """Solve the composition at a point of the lattice, in a worker process."""
+    services = [
+        Service(
+            service.states,
+            service.actions,
+            service.final_states,
+            service.initial_state,
+            service_levels[level],
+        )
+        for service, service_levels, level in zip(
+            _worker_context["services"], _worker_context["levels"], point
+        )
+    ]
+    mdp = composition_sparse_mdp(
+        _worker_context["target"], *services, gamma=_worker_context["gamma"]
+    )
+    return CompiledPolicy.from_policy(solve(mdp))
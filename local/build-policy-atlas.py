@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import json
+from pathlib import Path
+
+import click
+
+from digital_twins.policy_atlas import DEFAULT_MAX_POINTS, build_policy_atlas
+from local.launch_devices import DEVICES, TARGET
+from local.things_api.data import ServiceInstance, TargetInstance
+from local.things_api.helpers import setup_logger
+
+logger = setup_logger("policy-atlas")
+
+
+@click.command()
+@click.option("--config-dir", type=click.Path(exists=True, file_okay=False), default=str(Path("things_api", "services")))
+@click.option("--output", type=click.Path(dir_okay=False), default="policy_atlas.pkl")
+@click.option("--max-level", type=int, default=None, help="Maximum degradation level of every service.")
+@click.option("--nb-samples", type=int, default=None, help="Number of sampled degradation vectors (default: all).")
+@click.option("--seed", type=int, default=None)
+@click.option("--max-workers", type=int, default=None)
+@click.option("--max-points", type=int, default=DEFAULT_MAX_POINTS, help="Maximum number of degradation vectors.")
+def main(config_dir, output, max_level, nb_samples, seed, max_workers, max_points):
+    """Build the policy atlas of the services and of the target of the configuration directory."""
+    config_dir = Path(config_dir)
+    services = [ServiceInstance.from_json(json.loads((config_dir / device).read_text())) for device in DEVICES]
+    # same order of the orchestrator
+    services = sorted(services, key=lambda x: x.service_id)
+    target = TargetInstance.from_json(json.loads((config_dir / TARGET).read_text()))
+
+    logger.info(f"Building the policy atlas of {len(services)} services...")
+    atlas = build_policy_atlas(
+        target.target_spec,
+        *[service.service_spec for service in services],
+        max_level=max_level,
+        nb_samples=nb_samples,
+        seed=seed,
+        max_workers=max_workers,
+        max_points=max_points,
+    )
+    logger.info(f"Solved {atlas.nb_points} degradation vectors, {len(atlas.policies)} distinct policies")
+    atlas.save(output)
+    logger.info(f"Policy atlas saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
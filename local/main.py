@@ -2,15 +2,27 @@ import argparse
 import asyncio
 import json
 import logging
-from typing import List
+from pathlib import Path
+from typing import Dict, List, Optional
 
-from mdp_dp_rl.processes.mdp import MDP
+import numpy as np
 
+from digital_twins.policy_atlas import PolicyAtlas
 from digital_twins.target_simulator import TargetSimulator
 from local.things_api.client_wrapper import ClientWrapper
 from local.things_api.data import ServiceInstance, TargetInstance, ServiceId
 from local.things_api.helpers import setup_logger
-from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.cache import CompositionCache, composition_size, spec_hash
+from stochastic_service_composition.compiled_policy import CompiledPolicy
+from stochastic_service_composition.composition import DEFAULT_GAMMA
+from stochastic_service_composition.estimation import CompositionBudget, estimate_composition_size
+from stochastic_service_composition.hierarchical import hierarchical_composition
+from stochastic_service_composition.incremental import update_composition
+from stochastic_service_composition.persistence import load_composition, save_composition
+from stochastic_service_composition.realizability import find_unservable_request
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.solvers import PRIORITIZED_SWEEPING, solve
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
 
 
 logger = setup_logger("orchestrator")
@@ -18,9 +30,14 @@ logger = setup_logger("orchestrator")
 parser = argparse.ArgumentParser("main")
 parser.add_argument("--host", type=str, default="localhost", help="IP address of the HTTP IoT service.")
 parser.add_argument("--port", type=int, default=8080, help="IP address of the HTTP IoT service.")
+parser.add_argument("--policy-atlas", type=str, default=None, help="Path of the policy atlas (see build-policy-atlas.py).")
+parser.add_argument("--composition-file", type=str, default=None, help="Path of the file where the composition is saved.")
+parser.add_argument("--cells", type=str, default=None, help="Path of the JSON file with the service ids of every production cell (e.g. things_api/cells.json); if given, the cells are composed separately.")
+parser.add_argument("--max-states", type=int, default=None, help="Maximum number of states of the composition; larger compositions are refused before being built.")
+parser.add_argument("--max-system-states", type=int, default=None, help="Maximum number of states of the product of the services; if exceeded, the product is not materialized.")
 
 
-async def main(host: str, port: int) -> None:
+async def main(host: str, port: int, composition_file: Optional[str] = None, policy_atlas_file: Optional[str] = None, cells_file: Optional[str] = None, budget: Optional[CompositionBudget] = None) -> None:
     client = ClientWrapper(host, port)
 
     # check health
@@ -39,21 +56,110 @@ async def main(host: str, port: int) -> None:
     target = all_targets[0]
     target_id = target.target_id
 
+    # fail fast if the community cannot serve the target, before any numeric solving
+    unservable_request = find_unservable_request(target.target_spec, *[service.current_service_spec for service in services])
+    if unservable_request is not None:
+        logger.error(f"Target not realizable: no service may execute {unservable_request.action} in target state {unservable_request.target_state}, system state {unservable_request.system_state}")
+        return
+
+    # admission control: estimate the size of the composition before allocating it
+    factored = False
+    if budget is not None and cells_file is None:
+        estimate = estimate_composition_size(target.target_spec, *[service.current_service_spec for service in services])
+        logger.info(f"Estimated composition size: {estimate}")
+        if not budget.admits(estimate, factored=True):
+            logger.error(f"Composition refused: the estimated size {estimate} exceeds the budget {budget}")
+            return
+        factored = not budget.admits(estimate)
+
     # start main loop
     old_policy = None
+    cache = CompositionCache()
+    if composition_file is not None and Path(composition_file).exists():
+        # seed the cache with the saved composition: if the problem is unchanged, there is no need to rebuild it
+        saved_mdp, saved_policy, metadata = load_composition(composition_file)
+        if saved_policy is not None and "spec_hash" in metadata:
+            logger.info(f"Loaded composition from {composition_file}")
+            # size the entry without pickling it, so that the memory-mapped file is not read back into memory
+            cache.put(
+                metadata["spec_hash"],
+                (saved_mdp, saved_policy),
+                size=composition_size(saved_mdp, saved_policy),
+            )
+    policy_atlas = PolicyAtlas.load(policy_atlas_file) if policy_atlas_file is not None else None
+    cells: Optional[Dict[str, List[int]]] = None
+    if cells_file is not None:
+        service_indices = {service.service_id: index for index, service in enumerate(services)}
+        cells = {
+            cell_name: [service_indices[service_id] for service_id in service_ids]
+            for cell_name, service_ids in json.loads(Path(cells_file).read_text()).items()
+        }
+    hierarchical_transition_functions = None
+    mdp: Optional[SparseMDP] = None
+    composed_services: List[Service] = []
     target_simulator = TargetSimulator(target.target_spec)
     system_state = [service.service_spec.initial_state for service in services]
     iteration = 0
     while True:
 
-        mdp: MDP = composition_mdp(target.target_spec, *[service.current_service_spec for service in services])
-        orchestrator_policy = mdp.get_optimal_policy()
-        # detect when policy changes
-        if old_policy is None:
+        current_services = [service.current_service_spec for service in services]
+        atlas_policy = None
+        if policy_atlas is not None:
+            atlas_policy = policy_atlas.get_policy([service.transition_function for service in current_services])
+        if atlas_policy is not None:
+            # the policy of the current degradation levels has been computed offline
+            logger.info("Policy looked up in the policy atlas")
+            compiled_policy = atlas_policy
+        elif cells is not None:
+            # compose every cell against its segment of the target, only when a service has changed
+            current_transition_functions = [service.transition_function for service in current_services]
+            if hierarchical_transition_functions != current_transition_functions:
+                hierarchical_controller = hierarchical_composition(target.target_spec, *current_services, cells=cells)
+                hierarchical_transition_functions = current_transition_functions
+                logger.info(f"Cells composed: {hierarchical_controller}")
+            compiled_policy = hierarchical_controller
+        else:
+            cache_key = spec_hash(target.target_spec, current_services, DEFAULT_GAMMA)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                # e.g. after a maintenance, the services are back to a known configuration
+                logger.info(f"Composition cache hit (hits={cache.hits}, misses={cache.misses})")
+                mdp, orchestrator_policy = cached
+            else:
+                changed_states = np.array([], dtype=int)
+                if mdp is None:
+                    # sliced, as estimated by the admission control (the result is the same)
+                    mdp = composition_sparse_mdp(target.target_spec, *current_services, factored=factored, sliced=True)
+                else:
+                    # patch only the transitions of the services that have changed
+                    for index, current_service in enumerate(current_services):
+                        if composed_services[index].transition_function != current_service.transition_function:
+                            mdp, touched_states = update_composition(
+                                mdp, target.target_spec, composed_services, index, current_service.transition_function
+                            )
+                            logger.info(f"Composition updated for service {services[index].service_id}, touched {len(touched_states)} states")
+                            composed_services[index] = current_service
+                            changed_states = np.union1d(changed_states, touched_states)
+                if old_policy is None:
+                    orchestrator_policy = solve(mdp)
+                else:
+                    # re-plan starting from the previous solution, sweeping only from the changed states
+                    orchestrator_policy = solve(
+                        mdp, method=PRIORITIZED_SWEEPING, initial_policy=old_policy, changed_states=changed_states
+                    )
+                cache.put(cache_key, (mdp, orchestrator_policy), size=composition_size(mdp, orchestrator_policy))
+                if composition_file is not None and iteration == 0:
+                    save_composition(composition_file, mdp, orchestrator_policy, metadata={"spec_hash": cache_key})
+            composed_services = current_services
+            # detect when policy changes
+            if old_policy is None:
+                old_policy = orchestrator_policy
+                solved_compiled_policy = CompiledPolicy.from_policy(orchestrator_policy)
+            if old_policy.policy_data != orchestrator_policy.policy_data:
+                logger.info(f"Optimal Policy has changed!\nold_policy = {old_policy}\nnew_policy={orchestrator_policy}")
+                solved_compiled_policy = CompiledPolicy.from_policy(orchestrator_policy)
             old_policy = orchestrator_policy
-        if old_policy.policy_data != orchestrator_policy.policy_data:
-            logger.info(f"Optimal Policy has changed!\nold_policy = {old_policy}\nnew_policy={orchestrator_policy}")
-        old_policy = orchestrator_policy
+            compiled_policy = solved_compiled_policy
 
         # waiting for target action
         logger.info("Waiting for messages from target...")
@@ -64,7 +170,7 @@ async def main(host: str, port: int) -> None:
         current_state = (tuple(system_state), current_target_state, target_action)
         logger.info(f"Current state: {current_state}")
 
-        orchestrator_choice = orchestrator_policy.get_action_for_state(current_state)
+        orchestrator_choice = compiled_policy.get_action_for_state(current_state)
         if orchestrator_choice == "undefined":
             logger.error(f"Execution failed: no service can execute {target_action} in system state {system_state}")
             break
@@ -104,4 +210,7 @@ async def main(host: str, port: int) -> None:
 
 if __name__ == "__main__":
     arguments = parser.parse_args()
-    result = asyncio.get_event_loop().run_until_complete(main(arguments.host, arguments.port))
+    budget = None
+    if arguments.max_states is not None or arguments.max_system_states is not None:
+        budget = CompositionBudget(max_states=arguments.max_states, max_system_states=arguments.max_system_states)
+    result = asyncio.get_event_loop().run_until_complete(main(arguments.host, arguments.port, arguments.composition_file, arguments.policy_atlas, arguments.cells, budget))
@@ -0,0 +1,198 @@
+"""
+This module implements the batch composition of many targets against the same community.
+
+The system service of the community, and its capability index, are built
+only once, and shared by the compositions of all the targets. The
+compositions (and, optionally, their solutions) run concurrently in a pool
+of worker processes; every worker receives the system service only once,
+through the pool initializer.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, cast
+
+from mdp_dp_rl.processes.mdp import MDP
+
+from stochastic_service_composition.composition import (
+    DEFAULT_GAMMA,
+    _system_service,
+    iter_composition_dynamics,
+)
+from stochastic_service_composition.services import (
+    CapabilityIndex,
+    FactoredSystemService,
+    Service,
+)
+from stochastic_service_composition.solvers import SparsePolicy, solve
+from stochastic_service_composition.sparse import SparseMDP, _composition_actions
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import State
+
+_SystemService = Union[Service, FactoredSystemService]
+
+# the context of the worker processes, set by the pool initializer
+_worker_context: Dict[str, Any] = {}
+
+
+def batch_composition_mdps(
+    targets: Sequence[Target],
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    factored: bool = False,
+    max_workers: Optional[int] = 1,
+) -> List[MDP]:
+    """
+    Compute the composition MDPs of many targets against the same community.
+
+    :param targets: the target services.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param factored: if True, use a factored system service instead of building the product of the services.
+    :param max_workers: the maximum number of worker processes
+      (1: compose in the current process; None: the number of CPUs)
+    :return: the composition MDP of every target, in the same order.
+    """
+    return _run_batch(_compose, targets, services, factored, max_workers, gamma)
+
+
+def batch_composition_sparse_mdps(
+    targets: Sequence[Target],
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    factored: bool = False,
+    max_workers: Optional[int] = 1,
+) -> List[SparseMDP]:
+    """
+    Compute the composition MDPs, in sparse format, of many targets against the same community.
+
+    :param targets: the target services.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param factored: if True, use a factored system service instead of building the product of the services.
+    :param max_workers: the maximum number of worker processes
+      (1: compose in the current process; None: the number of CPUs)
+    :return: the sparse composition MDP of every target, in the same order.
+    """
+    return _run_batch(_compose_sparse, targets, services, factored, max_workers, gamma)
+
+
+def batch_solve(
+    targets: Sequence[Target],
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    factored: bool = False,
+    max_workers: Optional[int] = 1,
+    **solver_kwargs,
+) -> List[SparsePolicy]:
+    """
+    Compute the optimal orchestrator policies of many targets against the same community.
+
+    :param targets: the target services.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param factored: if True, use a factored system service instead of building the product of the services.
+    :param max_workers: the maximum number of worker processes
+      (1: solve in the current process; None: the number of CPUs)
+    :param solver_kwargs: the keyword arguments of solvers.solve
+    :return: the optimal policy of every target, in the same order.
+    """
+    return _run_batch(
+        _compose_and_solve,
+        targets,
+        services,
+        factored,
+        max_workers,
+        gamma,
+        solver_kwargs,
+    )
+
+
+def _run_batch(
+    task: Callable,
+    targets: Sequence[Target],
+    services: Sequence[Service],
+    factored: bool,
+    max_workers: Optional[int],
+    *args,
+) -> List:
+    """
+    Run a task for every target, sharing the system service.
+
+    :param task: the (picklable) function of the target, the system service, its capability index and args
+    :param targets: the target services
+    :param services: the community of services
+    :param factored: whether the system service is factored
+    :param max_workers: the maximum number of worker processes (1: run in the current process)
+    :param args: the other arguments of the task
+    :return: the results of the task, in the order of the targets
+    """
+    system_service = _system_service(services, factored)
+    capabilities = CapabilityIndex.from_services(services)
+    if max_workers == 1:
+        return [
+            task(target, system_service, capabilities, *args) for target in targets
+        ]
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_initialize_worker,
+        initargs=(system_service, capabilities),
+    ) as executor:
+        return list(executor.map(partial(_run_in_worker, task, args), targets))
+
+
+def _initialize_worker(
+    system_service: _SystemService, capabilities: CapabilityIndex
+) -> None:
+    """Initialize the context of a worker process."""
+    _worker_context["system_service"] = system_service
+    _worker_context["capabilities"] = capabilities
+
+
+def _run_in_worker(task: Callable, args: Sequence, target: Target) -> Any:
+    """Run a task for a target, in a worker process."""
+    return task(
+        target,
+        _worker_context["system_service"],
+        _worker_context["capabilities"],
+        *args,
+    )
+
+
+def _compose(
+    target: Target,
+    system_service: _SystemService,
+    capabilities: CapabilityIndex,
+    gamma: float,
+) -> MDP:
+    """Compute the composition MDP of a target."""
+    dynamics = iter_composition_dynamics(
+        target, system_service, capabilities=capabilities
+    )
+    return MDP(dict(dynamics), gamma)
+
+
+def _compose_sparse(
+    target: Target,
+    system_service: _SystemService,
+    capabilities: CapabilityIndex,
+    gamma: float,
+) -> SparseMDP:
+    """Compute the composition MDP of a target, in sparse format."""
+    nb_services = len(cast(Tuple[State, ...], system_service.initial_state))
+    return SparseMDP.from_dynamics(
+        iter_composition_dynamics(target, system_service, capabilities=capabilities),
+        gamma,
+        actions=_composition_actions(nb_services),
+    )
+
+
+def _compose_and_solve(
+    target: Target,
+    system_service: _SystemService,
+    capabilities: CapabilityIndex,
+    gamma: float,
+    solver_kwargs: Dict[str, Any],
+) -> SparsePolicy:
+    """Compute the optimal orchestrator policy of a target."""
+    mdp = _compose_sparse(target, system_service, capabilities, gamma)
+    return solve(mdp, **solver_kwargs)
@@ -0,0 +1,184 @@
+"""
+This module implements the bisimulation-based minimization of sparse MDPs.
+
+Two states are (probabilistically) bisimilar if they have the same actions,
+with the same rewards, and, for every action, the same probability of
+reaching every class of bisimilar states. Bisimilar states have the same
+optimal Q-values; hence, an MDP can be solved on its quotient, i.e. the MDP
+whose states are the classes of bisimilar states, and the policy of the
+quotient can be lifted back to the original states.
+
+In composition MDPs, e.g., all the sink states, or the states that differ
+only by the state of services whose futures are the same, are merged.
+
+The partition is computed by (signature-based) partition refinement: starting
+from a single block, every block is split according to the signature of its
+states, i.e. their actions, rewards and probabilities of reaching every
+block, until no block is split.
+"""
+from typing import Dict, NamedTuple, Union
+
+import numpy as np
+from mdp_dp_rl.processes.mdp import MDP
+
+from stochastic_service_composition.solvers import SparsePolicy, solve
+from stochastic_service_composition.sparse import (
+    INDEX_DTYPE,
+    SparseMDP,
+    _concatenate_ranges,
+    _pointers,
+)
+
+DEFAULT_DECIMALS = 10
+
+
+class Minimization(NamedTuple):
+    """The result of the minimization of a sparse MDP."""
+
+    quotient: SparseMDP
+    blocks: np.ndarray
+
+
+def bisimulation_partition(
+    mdp: SparseMDP, decimals: int = DEFAULT_DECIMALS
+) -> np.ndarray:
+    """
+    Compute the coarsest bisimulation partition of a sparse MDP.
+
+    :param mdp: the sparse MDP
+    :param decimals: the number of decimals used to compare rewards and probabilities
+    :return: the block of every state; blocks are numbered by order of first appearance.
+    """
+    rewards = np.round(mdp.rewards, decimals).tolist()
+    pair_actions = mdp.pair_actions.tolist()
+    state_ptr = mdp.state_ptr.tolist()
+    transition_pairs = mdp.transition_pairs.astype(np.int64)
+
+    blocks = np.zeros(mdp.nb_states, dtype=INDEX_DTYPE)
+    nb_blocks = 1
+    while True:
+        # probability of reaching every block, for every (state, action) pair
+        keys = transition_pairs * nb_blocks + blocks[mdp.next_states]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        block_probs = np.bincount(inverse, weights=mdp.probabilities)
+        block_probs = np.round(block_probs, decimals).tolist()
+        next_blocks = (unique_keys % nb_blocks).tolist()
+        key_ptr = np.searchsorted(
+            unique_keys // nb_blocks, np.arange(mdp.nb_pairs + 1)
+        ).tolist()
+        pair_signatures = [
+            (
+                pair_actions[pair_id],
+                rewards[pair_id],
+                tuple(next_blocks[key_ptr[pair_id] : key_ptr[pair_id + 1]]),
+                tuple(block_probs[key_ptr[pair_id] : key_ptr[pair_id + 1]]),
+            )
+            for pair_id in range(mdp.nb_pairs)
+        ]
+
+        old_blocks = blocks.tolist()
+        signature_ids: Dict = {}
+        blocks = np.empty(mdp.nb_states, dtype=INDEX_DTYPE)
+        for state_id in range(mdp.nb_states):
+            pairs = pair_signatures[state_ptr[state_id] : state_ptr[state_id + 1]]
+            signature = (old_blocks[state_id], tuple(sorted(pairs)))
+            blocks[state_id] = signature_ids.setdefault(signature, len(signature_ids))
+        if len(signature_ids) == nb_blocks:
+            return blocks
+        nb_blocks = len(signature_ids)
+
+
+def quotient_mdp(mdp: SparseMDP, blocks: np.ndarray) -> SparseMDP:
+    """
+    Compute the quotient of a sparse MDP with respect to a bisimulation partition.
+
+    The state with identifier b of the quotient is the block b, labelled with
+    its first state; its dynamics are the ones of its first state, with next
+    states replaced by their blocks.
+
+    :param mdp: the sparse MDP
+    :param blocks: the block of every state, as returned by bisimulation_partition
+    :return: the quotient MDP
+    """
+    _, representatives = np.unique(blocks, return_index=True)
+    nb_blocks = len(representatives)
+
+    pair_counts = np.diff(mdp.state_ptr)[representatives]
+    pair_ids = _concatenate_ranges(mdp.state_ptr[representatives], pair_counts)
+    transition_counts = np.diff(mdp.pair_ptr)[pair_ids]
+    transition_ids = _concatenate_ranges(mdp.pair_ptr[pair_ids], transition_counts)
+
+    # merge the transitions to states of the same block
+    transition_pairs = np.repeat(np.arange(len(pair_ids)), transition_counts)
+    keys = transition_pairs * nb_blocks + blocks[mdp.next_states[transition_ids]]
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    probabilities = np.bincount(inverse, weights=mdp.probabilities[transition_ids])
+    transitions_per_pair = np.bincount(
+        unique_keys // nb_blocks, minlength=len(pair_ids)
+    )
+
+    return SparseMDP(
+        [mdp.states[state_id] for state_id in representatives],
+        mdp.actions,
+        _pointers(pair_counts),
+        mdp.pair_actions[pair_ids],
+        mdp.rewards[pair_ids],
+        _pointers(transitions_per_pair),
+        (unique_keys % nb_blocks).astype(INDEX_DTYPE),
+        probabilities,
+        mdp.gamma,
+    )
+
+
+def minimize(
+    mdp: Union[SparseMDP, MDP], decimals: int = DEFAULT_DECIMALS
+) -> Minimization:
+    """
+    Minimize an MDP with respect to bisimulation.
+
+    :param mdp: the MDP, either sparse or an instance of mdp_dp_rl.processes.mdp.MDP
+    :param decimals: the number of decimals used to compare rewards and probabilities
+    :return: the quotient MDP, and the block of every state of the (sparse) MDP
+    """
+    if isinstance(mdp, MDP):
+        mdp = SparseMDP.from_mdp(mdp)
+    blocks = bisimulation_partition(mdp, decimals)
+    return Minimization(quotient_mdp(mdp, blocks), blocks)
+
+
+def lift_policy(
+    mdp: SparseMDP, blocks: np.ndarray, quotient_policy: SparsePolicy
+) -> SparsePolicy:
+    """
+    Lift a policy of the quotient MDP to the original MDP.
+
+    Every state chooses the action chosen by its block, and has the value of its block.
+
+    :param mdp: the original sparse MDP
+    :param blocks: the block of every state
+    :param quotient_policy: the policy of the quotient MDP
+    :return: the policy of the original MDP
+    """
+    chosen_actions = quotient_policy.action_ids[blocks]
+    # every state has exactly one pair with the chosen action
+    pair_ids = np.flatnonzero(mdp.pair_actions == chosen_actions[mdp.pair_states])
+    return SparsePolicy(
+        mdp, pair_ids.astype(INDEX_DTYPE), quotient_policy.values[blocks]
+    )
+
+
+def solve_minimized(
+    mdp: Union[SparseMDP, MDP], decimals: int = DEFAULT_DECIMALS, **solver_kwargs
+) -> SparsePolicy:
+    """
+    Solve an MDP on its bisimulation quotient.
+
+    :param mdp: the MDP, either sparse or an instance of mdp_dp_rl.processes.mdp.MDP
+    :param decimals: the number of decimals used to compare rewards and probabilities
+    :param solver_kwargs: the keyword arguments of solvers.solve, used on the quotient
+    :return: the optimal policy, over the states of the (sparse) MDP
+    """
+    if isinstance(mdp, MDP):
+        mdp = SparseMDP.from_mdp(mdp)
+    quotient, blocks = minimize(mdp, decimals)
+    return lift_policy(mdp, blocks, solve(quotient, **solver_kwargs))
@@ -0,0 +1,289 @@
+"""
+This module implements a content-addressed cache for compositions and policies.
+
+Compositions are keyed by a canonical hash of the target, of the (current)
+transition functions of the services, of the discount factor and of the
+arguments of the solver, if any. Hence, equal specifications map to the same
+key, regardless of the order in which states and actions have been inserted
+in dictionaries and sets, and of whether transitions are encoded as tuples
+or as (JSON) lists.
+"""
+import hashlib
+import os
+import pickle  # nosec
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from stochastic_service_composition.composition import DEFAULT_GAMMA
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.solvers import SparsePolicy, solve
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
+from stochastic_service_composition.target import Target
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_CACHE_FILE_SUFFIX = ".pkl"
+
+
+def spec_hash(
+    target: Target,
+    services: Sequence[Service],
+    gamma: float = DEFAULT_GAMMA,
+    solver_kwargs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Compute the canonical hash of a composition problem.
+
+    :param target: the target service.
+    :param services: the community of services (their current transition function is used).
+    :param gamma: the discount factor.
+    :param solver_kwargs: the keyword arguments of the solver of the problem, if any.
+    :return: the hexadecimal SHA-256 digest.
+    """
+    canonical_form: Tuple = (
+        _canonical_target(target),
+        tuple(_canonical_service(service) for service in services),
+        canonical_key(gamma),
+    )
+    if solver_kwargs:
+        # without solver arguments, the hash is the one of the problem alone
+        canonical_form += (canonical_key(solver_kwargs),)
+    return hashlib.sha256(repr(canonical_form).encode("utf-8")).hexdigest()
+
+
+def _canonical_service(service: Service) -> Tuple:
+    """Get the canonical form of a service."""
+    return (
+        "service",
+        canonical_key(service.states),
+        canonical_key(service.actions),
+        canonical_key(service.final_states),
+        canonical_key(service.initial_state),
+        canonical_key(service.transition_function),
+    )
+
+
+def _canonical_target(target: Target) -> Tuple:
+    """Get the canonical form of a target."""
+    return (
+        "target",
+        canonical_key(target.states),
+        canonical_key(target.actions),
+        canonical_key(target.final_states),
+        canonical_key(target.initial_state),
+        canonical_key(target.transition_function),
+        canonical_key(target.policy),
+        canonical_key(target.reward),
+    )
+
+
+def canonical_key(obj: Any) -> Any:
+    """
+    Get the canonical form of an object, usable as a dictionary key.
+
+    Dictionaries and sets are sorted, lists are turned into tuples and
+    numbers are turned into floats.
+    """
+    if isinstance(obj, dict):
+        return (
+            "dict",
+            tuple(
+                sorted(
+                    (
+                        (canonical_key(key), canonical_key(value))
+                        for key, value in obj.items()
+                    ),
+                    key=repr,
+                )
+            ),
+        )
+    if isinstance(obj, (set, frozenset)):
+        return (
+            "set",
+            tuple(sorted((canonical_key(item) for item in obj), key=repr)),
+        )
+    if isinstance(obj, (list, tuple)):
+        return tuple(canonical_key(item) for item in obj)
+    if isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        return float(obj)
+    return obj
+
+
+class CompositionCache:
+    """
+    A least-recently-used cache, in memory and optionally on disk.
+
+    The size of an entry is the size of its pickled representation, unless
+    given explicitly; the least recently used entries are evicted as soon as
+    the total size exceeds the budget.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        directory: Optional[Union[str, Path]] = None,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        """
+        Initialize the cache.
+
+        :param max_bytes: the maximum total size of the entries kept in memory
+        :param directory: the directory of the on-disk cache (optional)
+        :param max_disk_bytes: the maximum total size of the on-disk cache (default: unbounded)
+        """
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Get the number of entries in memory."""
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        """Check whether a key is cached, either in memory or on disk."""
+        return key in self._entries or (
+            self.directory is not None and self._path(key).exists()
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a cached value, and update the hit/miss counters.
+
+        :param key: the key
+        :return: the value, or None if the key is not cached
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        if self.directory is not None and self._path(key).exists():
+            path = self._path(key)
+            data = path.read_bytes()
+            os.utime(path)
+            self._add(key, pickle.loads(data), len(data))  # nosec
+            self.hits += 1
+            return self._entries[key][0]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any, size: Optional[int] = None) -> None:
+        """
+        Cache a value.
+
+        If the size is given and there is no on-disk cache, the value is not
+        pickled; e.g. a memory-mapped composition is not read into memory.
+
+        :param key: the key
+        :param value: the (picklable) value
+        :param size: the size of the entry, in bytes (default: the size of its pickled representation)
+        """
+        if size is not None and self.directory is None:
+            self._add(key, value, size)
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._add(key, value, len(data) if size is None else size)
+        if self.directory is not None:
+            self._path(key).write_bytes(data)
+            self._evict_from_disk()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Get a cached value, computing and caching it on a miss.
+
+        :param key: the key
+        :param compute: the function that computes the value
+        :return: the value
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Remove all the entries from memory (the on-disk cache is kept)."""
+        self._entries.clear()
+        self.nbytes = 0
+
+    def _add(self, key: str, value: Any, size: int) -> None:
+        """Add an entry in memory, evicting the least recently used ones."""
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _key, (_value, evicted_size) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_size
+
+    def _evict_from_disk(self) -> None:
+        """Remove the least recently used files of the on-disk cache."""
+        if self.directory is None or self.max_disk_bytes is None:
+            return
+        paths = sorted(
+            self.directory.glob("*" + _CACHE_FILE_SUFFIX),
+            key=lambda path: path.stat().st_mtime,
+        )
+        total_size = sum(path.stat().st_size for path in paths)
+        for path in paths[:-1]:
+            if total_size <= self.max_disk_bytes:
+                break
+            total_size -= path.stat().st_size
+            path.unlink()
+
+    def _path(self, key: str) -> Path:
+        """Get the path of the file of an entry."""
+        assert self.directory is not None
+        return self.directory / (key + _CACHE_FILE_SUFFIX)
+
+
+def cached_composition(
+    cache: CompositionCache,
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    **solver_kwargs,
+) -> Tuple[SparseMDP, SparsePolicy]:
+    """
+    Compute the composition MDP and its optimal policy, going through the cache.
+
+    :param cache: the cache.
+    :param target: the target service.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param solver_kwargs: the keyword arguments of solvers.solve
+    :return: the composition MDP, in sparse format, and its optimal policy.
+    """
+
+    def _compute() -> Tuple[SparseMDP, SparsePolicy]:
+        mdp = composition_sparse_mdp(target, *services, gamma=gamma)
+        return mdp, solve(mdp, **solver_kwargs)
+
+    return cache.get_or_compute(
+        spec_hash(target, services, gamma, solver_kwargs), _compute
+    )
+
+
+def composition_size(mdp: SparseMDP, policy: Optional[SparsePolicy] = None) -> int:
+    """
+    Get the size of a cache entry of a composition, without pickling its arrays.
+
+    The arrays, possibly memory-mapped, are measured by their number of bytes,
+    while the states and the actions are measured by their pickled size.
+
+    :param mdp: the composition MDP, in sparse format.
+    :param policy: the policy of the MDP (optional).
+    :return: the size, in bytes.
+    """
+    size = mdp.nbytes + len(
+        pickle.dumps((mdp.states, mdp.actions), protocol=pickle.HIGHEST_PROTOCOL)
+    )
+    if policy is not None:
+        size += policy.pair_ids.nbytes + policy.values.nbytes
+    return size
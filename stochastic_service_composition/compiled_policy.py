@@ -0,0 +1,213 @@
+"""
+This module implements compiled orchestrator policies, i.e. flat decision tables.
+
+A composition state ((s_1, ..., s_n), t, a) is encoded as the tuple of small
+integers (c_1, ..., c_n, c_t, c_a), where every component is the index of the
+value in its own domain. The tuple is then flattened with mixed-radix
+arithmetic (the radices are the sizes of the domains) into a single int64
+key. The product of the domains is never materialized: the keys of the
+reachable states are stored as a sorted array, and the codes of the chosen
+actions as a parallel array:
+
+- the service index, for the states where a service is chosen;
+- UNDEFINED_CODE, for the states where no service can do the action.
+
+Hence, a decision costs n + 2 dictionary lookups of single values and a
+binary search, instead of the hashing of a nested tuple; many decisions can
+be taken at once, with a single vectorized search of the encoded states,
+where the states that are not states of the policy get MISSING_CODE.
+"""
+from bisect import bisect_left
+from typing import Dict, Hashable, List, Mapping, Sequence, Union
+
+import numpy as np
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_STATE,
+    COMPOSITION_MDP_UNDEFINED_ACTION,
+)
+from stochastic_service_composition.types import Action, State
+
+KEY_DTYPE = np.int64
+ACTION_DTYPE = np.int16
+UNDEFINED_CODE = -1
+MISSING_CODE = -2
+MISSING_KEY = -1
+
+
+class CompiledPolicy:
+    """An orchestrator policy compiled into a sorted array of mixed-radix keys, and their actions."""
+
+    def __init__(
+        self, domains: Sequence[Sequence], keys: np.ndarray, actions: np.ndarray
+    ):
+        """
+        Initialize the compiled policy.
+
+        :param domains: the domain of every component (the n service states, the target state and the symbol)
+        :param keys: the sorted keys of the states of the policy
+        :param actions: the action code of every key
+        """
+        self.domains = [list(domain) for domain in domains]
+        self.radices = tuple(len(domain) for domain in self.domains)
+        assert keys.shape == actions.shape
+        self.keys = keys
+        self.actions = actions
+        self._codes: List[Dict[Hashable, int]] = [
+            {value: code for code, value in enumerate(domain)}
+            for domain in self.domains
+        ]
+        self._strides = _strides(self.radices)
+        # the codes of every component, premultiplied by the stride of the component
+        self._scaled_codes: List[Dict[Hashable, int]] = [
+            {value: code * int(stride) for value, code in codes.items()}
+            for codes, stride in zip(self._codes, self._strides)
+        ]
+        # the scalar lookups search Python lists, without the overhead of numpy calls
+        self._key_list: List[int] = keys.tolist()
+        self._action_list: List[Action] = [
+            COMPOSITION_MDP_UNDEFINED_ACTION if code == UNDEFINED_CODE else code
+            for code in actions.tolist()
+        ]
+
+    @classmethod
+    def from_policy(cls, policy) -> "CompiledPolicy":
+        """
+        Compile an orchestrator policy.
+
+        :param policy: the policy, either a SparsePolicy or a mdp_dp_rl DetPolicy
+        :return: the compiled policy
+        """
+        if hasattr(policy, "get_state_to_action_map"):
+            state_to_action: Mapping[State, Action] = policy.get_state_to_action_map()
+        else:
+            state_to_action = {
+                state: next(iter(action_dist))
+                for state, action_dist in policy.policy_data.items()
+            }
+        states = [
+            state
+            for state in state_to_action
+            if state != COMPOSITION_MDP_INITIAL_STATE
+        ]
+        if len(states) == 0:
+            raise ValueError("the policy has no composition states")
+
+        nb_services = len(_components(states[0])) - 2
+        domains: List[Dict[Hashable, int]] = [{} for _ in range(nb_services + 2)]
+        coded_states = np.empty((len(states), nb_services + 2), dtype=KEY_DTYPE)
+        for row, state in enumerate(states):
+            for index, value in enumerate(_components(state)):
+                coded_states[row, index] = domains[index].setdefault(
+                    value, len(domains[index])
+                )
+        radices = tuple(len(domain) for domain in domains)
+        if _product(radices) > np.iinfo(KEY_DTYPE).max:
+            raise ValueError(f"the keys of the domains {radices} overflow int64")
+
+        keys = coded_states @ _strides(radices)
+        order = np.argsort(keys)
+        actions = np.array(
+            [_action_code(state_to_action[state]) for state in states],
+            dtype=ACTION_DTYPE,
+        )
+        return cls([list(domain) for domain in domains], keys[order], actions[order])
+
+    @property
+    def nb_services(self) -> int:
+        """Get the number of services."""
+        return len(self.radices) - 2
+
+    @property
+    def nb_states(self) -> int:
+        """Get the number of states of the policy."""
+        return len(self.keys)
+
+    def encode(self, state: State) -> int:
+        """
+        Encode a composition state into its mixed-radix key.
+
+        :param state: the composition state
+        :return: the key
+        :raises KeyError: if a component of the state is not in its domain
+        """
+        return sum(map(dict.__getitem__, self._scaled_codes, _components(state)))
+
+    def encode_states(self, states: Sequence[State]) -> np.ndarray:
+        """
+        Encode many composition states into their mixed-radix keys.
+
+        :param states: the composition states
+        :return: the array of the keys, with MISSING_KEY for the states with a component out of its domain
+        """
+        coded_states = np.array(
+            [
+                [
+                    codes.get(value, MISSING_KEY)
+                    for codes, value in zip(self._codes, _components(state))
+                ]
+                for state in states
+            ],
+            dtype=KEY_DTYPE,
+        ).reshape(len(states), len(self.radices))
+        keys = coded_states @ self._strides
+        keys[np.any(coded_states == MISSING_KEY, axis=1)] = MISSING_KEY
+        return keys
+
+    def get_action_for_state(self, state: State) -> Action:
+        """
+        Get the action chosen in a composition state.
+
+        :param state: the composition state
+        :return: the chosen service index, or the undefined action
+        :raises KeyError: if the state is not a state of the policy
+        """
+        key = self.encode(state)
+        position = bisect_left(self._key_list, key)
+        if position == len(self._key_list) or self._key_list[position] != key:
+            raise KeyError(state)
+        return self._action_list[position]
+
+    def get_action_codes(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Get the codes of the actions chosen in many (encoded) composition states.
+
+        :param keys: the array of the keys of the states, as returned by encode_states
+        :return: the action codes, i.e. service indexes, UNDEFINED_CODE or MISSING_CODE
+        """
+        keys = np.asarray(keys, dtype=KEY_DTYPE)
+        positions = np.searchsorted(self.keys, keys)
+        positions[positions == len(self.keys)] = 0
+        found = self.keys[positions] == keys
+        return np.where(found, self.actions[positions], MISSING_CODE).astype(
+            ACTION_DTYPE
+        )
+
+
+def _components(state) -> List:
+    """Get the components of a composition state."""
+    system_state, target_state, symbol = state
+    return [*system_state, target_state, symbol]
+
+
+def _strides(radices: Sequence[int]) -> np.ndarray:
+    """Get the row-major strides of the mixed-radix representation."""
+    strides = np.ones(len(radices), dtype=KEY_DTYPE)
+    for index in range(len(radices) - 2, -1, -1):
+        strides[index] = strides[index + 1] * radices[index + 1]
+    return strides
+
+
+def _product(radices: Sequence[int]) -> int:
+    """Compute the number of combinations of values, with Python integers."""
+    result = 1
+    for radix in radices:
+        result *= radix
+    return result
+
+
+def _action_code(action: Union[int, str]) -> int:
+    """Get the code of an action of the composition MDP."""
+    if action == COMPOSITION_MDP_UNDEFINED_ACTION:
+        return UNDEFINED_CODE
+    return int(action)
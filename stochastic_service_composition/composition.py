@@ -1,12 +1,37 @@
 """This module implements the algorithm to compute the system-target MDP."""
 from collections import deque
-from typing import Deque, Dict, List, Set, Tuple
+from typing import (
+    Deque,
+    Dict,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
 from mdp_dp_rl.processes.mdp import MDP
 
-from stochastic_service_composition.services import Service, build_system_service
+from stochastic_service_composition.interning import Interner
+from stochastic_service_composition.services import (
+    CapabilityIndex,
+    FactoredSystemService,
+    Service,
+    build_system_service,
+)
+from stochastic_service_composition.slicing import CommunitySlice, slice_community
 from stochastic_service_composition.target import Target
-from stochastic_service_composition.types import Action, State, MDPDynamics
+from stochastic_service_composition.types import (
+    Action,
+    CompositionState,
+    MDPDynamics,
+    Prob,
+    Reward,
+    State,
+)
 
 COMPOSITION_MDP_INITIAL_STATE = 0
 COMPOSITION_MDP_INITIAL_ACTION = "initial"
@@ -15,7 +40,14 @@ DEFAULT_GAMMA = 0.9
 
 
 def composition_mdp(
-    target: Target, *services: Service, gamma: float = DEFAULT_GAMMA
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    factored: bool = False,
+    interner: Optional[Interner] = None,
+    sliced: bool = False,
+    pruned: bool = False,
+    community: Optional[CommunitySlice] = None,
 ) -> MDP:
     """
     Compute the composition MDP.
@@ -23,93 +55,290 @@ def composition_mdp(
     :param target: the target service.
     :param services: the community of services.
     :param gamma: the discount factor.
+    :param factored: if True, use a factored system service instead of building the product of the services.
+    :param interner: the interner of states and distributions, shared with the system service (optional).
+    :param sliced: if True, restrict the services to the actions of the target before building their product;
+      the result is the same.
+    :param pruned: if True, also drop the services dominated by another service (see slicing.slice_community);
+      the result is a lower bound.
+    :param community: the slice of the community to compose, e.g. with spares swapped in (default: computed from
+      the services, according to sliced and pruned).
     :return: the composition MDP.
     """
-    system_service = build_system_service(*services)
+    transition_function: MDPDynamics = {}
+    for state, action, next_state_dist, reward in iter_composition(
+        target,
+        *services,
+        factored=factored,
+        interner=interner,
+        sliced=sliced,
+        pruned=pruned,
+        community=community,
+    ):
+        transition_function.setdefault(state, {})[action] = (next_state_dist, reward)
+    return MDP(transition_function, gamma)
 
-    initial_state = COMPOSITION_MDP_INITIAL_STATE
-    # one action per service (1..n) + the initial action (0)
-    actions: Set[Action] = set(range(len(services)))
-    initial_action = COMPOSITION_MDP_INITIAL_ACTION
-    actions.add(initial_action)
 
-    # add an 'undefined' action for sink states
-    actions.add(COMPOSITION_MDP_UNDEFINED_ACTION)
+class CompositionTransition(NamedTuple):
+    """A transition of the composition MDP: the distribution of the next states after an action."""
 
-    transition_function: MDPDynamics = {}
+    state: State
+    action: Action
+    next_state_dist: Dict[State, Prob]
+    reward: Reward
+
+
+def iter_composition(
+    target: Target,
+    *services: Service,
+    factored: bool = False,
+    interner: Optional[Interner] = None,
+    sliced: bool = False,
+    pruned: bool = False,
+    community: Optional[CommunitySlice] = None,
+) -> Iterator[CompositionTransition]:
+    """
+    Stream the transitions of the composition MDP, as they are discovered.
+
+    The states are expanded in breadth-first order, as in
+    iter_composition_dynamics, and the transitions of a state are yielded
+    right after its expansion; only the visited states and the frontier are
+    kept, never the transitions, so that the consumer decides what to store.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param factored: if True, use a factored system service instead of building the product of the services.
+    :param interner: the interner of states and distributions, shared with the system service (optional).
+    :param sliced: if True, restrict the services to the actions of the target before building their product;
+      the result is the same.
+    :param pruned: if True, also drop the services dominated by another service (see slicing.slice_community);
+      the result is a lower bound.
+    :param community: the slice of the community to compose, e.g. with spares swapped in (default: computed from
+      the services, according to sliced and pruned).
+    :return: an iterator over the transitions (state, action, next state distribution, reward).
+    """
+    for state, transitions in _composition_dynamics(
+        target, services, factored, interner, sliced, pruned, community
+    ):
+        for action, (next_state_dist, reward) in transitions.items():
+            yield CompositionTransition(state, action, next_state_dist, reward)
+
+
+def iter_composition_dynamics(
+    target: Target,
+    system_service: Union[Service, FactoredSystemService],
+    interner: Optional[Interner] = None,
+    capabilities: Optional[CapabilityIndex] = None,
+) -> Iterator[Tuple[State, Dict[Action, Tuple[Dict[State, Prob], Reward]]]]:
+    """
+    Explore the composition MDP and yield the transitions of each visited state.
 
+    The states are visited in breadth-first order, starting from the
+    initial state COMPOSITION_MDP_INITIAL_STATE; hence, every state is yielded
+    exactly once, in the same order in which it has been discovered.
+
+    :param target: the target service.
+    :param system_service: the system service of the community, either materialized or factored.
+    :param interner: the interner of composition states and distributions (optional).
+    :param capabilities: the capability index of the community (default: built from the system service).
+    :return: an iterator over pairs (state, transitions by action).
+    """
     visited = set()
     to_be_visited = set()
     queue: Deque = deque()
+    if capabilities is None:
+        capabilities = CapabilityIndex.from_system_service(system_service)
 
     # add initial transitions
-    transition_function[initial_state] = {}
-    initial_transition_dist = {}
-    symbols_from_initial_state = target.policy[target.initial_state].keys()
-    for symbol in symbols_from_initial_state:
-        next_state = (system_service.initial_state, target.initial_state, symbol)
-        next_prob = target.policy[target.initial_state][symbol]
-        initial_transition_dist[next_state] = next_prob
+    initial_transition_dist = _initial_distribution(
+        target, system_service.initial_state
+    )
+    if interner is not None:
+        initial_transition_dist = interner.intern_distribution(initial_transition_dist)
+    for next_state in initial_transition_dist:
         queue.append(next_state)
         to_be_visited.add(next_state)
-    transition_function[initial_state][initial_action] = (initial_transition_dist, 0.0)  # type: ignore
+    yield COMPOSITION_MDP_INITIAL_STATE, {
+        COMPOSITION_MDP_INITIAL_ACTION: (initial_transition_dist, 0.0)
+    }
 
     while len(queue) > 0:
         current_state = queue.popleft()
         to_be_visited.remove(current_state)
         visited.add(current_state)
-        current_system_state, current_target_state, current_symbol = current_state
 
-        transition_function[current_state] = {}
-        # index system symbols (action, service_id) by symbol
-        system_symbols: List[Tuple[Action, int]] = list(
-            system_service.transition_function[current_system_state].keys()
+        current_system_state = current_state[0]
+        transitions = _state_transitions(
+            target,
+            system_service.transition_function[current_system_state],
+            current_state,
+            interner,
+            capabilities,
         )
-        system_symbols_by_symbols: Dict[Action, Set[int]] = {}
-        for action, service_id in system_symbols:
-            system_symbols_by_symbols.setdefault(action, set()).add(service_id)
-
-        for i in system_symbols_by_symbols.get(current_symbol, set()):
-            next_transitions = {}
-            # TODO check if it is needed
-            if current_symbol not in target.transition_function[current_target_state]:
-                continue
-            next_reward = (
-                target.reward[current_target_state][current_symbol]
-                if (current_symbol, i)
-                in system_service.transition_function[current_system_state]
-                else 0
-            )
-            next_target_state = target.transition_function[current_target_state][
-                current_symbol
-            ]
-            next_system_states, next_system_reward = system_service.transition_function[
-                current_system_state
-            ][(current_symbol, i)]
-            for next_symbol, next_prob in target.policy[next_target_state].items():
-                for next_system_state, next_system_prob in next_system_states.items():
-                    next_state = (next_system_state, next_target_state, next_symbol)
-                    if next_prob * next_system_prob == 0.0:
-                        continue
-                    next_transitions[next_state] = next_prob * next_system_prob
-                    if next_state not in visited and next_state not in to_be_visited:
-                        to_be_visited.add(next_state)
-                        queue.append(next_state)
-            transition_function[current_state][i] = (  # type: ignore
-                next_transitions,  # type: ignore
-                next_reward + next_system_reward,
+        for next_transitions, _reward in transitions.values():
+            for next_state in next_transitions:
+                if next_state not in visited and next_state not in to_be_visited:
+                    to_be_visited.add(next_state)
+                    queue.append(next_state)
+        yield current_state, transitions
+
+
+def _composition_dynamics(
+    target: Target,
+    services: Sequence[Service],
+    factored: bool,
+    interner: Optional[Interner] = None,
+    sliced: bool = False,
+    pruned: bool = False,
+    community: Optional[CommunitySlice] = None,
+) -> Iterator[Tuple[State, Dict[Action, Tuple[Dict[State, Prob], Reward]]]]:
+    """
+    Explore the composition MDP of a community, optionally sliced with respect to the target.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param factored: if True, use a factored system service instead of building the product of the services.
+    :param interner: the interner of states and distributions (optional).
+    :param sliced: if True, compose the slice of the community, and map it back to the community.
+    :param pruned: if True, also drop the dominated services from the slice.
+    :param community: the slice of the community to compose (default: computed from the services).
+    :return: an iterator over pairs (state, transitions by action), as iter_composition_dynamics.
+    """
+    if community is None and not sliced and not pruned:
+        system_service = _system_service(services, factored, interner)
+        capabilities = CapabilityIndex.from_services(services)
+        return iter_composition_dynamics(
+            target, system_service, interner, capabilities
+        )
+    if community is None:
+        community = slice_community(
+            target.actions, services, interner, prune_dominated=pruned
+        )
+    # the product of a single service is not defined: use the factored system service
+    system_service = _system_service(
+        community.services, factored or len(community.services) < 2, interner
+    )
+    capabilities = CapabilityIndex.from_services(community.services)
+    dynamics = iter_composition_dynamics(
+        target, system_service, interner, capabilities
+    )
+    return _lift_dynamics(dynamics, community, interner)
+
+
+def _lift_dynamics(
+    dynamics: Iterator[Tuple[State, Dict[Action, Tuple[Dict[State, Prob], Reward]]]],
+    community: CommunitySlice,
+    interner: Optional[Interner] = None,
+) -> Iterator[Tuple[State, Dict[Action, Tuple[Dict[State, Prob], Reward]]]]:
+    """Map the composition of a sliced community to the states and services of the community."""
+
+    def _lift_state(state: State) -> State:
+        if state == COMPOSITION_MDP_INITIAL_STATE:
+            return state
+        system_state, target_state, symbol = cast(CompositionState, state)
+        lifted_state = (community.lift_system_state(system_state), target_state, symbol)
+        if interner is not None:
+            return interner.intern(lifted_state)
+        return lifted_state
+
+    for state, transitions in dynamics:
+        yield _lift_state(state), {
+            community.lift_action(action): (
+                {
+                    _lift_state(next_state): prob
+                    for next_state, prob in next_state_dist.items()
+                },
+                reward,
             )
+            for action, (next_state_dist, reward) in transitions.items()
+        }
 
-        # states without outgoing transitions are sink states.
-        # add loop transitions with
-        # - 'undefined' action
-        # - probability 1
-        # - reward 0
-        if len(transition_function[current_state]) == 0:
-            transition_function.setdefault(current_state, {})
-            transition_function[current_state][COMPOSITION_MDP_UNDEFINED_ACTION] = (
-                {current_state: 1.0},
-                0.0,
-            )  # type: ignore
 
-    return MDP(transition_function, gamma)
+def _system_service(
+    services: Sequence[Service], factored: bool, interner: Optional[Interner] = None
+) -> Union[Service, FactoredSystemService]:
+    """Get the system service of a community, either materialized or factored."""
+    if factored:
+        return FactoredSystemService(services, interner)
+    return build_system_service(*services, interner=interner)
+
+
+def _initial_distribution(
+    target: Target, system_initial_state: State
+) -> Dict[State, Prob]:
+    """
+    Compute the distribution of the initial transition of the composition MDP.
+
+    :param target: the target service.
+    :param system_initial_state: the initial state of the system service.
+    :return: the distribution over the first composition states.
+    """
+    initial_transition_dist: Dict[State, Prob] = {}
+    symbols_from_initial_state = target.policy[target.initial_state].keys()
+    for symbol in symbols_from_initial_state:
+        next_state = (system_initial_state, target.initial_state, symbol)
+        next_prob = target.policy[target.initial_state][symbol]
+        initial_transition_dist[next_state] = next_prob
+    return initial_transition_dist
+
+
+def _state_transitions(
+    target: Target,
+    system_transitions: Mapping[Tuple[Action, int], Tuple[Dict[State, Prob], Reward]],
+    current_state: State,
+    interner: Optional[Interner] = None,
+    capabilities: Optional[CapabilityIndex] = None,
+) -> Dict[Action, Tuple[Dict[State, Prob], Reward]]:
+    """
+    Compute the outgoing transitions of a (non-initial) composition state.
+
+    :param target: the target service.
+    :param system_transitions: the transitions of the system service from the current system state.
+    :param current_state: the composition state to expand.
+    :param interner: the interner of composition states and distributions (optional).
+    :param capabilities: the capability index of the community (optional); if given, only the transitions
+      of the services that can perform the current symbol are looked up.
+    :return: the transitions, indexed by the chosen service.
+    """
+    current_system_state, current_target_state, current_symbol = cast(
+        CompositionState, current_state
+    )
+    transitions: Dict[Action, Tuple[Dict[State, Prob], Reward]] = {}
+    if current_symbol not in target.transition_function.get(current_target_state, {}):
+        candidates: Sequence[int] = []
+    elif capabilities is not None:
+        candidates = capabilities.candidates(current_system_state, current_symbol)
+    else:
+        candidates = sorted(
+            service_id
+            for action, service_id in system_transitions
+            if action == current_symbol
+        )
+
+    for i in candidates:
+        next_transitions: Dict[State, Prob] = {}
+        next_reward = target.reward[current_target_state][current_symbol]
+        next_target_state = target.transition_function[current_target_state][
+            current_symbol
+        ]
+        next_system_states, next_system_reward = system_transitions[
+            (current_symbol, i)
+        ]
+        for next_symbol, next_prob in target.policy[next_target_state].items():
+            for next_system_state, next_system_prob in next_system_states.items():
+                next_state = (next_system_state, next_target_state, next_symbol)
+                if next_prob * next_system_prob == 0.0:
+                    continue
+                next_transitions[next_state] = next_prob * next_system_prob
+        if interner is not None:
+            next_transitions = interner.intern_distribution(next_transitions)
+        transitions[i] = (next_transitions, next_reward + next_system_reward)
+
+    # states without outgoing transitions are sink states.
+    # add loop transitions with
+    # - 'undefined' action
+    # - probability 1
+    # - reward 0
+    if len(transitions) == 0:
+        transitions[COMPOSITION_MDP_UNDEFINED_ACTION] = ({current_state: 1.0}, 0.0)
+    return transitions
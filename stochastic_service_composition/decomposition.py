@@ -0,0 +1,189 @@
+"""
+This module implements the decomposition of a composition by action alphabet.
+
+Two services are dependent if their alphabets overlap, i.e. if they can be
+chosen for the same target action; the groups of the community are the
+connected components of this relation. A choice of the orchestrator only
+concerns the services of one group, the one of the requested action, and
+only changes the states of those services; hence, every group can be
+composed separately, against the whole target.
+
+In the composition of a group, the actions of the other groups are performed
+by a virtual environment service, with a single state and reward 0; the
+actions that no service of the community can perform are not performed by
+the environment, so that they lead to the same failures of the monolithic
+composition. The policies of the groups are combined at lookup time: the
+choice in a state of the monolithic composition is the one of the group of
+the requested action, in the projection of the state onto the group.
+
+The decomposition is exact, i.e. it takes the same choices of the monolithic
+composition (up to ties), when no group can fail: in that case, the value of
+a state of the monolithic composition is the sum of the values of its groups,
+minus the target rewards counted more than once, which do not depend on the
+choices. When a group can reach a failure, the failure stops all the other
+groups too, and the decomposition neglects the rewards they lose.
+"""
+from typing import Dict, FrozenSet, List, NamedTuple, Sequence, Set, cast
+
+import numpy as np
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_ACTION,
+    COMPOSITION_MDP_INITIAL_STATE,
+    COMPOSITION_MDP_UNDEFINED_ACTION,
+    DEFAULT_GAMMA,
+)
+from stochastic_service_composition.services import (
+    Service,
+    build_deterministic_service_from_transitions,
+)
+from stochastic_service_composition.solvers import SparsePolicy, solve
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import (
+    Action,
+    CompositionState,
+    State,
+    TransitionFunction,
+)
+
+ENVIRONMENT_STATE = "environment"
+
+
+class GroupComposition(NamedTuple):
+    """The composition of a group of services, together with the environment service."""
+
+    service_ids: Sequence[int]
+    actions: FrozenSet[Action]
+    mdp: SparseMDP
+    policy: SparsePolicy
+
+
+class DecomposedComposition:
+    """The compositions of the independent groups of a community."""
+
+    def __init__(self, groups: Sequence[GroupComposition]):
+        """
+        Initialize the decomposed composition.
+
+        :param groups: the compositions of the groups
+        """
+        self.groups = list(groups)
+        self.group_by_action: Dict[Action, GroupComposition] = {}
+        for group in self.groups:
+            for action in group.actions:
+                self.group_by_action[action] = group
+
+    @property
+    def is_exact(self) -> bool:
+        """Check whether the decomposition is exact, i.e. no group can reach a failure."""
+        return not any(
+            np.any(
+                group.mdp.pair_actions
+                == group.mdp.action_ids[COMPOSITION_MDP_UNDEFINED_ACTION]
+            )
+            for group in self.groups
+        )
+
+    def get_action_for_state(self, state: State) -> Action:
+        """
+        Get the action chosen in a state of the monolithic composition MDP.
+
+        :param state: the composition state ((s_1, ..., s_n), target state, symbol)
+        :return: the index of the chosen service, or the 'initial' or 'undefined' actions.
+        """
+        if state == COMPOSITION_MDP_INITIAL_STATE:
+            return COMPOSITION_MDP_INITIAL_ACTION
+        system_state, target_state, symbol = cast(CompositionState, state)
+        group = self.group_by_action.get(symbol)
+        if group is None:
+            return COMPOSITION_MDP_UNDEFINED_ACTION
+        local_system_state = (
+            *(system_state[service_id] for service_id in group.service_ids),
+            ENVIRONMENT_STATE,
+        )
+        local_state = (local_system_state, target_state, symbol)
+        if local_state not in group.mdp.state_ids:
+            return COMPOSITION_MDP_UNDEFINED_ACTION
+        local_service_id = group.policy.get_action_for_state(local_state)
+        if local_service_id == COMPOSITION_MDP_UNDEFINED_ACTION:
+            return COMPOSITION_MDP_UNDEFINED_ACTION
+        return group.service_ids[local_service_id]
+
+    def __repr__(self) -> str:
+        """Get the string representation."""
+        service_ids = [list(group.service_ids) for group in self.groups]
+        return f"{type(self).__name__}(groups={service_ids})"
+
+
+def alphabet_groups(services: Sequence[Service]) -> List[List[int]]:
+    """
+    Partition a community into groups of services with overlapping alphabets.
+
+    :param services: the community of services
+    :return: the (sorted) indices of the services of every group, in order of first service.
+    """
+    # union-find over the service indices, with path halving
+    parents = list(range(len(services)))
+
+    def _find(service_id: int) -> int:
+        while parents[service_id] != service_id:
+            parents[service_id] = parents[parents[service_id]]
+            service_id = parents[service_id]
+        return service_id
+
+    first_service_by_action: Dict[Action, int] = {}
+    for service_id, service in enumerate(services):
+        for action in service.actions:
+            other_id = first_service_by_action.setdefault(action, service_id)
+            parents[_find(service_id)] = _find(other_id)
+
+    groups: Dict[int, List[int]] = {}
+    for service_id in range(len(services)):
+        groups.setdefault(_find(service_id), []).append(service_id)
+    return list(groups.values())
+
+
+def decomposed_composition(
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    factored: bool = False,
+    **solver_kwargs,
+) -> DecomposedComposition:
+    """
+    Compose and solve every group of services with overlapping alphabets separately.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param factored: if True, use a factored system service instead of building the product of the services of a group.
+    :param solver_kwargs: the keyword arguments of solvers.solve
+    :return: the compositions of the groups.
+    """
+    community_actions = set().union(*(service.actions for service in services))
+    compositions = []
+    for service_ids in alphabet_groups(services):
+        group_services = [services[service_id] for service_id in service_ids]
+        group_actions = set().union(*(service.actions for service in group_services))
+        environment = _environment_service(
+            community_actions.difference(group_actions)
+        )
+        mdp = composition_sparse_mdp(
+            target, *group_services, environment, gamma=gamma, factored=factored
+        )
+        policy = solve(mdp, **solver_kwargs)
+        compositions.append(
+            GroupComposition(tuple(service_ids), frozenset(group_actions), mdp, policy)
+        )
+    return DecomposedComposition(compositions)
+
+
+def _environment_service(actions: Set[Action]) -> Service:
+    """Build the virtual service that performs the actions of the other groups."""
+    transitions: TransitionFunction = {
+        ENVIRONMENT_STATE: {action: ENVIRONMENT_STATE for action in actions}
+    }
+    return build_deterministic_service_from_transitions(
+        transitions, ENVIRONMENT_STATE, {ENVIRONMENT_STATE}
+    )
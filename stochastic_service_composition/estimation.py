@@ -0,0 +1,347 @@
+"""
+This module implements the size estimation and the admission control of compositions.
+
+The size is bounded from the structure of the services, without exploring
+the composition. Every service is explored together with the target only:
+the projection of a composition state onto the i-th service is a triple
+(s_i, target state, symbol), and the triples reachable in the composition
+are among the ones reachable when, at every step, either the i-th service
+performs the requested action or any other service that can perform it
+does. The composition states with a given target state and symbol are then
+at most the product of the states of each service in the triples with them.
+
+The counts of the states, of the state-action pairs and of the transitions
+in this product space are computed in closed form, with one sum per target
+state and symbol; they are upper bounds of the size of the composition,
+exact when the target does not correlate the states of the services. If the
+bounds are small, the composition is explored without storing it, up to a
+maximum number of states, to get the exact size instead.
+
+A CompositionBudget bounds the size of a request; compose_within_budget
+routes it to the cheapest engine within the budget, before any allocation:
+
+- MONOLITHIC_ENGINE: the product of the (sliced) services is materialized;
+- FACTORED_ENGINE: the product is never materialized;
+- DECOMPOSED_ENGINE: the groups of services with overlapping alphabets are
+  composed separately (see decomposition.py).
+
+If no engine fits, a CompositionTooLargeError is raised.
+"""
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from stochastic_service_composition.composition import DEFAULT_GAMMA, iter_composition
+from stochastic_service_composition.decomposition import (
+    DecomposedComposition,
+    _environment_service,
+    alphabet_groups,
+    decomposed_composition,
+)
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.slicing import slice_service
+from stochastic_service_composition.solvers import SparsePolicy, solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import Action, State
+
+MONOLITHIC_ENGINE = "monolithic"
+FACTORED_ENGINE = "factored"
+DECOMPOSED_ENGINE = "decomposed"
+DEFAULT_MAX_EXPLORED_STATES = 10_000
+
+
+class CompositionSizeEstimate(NamedTuple):
+    """The size of a composition (upper bounds), and of the product of its services."""
+
+    nb_system_states: int
+    nb_states: int
+    nb_pairs: int
+    nb_transitions: int
+
+
+class CompositionBudget(NamedTuple):
+    """The maximum size of a composition; None means no limit."""
+
+    max_states: Optional[int] = None
+    max_transitions: Optional[int] = None
+    max_system_states: Optional[int] = None
+
+    def admits(self, estimate: CompositionSizeEstimate, factored: bool = False) -> bool:
+        """
+        Check whether a composition of the estimated size is within the budget.
+
+        :param estimate: the estimated size of the composition
+        :param factored: if True, the product of the services is not materialized, so its size is not checked.
+        :return: True if the composition is within the budget
+        """
+        return (
+            (self.max_states is None or estimate.nb_states <= self.max_states)
+            and (
+                self.max_transitions is None
+                or estimate.nb_transitions <= self.max_transitions
+            )
+            and (
+                factored
+                or self.max_system_states is None
+                or estimate.nb_system_states <= self.max_system_states
+            )
+        )
+
+
+class CompositionTooLargeError(ValueError):
+    """Raised when a composition does not fit the budget, with any engine."""
+
+    def __init__(self, estimate: CompositionSizeEstimate, budget: CompositionBudget):
+        """
+        Initialize the error.
+
+        :param estimate: the estimated size of the (monolithic) composition
+        :param budget: the budget
+        """
+        # all the arguments are passed on, so that the error can be pickled
+        super().__init__(estimate, budget)
+        self.estimate = estimate
+        self.budget = budget
+
+    def __str__(self) -> str:
+        """Get the message of the error."""
+        return f"the composition does not fit the budget {self.budget}: estimated {self.estimate}"
+
+
+def estimate_composition_size(
+    target: Target,
+    *services: Service,
+    max_explored_states: int = DEFAULT_MAX_EXPLORED_STATES,
+) -> CompositionSizeEstimate:
+    """
+    Bound the size of the composition of a target and a community.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param max_explored_states: the maximum number of states to explore to get the exact size.
+    :return: the number of system states of the (sliced) product, and the upper bounds of the number of states,
+      state-action pairs and transitions.
+    :raises ValueError: if the community is empty.
+    """
+    if len(services) == 0:
+        raise ValueError("the community has no services")
+    nb_system_states = _product(
+        [len(slice_service(service, target.actions).states) for service in services]
+    )
+    slots = [
+        _service_slots(target, services, service_id)
+        for service_id in range(len(services))
+    ]
+    requests = set.intersection(*(set(service_slots) for service_slots in slots))
+
+    # the initial state
+    nb_states = 1
+    nb_pairs = 1
+    nb_transitions = len(_initial_symbols(target))
+    for target_state, symbol in requests:
+        next_target_state = target.transition_function[target_state].get(symbol)
+        nb_next_symbols = (
+            len(_symbols(target, next_target_state))
+            if next_target_state is not None
+            else 0
+        )
+        nb_slot_states: List[int] = []
+        nb_enabled: List[int] = []
+        nb_next_states: List[int] = []
+        for service, service_slots in zip(services, slots):
+            slot = service_slots[(target_state, symbol)]
+            transitions = [
+                service.transition_function[state][symbol]
+                for state in slot
+                if symbol in service.transition_function.get(state, {})
+            ]
+            nb_slot_states.append(len(slot))
+            nb_enabled.append(len(transitions))
+            nb_next_states.append(
+                sum(
+                    sum(1 for prob in next_state_dist.values() if prob > 0.0)
+                    for next_state_dist, _reward in transitions
+                )
+            )
+        nb_request_states = _product(nb_slot_states)
+        # the states where no service can perform the symbol have the 'undefined' loop
+        nb_failures = _product(
+            [nb_slot - nb for nb_slot, nb in zip(nb_slot_states, nb_enabled)]
+        )
+        if next_target_state is None:
+            nb_failures = nb_request_states
+            nb_enabled = [0] * len(services)
+            nb_next_states = [0] * len(services)
+        nb_states += nb_request_states
+        nb_pairs += nb_failures
+        nb_transitions += nb_failures
+        for service_id in range(len(services)):
+            nb_other_states = _product(
+                nb_slot_states[:service_id] + nb_slot_states[service_id + 1 :]
+            )
+            nb_pairs += nb_enabled[service_id] * nb_other_states
+            nb_transitions += (
+                nb_next_states[service_id] * nb_next_symbols * nb_other_states
+            )
+    if nb_states <= max_explored_states:
+        return _explored_size(target, services, nb_system_states)
+    return CompositionSizeEstimate(
+        nb_system_states, nb_states, nb_pairs, nb_transitions
+    )
+
+
+def choose_engine(target: Target, *services: Service, budget: CompositionBudget) -> str:
+    """
+    Choose the cheapest engine that composes a target and a community within a budget.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param budget: the budget.
+    :return: the engine, one of MONOLITHIC_ENGINE, FACTORED_ENGINE and DECOMPOSED_ENGINE.
+    """
+    estimate = estimate_composition_size(target, *services)
+    if budget.admits(estimate):
+        return MONOLITHIC_ENGINE
+    if budget.admits(estimate, factored=True):
+        return FACTORED_ENGINE
+    groups = alphabet_groups(services)
+    if len(groups) > 1:
+        community_actions = set().union(*(service.actions for service in services))
+        for service_ids in groups:
+            group_services = [services[service_id] for service_id in service_ids]
+            group_actions = set().union(
+                *(service.actions for service in group_services)
+            )
+            environment = _environment_service(
+                community_actions.difference(group_actions)
+            )
+            group_estimate = estimate_composition_size(
+                target, *group_services, environment
+            )
+            if not budget.admits(group_estimate, factored=True):
+                break
+        else:
+            return DECOMPOSED_ENGINE
+    raise CompositionTooLargeError(estimate, budget)
+
+
+def compose_within_budget(
+    target: Target,
+    *services: Service,
+    budget: CompositionBudget,
+    gamma: float = DEFAULT_GAMMA,
+    **solver_kwargs,
+) -> Union[SparsePolicy, DecomposedComposition]:
+    """
+    Compose and solve a target and a community with the cheapest engine within a budget.
+
+    The decomposed engine is not exact when a group can reach a failure
+    (see decomposition.DecomposedComposition.is_exact).
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param budget: the budget.
+    :param gamma: the discount factor.
+    :param solver_kwargs: the keyword arguments of solvers.solve
+    :return: the orchestrator, i.e. a policy or a decomposed composition.
+    """
+    engine = choose_engine(target, *services, budget=budget)
+    if engine == DECOMPOSED_ENGINE:
+        return decomposed_composition(
+            target, *services, gamma=gamma, factored=True, **solver_kwargs
+        )
+    mdp = composition_sparse_mdp(
+        target,
+        *services,
+        gamma=gamma,
+        factored=engine == FACTORED_ENGINE,
+        sliced=True,
+    )
+    return solve(mdp, **solver_kwargs)
+
+
+def _explored_size(
+    target: Target, services: Sequence[Service], nb_system_states: int
+) -> CompositionSizeEstimate:
+    """Count the states, the state-action pairs and the transitions of a composition, without storing it."""
+    nb_states = 0
+    nb_pairs = 0
+    nb_transitions = 0
+    previous_state = None
+    for transition in iter_composition(target, *services, factored=True, sliced=True):
+        # the transitions of a state are consecutive
+        if nb_pairs == 0 or transition.state != previous_state:
+            nb_states += 1
+            previous_state = transition.state
+        nb_pairs += 1
+        nb_transitions += len(transition.next_state_dist)
+    return CompositionSizeEstimate(
+        nb_system_states, nb_states, nb_pairs, nb_transitions
+    )
+
+
+def _service_slots(
+    target: Target, services: Sequence[Service], service_id: int
+) -> Dict[Tuple[State, Action], Set[State]]:
+    """
+    Explore a service together with the target, while the other services may perform the requests.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param service_id: the index of the service to explore.
+    :return: the reachable states of the service, by target state and symbol.
+    """
+    service = services[service_id]
+    other_actions = set().union(
+        set(),
+        *(
+            other_service.actions
+            for other_id, other_service in enumerate(services)
+            if other_id != service_id
+        ),
+    )
+    slots: Dict[Tuple[State, Action], Set[State]] = {}
+    queue: Deque[Tuple[State, State, Action]] = deque()
+
+    def _visit(state: State, target_state: State, symbol: Action) -> None:
+        slot = slots.setdefault((target_state, symbol), set())
+        if state not in slot:
+            slot.add(state)
+            queue.append((state, target_state, symbol))
+
+    for symbol in _initial_symbols(target):
+        _visit(service.initial_state, target.initial_state, symbol)
+    while len(queue) > 0:
+        state, target_state, symbol = queue.popleft()
+        next_target_state = target.transition_function[target_state].get(symbol)
+        if next_target_state is None:
+            continue
+        next_states = []
+        if symbol in other_actions:
+            next_states.append(state)
+        if symbol in service.transition_function.get(state, {}):
+            next_states.extend(service.transition_function[state][symbol][0])
+        for next_state in next_states:
+            for next_symbol in _symbols(target, next_target_state):
+                _visit(next_state, next_target_state, next_symbol)
+    return slots
+
+
+def _initial_symbols(target: Target) -> List[Action]:
+    """Get the actions of the initial transition, i.e. all of them, as in composition._initial_distribution."""
+    return list(target.policy[target.initial_state])
+
+
+def _symbols(target: Target, target_state: State) -> List[Action]:
+    """Get the actions that the target may request in a state, i.e. with positive probability."""
+    return [
+        symbol for symbol, prob in target.policy[target_state].items() if prob > 0.0
+    ]
+
+
+def _product(numbers: Sequence[int]) -> int:
+    """Compute the product of a sequence of integers."""
+    result = 1
+    for number in numbers:
+        result *= number
+    return result
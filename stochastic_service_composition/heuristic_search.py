@@ -0,0 +1,233 @@
+"""
+This module implements an on-the-fly heuristic search planner for the composition MDP.
+
+Instead of enumerating all the reachable composition states before solving,
+the planner (Improved LAO*, Hansen & Zilberstein, 2001) expands composition
+states lazily from COMPOSITION_MDP_INITIAL_STATE, following the greedy policy
+with respect to the current value estimates. Unexpanded states are valued by
+an admissible (i.e. optimistic) upper bound on the optimal value; hence, at
+convergence, only the states reachable under the optimal policy (and the
+ones needed to prove its optimality) have been materialized.
+"""
+from typing import Dict, List, Sequence, Set, Tuple, cast
+
+from mdp_dp_rl.processes.det_policy import DetPolicy
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_ACTION,
+    COMPOSITION_MDP_INITIAL_STATE,
+    DEFAULT_GAMMA,
+    _initial_distribution,
+    _state_transitions,
+)
+from stochastic_service_composition.services import Service, system_service_transitions
+from stochastic_service_composition.solvers import (
+    DEFAULT_MAX_ITERATIONS,
+    DEFAULT_TOLERANCE,
+)
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import (
+    Action,
+    CompositionState,
+    Prob,
+    Reward,
+    State,
+)
+
+_Transitions = Dict[Action, Tuple[Dict[State, Prob], Reward]]
+
+
+class HeuristicSearchPolicy(DetPolicy):
+    """A deterministic policy defined only on the states explored by the planner."""
+
+    def __init__(
+        self,
+        det_policy_data: Dict[State, Action],
+        values: Dict[State, float],
+        nb_expanded: int,
+    ):
+        """
+        Initialize the policy.
+
+        :param det_policy_data: the chosen action of every state of the solution graph
+        :param values: the value of every state of the solution graph
+        :param nb_expanded: the number of composition states expanded during the search
+        """
+        super().__init__(det_policy_data)
+        self.values = values
+        self.nb_expanded = nb_expanded
+
+
+def lao_star(
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+) -> HeuristicSearchPolicy:
+    """
+    Compute the optimal orchestrator policy with Improved LAO*.
+
+    Every iteration performs a depth-first traversal of the best partial
+    solution graph from the initial state: tip states are expanded, and
+    Bellman backups are performed in post-order. The search stops when no
+    tip state is reachable under the greedy policy and the Bellman residual
+    is below the tolerance.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param tol: the tolerance on the Bellman residual.
+    :param max_iterations: the maximum number of depth-first traversals.
+    :return: the optimal policy over the states of the solution graph.
+    """
+    upper_bound = _value_upper_bound(target, services, gamma)
+    transitions: Dict[State, _Transitions] = {
+        COMPOSITION_MDP_INITIAL_STATE: {
+            COMPOSITION_MDP_INITIAL_ACTION: (
+                _initial_distribution(
+                    target, tuple(service.initial_state for service in services)
+                ),
+                0.0,
+            )
+        }
+    }
+    values: Dict[State, float] = {}
+    policy: Dict[State, Action] = {}
+
+    def _backup(state: State) -> float:
+        """Back up a state, and return the absolute change of its value."""
+        best_action, best_value = None, float("-inf")
+        for action, (next_state_dist, reward) in transitions[state].items():
+            q_value = reward + gamma * sum(
+                prob * values.get(next_state, upper_bound)
+                for next_state, prob in next_state_dist.items()
+            )
+            if q_value > best_value:
+                best_action, best_value = action, q_value
+        residual = abs(best_value - values.get(state, upper_bound))
+        values[state] = best_value
+        policy[state] = best_action
+        return residual
+
+    _backup(COMPOSITION_MDP_INITIAL_STATE)
+    for _ in range(max_iterations):
+        nb_expanded, residual = _traverse_solution_graph(
+            target, services, transitions, policy, _backup
+        )
+        if nb_expanded == 0 and residual < tol:
+            break
+
+    solution_graph = _solution_graph(transitions, policy)
+    return HeuristicSearchPolicy(
+        {state: policy[state] for state in solution_graph},
+        {state: values[state] for state in solution_graph},
+        len(transitions),
+    )
+
+
+def _traverse_solution_graph(
+    target: Target,
+    services: Sequence[Service],
+    transitions: Dict[State, _Transitions],
+    policy: Dict[State, Action],
+    backup,
+) -> Tuple[int, float]:
+    """
+    Traverse the best partial solution graph depth-first, expanding its tips.
+
+    :return: the number of expanded states, and the maximum Bellman residual.
+    """
+    nb_expanded = 0
+    residual = 0.0
+    visited: Set[State] = {COMPOSITION_MDP_INITIAL_STATE}
+    stack: List[Tuple[State, List[State]]] = [
+        (
+            COMPOSITION_MDP_INITIAL_STATE,
+            _greedy_successors(transitions, policy, COMPOSITION_MDP_INITIAL_STATE),
+        )
+    ]
+    while len(stack) > 0:
+        state, successors = stack[-1]
+        if len(successors) > 0:
+            next_state = successors.pop()
+            if next_state in visited:
+                continue
+            visited.add(next_state)
+            if next_state not in transitions:
+                # tip state: expand it, and do not descend into its successors
+                transitions[next_state] = _state_transitions(
+                    target,
+                    system_service_transitions(
+                        services, cast(CompositionState, next_state)[0]
+                    ),
+                    next_state,
+                )
+                nb_expanded += 1
+                residual = max(residual, backup(next_state))
+                continue
+            stack.append(
+                (next_state, _greedy_successors(transitions, policy, next_state))
+            )
+            continue
+        # all the successors have been visited: back up in post-order
+        stack.pop()
+        residual = max(residual, backup(state))
+    return nb_expanded, residual
+
+
+def _greedy_successors(
+    transitions: Dict[State, _Transitions], policy: Dict[State, Action], state: State
+) -> List[State]:
+    """Get the successors of a state under the greedy action."""
+    next_state_dist, _reward = transitions[state][policy[state]]
+    return list(next_state_dist)
+
+
+def _solution_graph(
+    transitions: Dict[State, _Transitions], policy: Dict[State, Action]
+) -> List[State]:
+    """Get the expanded states reachable from the initial state under the greedy policy."""
+    reachable: List[State] = [COMPOSITION_MDP_INITIAL_STATE]
+    visited: Set[State] = {COMPOSITION_MDP_INITIAL_STATE}
+    for state in reachable:
+        for next_state in _greedy_successors(transitions, policy, state):
+            if next_state not in visited and next_state in transitions:
+                visited.add(next_state)
+                reachable.append(next_state)
+    return reachable
+
+
+def _value_upper_bound(
+    target: Target, services: Sequence[Service], gamma: float
+) -> float:
+    """
+    Compute an upper bound on the optimal value of any composition state.
+
+    The reward of a composition transition is the sum of a target reward and
+    of a service reward; sink and initial transitions have reward zero.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :return: the upper bound.
+    """
+    max_target_reward = max(
+        (
+            reward
+            for rewards_by_action in target.reward.values()
+            for reward in rewards_by_action.values()
+        ),
+        default=0.0,
+    )
+    max_service_reward = max(
+        (
+            reward
+            for service in services
+            for transitions_by_action in service.transition_function.values()
+            for _next_state_dist, reward in transitions_by_action.values()
+        ),
+        default=0.0,
+    )
+    max_reward = max(0.0, max_target_reward + max_service_reward)
+    return max_reward / (1.0 - gamma)
@@ -0,0 +1,226 @@
+"""
+This module implements the hierarchical composition of production cells.
+
+A plant is often split into cells, i.e. groups of services that serve a
+segment of the target, e.g. a cell for provisioning, moulding and drying,
+and another one for painting and shipping. Instead of composing all the
+services together, every cell is composed against its own segment of the
+target, i.e. the target states whose actions can all be performed by the
+services of the cell; the cost of the build is then the sum of the costs of
+the cells, instead of their product.
+
+The segment of a cell is a target on its own: a transition that leaves the
+segment is redirected to the state where the segment is entered again, as
+if the other cells were executed instantaneously. The optimal policy of the
+composition of a cell is then a macro-service, which serves the segment of
+the cell. At execution time, a controller delegates every target request to
+the policy of the cell whose segment contains the current target state; if
+more cells can serve the same state, it chooses the one with the highest
+value in the current state of its services.
+
+Since the services of a cell never change state while another cell is
+working, the only approximation is that the time spent in the other cells
+is not discounted: the choices of the controller may differ from the ones
+of the flat composition only when the alternatives of a cell are almost
+equivalent.
+"""
+from collections import deque
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Set, cast
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_ACTION,
+    COMPOSITION_MDP_INITIAL_STATE,
+    COMPOSITION_MDP_UNDEFINED_ACTION,
+    DEFAULT_GAMMA,
+)
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.solvers import SparsePolicy, solve
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
+from stochastic_service_composition.target import Target, build_target_from_transitions
+from stochastic_service_composition.types import (
+    Action,
+    CompositionState,
+    State,
+    TargetDynamics,
+    TransitionFunction,
+)
+
+
+class CellComposition(NamedTuple):
+    """The composition of a production cell against its segment of the target."""
+
+    name: str
+    service_ids: Sequence[int]
+    target: Target
+    mdp: SparseMDP
+    policy: SparsePolicy
+
+
+class HierarchicalController:
+    """A controller that delegates every target request to the policy of a cell."""
+
+    def __init__(self, cells: Sequence[CellComposition]):
+        """
+        Initialize the controller.
+
+        :param cells: the compositions of the cells
+        """
+        self.cells = list(cells)
+        self.cells_by_target_state: Dict[State, List[CellComposition]] = {}
+        for cell in self.cells:
+            for target_state in cell.target.transition_function:
+                self.cells_by_target_state.setdefault(target_state, []).append(cell)
+
+    def get_cell_for_state(self, state: State) -> Optional[CellComposition]:
+        """
+        Get the cell that serves a state of the (flat) composition MDP.
+
+        :param state: the composition state ((s_1, ..., s_n), target state, symbol)
+        :return: the cell with the highest value in the state, or None if no cell can serve it.
+        """
+        _system_state, target_state, _symbol = cast(CompositionState, state)
+        best_cell, best_value = None, float("-inf")
+        for cell in self.cells_by_target_state.get(target_state, []):
+            state_id = cell.mdp.state_ids.get(_local_state(cell, state))
+            if state_id is None:
+                continue
+            action = cell.mdp.actions[cell.policy.action_ids[state_id]]
+            value = cell.policy.values[state_id]
+            if action != COMPOSITION_MDP_UNDEFINED_ACTION and value > best_value:
+                best_cell, best_value = cell, value
+        return best_cell
+
+    def get_action_for_state(self, state: State) -> Action:
+        """
+        Get the action chosen in a state of the (flat) composition MDP.
+
+        :param state: the composition state ((s_1, ..., s_n), target state, symbol)
+        :return: the index of the chosen service, or the 'initial' or 'undefined' actions.
+        """
+        if state == COMPOSITION_MDP_INITIAL_STATE:
+            return COMPOSITION_MDP_INITIAL_ACTION
+        cell = self.get_cell_for_state(state)
+        if cell is None:
+            return COMPOSITION_MDP_UNDEFINED_ACTION
+        local_service_id = cell.policy.get_action_for_state(_local_state(cell, state))
+        return cell.service_ids[local_service_id]
+
+    def __repr__(self) -> str:
+        """Get the string representation."""
+        cell_names = [cell.name for cell in self.cells]
+        return f"{type(self).__name__}(cells={cell_names})"
+
+
+def segment_target(target: Target, actions: Set[Action]) -> Target:
+    """
+    Compute the segment of a target that can be served with a set of actions.
+
+    The states of the segment are the target states whose actions are all in
+    the given set. A transition to a state outside the segment is redirected
+    to the first state of the segment reached from there.
+
+    :param target: the target service
+    :param actions: the actions that can be performed, e.g. by the services of a cell
+    :return: the segment, as a target service
+    """
+    segment_states = {
+        state
+        for state, prob_by_action in target.policy.items()
+        if len(prob_by_action) > 0 and set(prob_by_action).issubset(actions)
+    }
+    if len(segment_states) == 0:
+        raise ValueError(f"no target state can be served with actions {actions}")
+    # the transitions of a target are deterministic: map the actions to the next states
+    transition_function = cast(TransitionFunction, target.transition_function)
+    dynamics: TargetDynamics = {}
+    for state in segment_states:
+        dynamics[state] = {}
+        for action, next_state in transition_function[state].items():
+            if next_state not in segment_states:
+                next_state = _next_segment_state(target, next_state, segment_states)
+            dynamics[state][action] = (
+                next_state,
+                target.policy[state][action],
+                target.reward[state][action],
+            )
+    initial_state = _next_segment_state(target, target.initial_state, segment_states)
+    final_states = segment_states.intersection(target.final_states) or {initial_state}
+    return build_target_from_transitions(dynamics, initial_state, final_states)
+
+
+def hierarchical_composition(
+    target: Target,
+    *services: Service,
+    cells: Mapping[str, Sequence[int]],
+    gamma: float = DEFAULT_GAMMA,
+    factored: bool = False,
+    **solver_kwargs,
+) -> HierarchicalController:
+    """
+    Compose every cell against its segment of the target, and build the controller of the cells.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param cells: the indices of the services of every cell, by name of the cell.
+    :param gamma: the discount factor.
+    :param factored: if True, use a factored system service instead of building the product of the services of a cell.
+    :param solver_kwargs: the keyword arguments of solvers.solve
+    :return: the controller of the cells.
+    """
+    compositions = []
+    for name, service_ids in cells.items():
+        cell_services = [services[service_id] for service_id in service_ids]
+        actions = set().union(*(service.actions for service in cell_services))
+        cell_target = segment_target(target, actions)
+        # the product of a single service is not defined: use the factored system service
+        mdp = composition_sparse_mdp(
+            cell_target,
+            *cell_services,
+            gamma=gamma,
+            factored=factored or len(cell_services) < 2,
+        )
+        policy = solve(mdp, **solver_kwargs)
+        compositions.append(
+            CellComposition(name, tuple(service_ids), cell_target, mdp, policy)
+        )
+    return HierarchicalController(compositions)
+
+
+def _next_segment_state(
+    target: Target, state: State, segment_states: Set[State]
+) -> State:
+    """
+    Get the first state of a segment reached from a target state.
+
+    :param target: the target service
+    :param state: the target state
+    :param segment_states: the states of the segment
+    :return: the (unique) state of the segment reached first, through states outside the segment
+    """
+    reached = set()
+    visited = {state}
+    queue = deque([state])
+    while len(queue) > 0:
+        current_state = queue.popleft()
+        if current_state in segment_states:
+            reached.add(current_state)
+            continue
+        for action in target.policy.get(current_state, {}):
+            next_state = target.transition_function[current_state][action]
+            if next_state not in visited:
+                visited.add(next_state)
+                queue.append(next_state)
+    if len(reached) != 1:
+        raise ValueError(
+            f"expected one segment state reachable from {state}, got {reached}"
+        )
+    return reached.pop()
+
+
+def _local_state(cell: CellComposition, state: State) -> State:
+    """Project a state of the (flat) composition MDP onto the services of a cell."""
+    system_state, target_state, symbol = cast(CompositionState, state)
+    local_system_state = tuple(
+        system_state[service_id] for service_id in cell.service_ids
+    )
+    return local_system_state, target_state, symbol
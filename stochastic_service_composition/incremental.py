@@ -0,0 +1,268 @@
+"""
+This module implements the incremental update of a sparse composition MDP.
+
+When the transition function of a single service changes (e.g. after a
+degradation update of a breakable service), only the composition states
+in which that service can serve the requested symbol, from one of the
+changed service states, have different outgoing transitions. This module
+recomputes only those transitions, and patches the previous composition.
+"""
+import copy
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Sequence, Set, Tuple, cast
+
+import numpy as np
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_STATE,
+    _state_transitions,
+)
+from stochastic_service_composition.services import Service, system_service_transitions
+from stochastic_service_composition.sparse import (
+    INDEX_DTYPE,
+    POINTER_DTYPE,
+    VALUE_DTYPE,
+    SparseMDP,
+)
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import (
+    Action,
+    CompositionState,
+    MDPDynamics,
+    Prob,
+    Reward,
+    State,
+)
+
+_Transitions = Dict[Action, Tuple[Dict[State, Prob], Reward]]
+
+
+class CompositionUpdate(NamedTuple):
+    """The result of an incremental update of a composition MDP."""
+
+    mdp: SparseMDP
+    touched_states: np.ndarray
+
+
+def update_composition(
+    mdp: SparseMDP,
+    target: Target,
+    services: Sequence[Service],
+    service_index: int,
+    new_transition_function: MDPDynamics,
+) -> CompositionUpdate:
+    """
+    Update a composition MDP after a change of the transition function of a service.
+
+    The previous composition is not modified. If the support of every changed
+    transition is unchanged, the returned MDP shares the structural arrays with
+    the previous one, and only probabilities and rewards are patched.
+    Otherwise, the affected rows are spliced; new composition states, if any,
+    are explored and appended after the existing ones, so that the identifiers
+    of the previous states are preserved. Previous states that are no longer
+    reachable are kept.
+
+    :param mdp: the previous composition MDP, as computed by sparse.composition_sparse_mdp
+    :param target: the target service.
+    :param services: the community of services the previous composition was computed from.
+    :param service_index: the index of the service whose transition function changed.
+    :param new_transition_function: the new transition function of the service.
+    :return: the updated composition MDP, and the identifiers of the touched states.
+    """
+    old_service = services[service_index]
+    changed = _changed_transitions(
+        old_service.transition_function, new_transition_function
+    )
+    new_services = list(services)
+    new_services[service_index] = Service(
+        old_service.states,
+        old_service.actions,
+        old_service.final_states,
+        old_service.initial_state,
+        new_transition_function,
+    )
+
+    new_rows: Dict[int, _Transitions] = {}
+    for state_id, state in enumerate(mdp.states):
+        if state == COMPOSITION_MDP_INITIAL_STATE:
+            continue
+        system_state, _target_state, symbol = cast(CompositionState, state)
+        if (system_state[service_index], symbol) in changed:
+            new_rows[state_id] = _expand(target, new_services, state)
+
+    if _same_structure(mdp, new_rows):
+        return CompositionUpdate(
+            _patch(mdp, new_rows), np.array(sorted(new_rows), dtype=INDEX_DTYPE)
+        )
+
+    new_states = _explore_new_states(mdp, target, new_services, new_rows)
+    return CompositionUpdate(
+        _splice(mdp, new_rows, new_states),
+        np.array(sorted(new_rows), dtype=INDEX_DTYPE),
+    )
+
+
+def _changed_transitions(
+    old_transition_function: MDPDynamics, new_transition_function: MDPDynamics
+) -> Set[Tuple[State, Action]]:
+    """Compute the (service state, action) pairs whose transition has changed."""
+    changed: Set[Tuple[State, Action]] = set()
+    for state in set(old_transition_function).union(new_transition_function):
+        old_transitions = old_transition_function.get(state, {})
+        new_transitions = new_transition_function.get(state, {})
+        for action in set(old_transitions).union(new_transitions):
+            old_transition = old_transitions.get(action)
+            new_transition = new_transitions.get(action)
+            if old_transition is None or new_transition is None:
+                changed.add((state, action))
+            elif tuple(old_transition) != tuple(new_transition):
+                changed.add((state, action))
+    return changed
+
+
+def _expand(target: Target, services: Sequence[Service], state: State) -> _Transitions:
+    """Compute the outgoing transitions of a composition state."""
+    system_state = cast(CompositionState, state)[0]
+    return _state_transitions(
+        target, system_service_transitions(services, system_state), state
+    )
+
+
+def _same_structure(mdp: SparseMDP, new_rows: Dict[int, _Transitions]) -> bool:
+    """Check whether the new rows have the same actions and supports of the previous ones."""
+    for state_id, transitions in new_rows.items():
+        pairs = mdp.get_pairs(state_id)
+        if len(pairs) != len(transitions):
+            return False
+        for pair_id, (action, (next_state_dist, _reward)) in zip(
+            pairs, transitions.items()
+        ):
+            if mdp.actions[mdp.pair_actions[pair_id]] != action:
+                return False
+            start, end = mdp.pair_ptr[pair_id], mdp.pair_ptr[pair_id + 1]
+            if end - start != len(next_state_dist):
+                return False
+            for next_state_id, next_state in zip(
+                mdp.next_states[start:end], next_state_dist
+            ):
+                if mdp.states[next_state_id] != next_state:
+                    return False
+    return True
+
+
+def _patch(mdp: SparseMDP, new_rows: Dict[int, _Transitions]) -> SparseMDP:
+    """Patch probabilities and rewards, sharing the structure with the previous MDP."""
+    rewards = mdp.rewards.copy()
+    probabilities = mdp.probabilities.copy()
+    for state_id, transitions in new_rows.items():
+        for pair_id, (next_state_dist, reward) in zip(
+            mdp.get_pairs(state_id), transitions.values()
+        ):
+            rewards[pair_id] = reward
+            start, end = mdp.pair_ptr[pair_id], mdp.pair_ptr[pair_id + 1]
+            probabilities[start:end] = list(next_state_dist.values())
+    patched_mdp = copy.copy(mdp)
+    patched_mdp.rewards = rewards
+    patched_mdp.probabilities = probabilities
+    return patched_mdp
+
+
+def _explore_new_states(
+    mdp: SparseMDP,
+    target: Target,
+    services: Sequence[Service],
+    new_rows: Dict[int, _Transitions],
+) -> List[State]:
+    """
+    Explore the composition states that are not in the previous MDP.
+
+    The transitions of the new states are added to new_rows, with identifiers
+    following the ones of the previous states.
+
+    :return: the new states, sorted by identifier.
+    """
+    new_states: List[State] = []
+    new_state_ids: Dict[State, int] = {}
+    queue: Deque[int] = deque(new_rows)
+    while len(queue) > 0:
+        state_id = queue.popleft()
+        for next_state_dist, _reward in new_rows[state_id].values():
+            for next_state in next_state_dist:
+                if next_state in mdp.state_ids or next_state in new_state_ids:
+                    continue
+                next_state_id = mdp.nb_states + len(new_states)
+                new_state_ids[next_state] = next_state_id
+                new_states.append(next_state)
+                new_rows[next_state_id] = _expand(target, services, next_state)
+                queue.append(next_state_id)
+    return new_states
+
+
+def _splice(
+    mdp: SparseMDP, new_rows: Dict[int, _Transitions], new_states: List[State]
+) -> SparseMDP:
+    """Rebuild the CSR arrays, replacing the rows of the touched states."""
+    states = mdp.states + new_states
+    state_ids = dict(mdp.state_ids)
+    state_ids.update(
+        (state, mdp.nb_states + offset) for offset, state in enumerate(new_states)
+    )
+    actions = list(mdp.actions)
+    action_ids = dict(mdp.action_ids)
+
+    pair_counts: List[np.ndarray] = []
+    pair_lengths: List[np.ndarray] = []
+    pair_actions: List[np.ndarray] = []
+    rewards: List[np.ndarray] = []
+    next_states: List[np.ndarray] = []
+    probabilities: List[np.ndarray] = []
+    old_state_counts = np.diff(mdp.state_ptr)
+    old_pair_lengths = np.diff(mdp.pair_ptr)
+
+    def _copy_old_rows(start_state: int, end_state: int) -> None:
+        if start_state >= end_state:
+            return
+        start_pair, end_pair = mdp.state_ptr[start_state], mdp.state_ptr[end_state]
+        start, end = mdp.pair_ptr[start_pair], mdp.pair_ptr[end_pair]
+        pair_counts.append(old_state_counts[start_state:end_state])
+        pair_lengths.append(old_pair_lengths[start_pair:end_pair])
+        pair_actions.append(mdp.pair_actions[start_pair:end_pair])
+        rewards.append(mdp.rewards[start_pair:end_pair])
+        next_states.append(mdp.next_states[start:end])
+        probabilities.append(mdp.probabilities[start:end])
+
+    def _add_new_row(transitions: _Transitions) -> None:
+        pair_counts.append(np.array([len(transitions)]))
+        for action, (next_state_dist, reward) in transitions.items():
+            if action not in action_ids:
+                action_ids[action] = len(actions)
+                actions.append(action)
+            pair_lengths.append(np.array([len(next_state_dist)]))
+            pair_actions.append(np.array([action_ids[action]]))
+            rewards.append(np.array([reward]))
+            next_states.append(np.array([state_ids[s] for s in next_state_dist]))
+            probabilities.append(np.array(list(next_state_dist.values())))
+
+    previous_state_id = 0
+    for state_id in sorted(new_rows):
+        _copy_old_rows(previous_state_id, min(state_id, mdp.nb_states))
+        _add_new_row(new_rows[state_id])
+        previous_state_id = state_id + 1
+    _copy_old_rows(previous_state_id, mdp.nb_states)
+
+    state_ptr = np.zeros(len(states) + 1, dtype=POINTER_DTYPE)
+    np.cumsum(np.concatenate(pair_counts), out=state_ptr[1:])
+    lengths = np.concatenate(pair_lengths)
+    pair_ptr = np.zeros(len(lengths) + 1, dtype=POINTER_DTYPE)
+    np.cumsum(lengths, out=pair_ptr[1:])
+    return SparseMDP(
+        states,
+        actions,
+        state_ptr,
+        np.concatenate(pair_actions).astype(INDEX_DTYPE),
+        np.concatenate(rewards).astype(VALUE_DTYPE),
+        pair_ptr,
+        np.concatenate(next_states).astype(INDEX_DTYPE),
+        np.concatenate(probabilities).astype(VALUE_DTYPE),
+        mdp.gamma,
+    )
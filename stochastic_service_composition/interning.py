@@ -0,0 +1,85 @@
+"""
+This module implements the interning (hash-consing) of states and distributions.
+
+Building the system service and the composition MDP creates many equal
+objects: the same string states in different services, the same system-state
+tuples as successors of different states, and the same distributions (e.g.
+{"available": 1.0}) in many transitions. An Interner returns a single
+canonical instance for every group of equal objects, so that the duplicates
+can be garbage-collected.
+
+Interned distributions are shared: they must not be modified in place.
+"""
+import sys
+from typing import Any, Dict, NamedTuple, Tuple
+
+from stochastic_service_composition.types import Prob, State
+
+
+class InterningReport(NamedTuple):
+    """The statistics of an interner."""
+
+    nb_lookups: int
+    nb_hits: int
+    bytes_saved: int
+
+
+class Interner:
+    """A table of canonical states, system-state tuples and distributions."""
+
+    def __init__(self) -> None:
+        """Initialize the interner."""
+        self._objects: Dict[Any, Any] = {}
+        self._distributions: Dict[Tuple, Dict[State, Prob]] = {}
+        self.nb_lookups = 0
+        self.nb_hits = 0
+        self.bytes_saved = 0
+
+    def intern(self, obj: Any) -> Any:
+        """
+        Get the canonical instance of a state.
+
+        Strings, and tuples whose components are (recursively) strings or
+        tuples, are interned; other objects are returned unchanged, since
+        equal objects of different types (e.g. 1 and 1.0) must not be merged.
+
+        :param obj: the state
+        :return: the canonical instance of the state
+        """
+        if isinstance(obj, tuple):
+            components = tuple(self.intern(component) for component in obj)
+            if not all(isinstance(component, (str, tuple)) for component in components):
+                return obj
+            obj = components
+        elif not isinstance(obj, str):
+            return obj
+        self.nb_lookups += 1
+        canonical = self._objects.setdefault(obj, obj)
+        if canonical is not obj:
+            self.nb_hits += 1
+            self.bytes_saved += sys.getsizeof(obj)
+        return canonical
+
+    def intern_distribution(self, distribution: Dict[State, Prob]) -> Dict[State, Prob]:
+        """
+        Get the canonical instance of a distribution over states.
+
+        Distributions are equal if they have the same items in the same order,
+        so that the iteration order of the canonical instance is preserved.
+
+        :param distribution: the distribution
+        :return: the canonical instance, with interned states; it must not be modified.
+        """
+        key = tuple((self.intern(state), prob) for state, prob in distribution.items())
+        self.nb_lookups += 1
+        canonical = self._distributions.get(key)
+        if canonical is None:
+            canonical = self._distributions[key] = dict(key)
+        else:
+            self.nb_hits += 1
+            self.bytes_saved += sys.getsizeof(distribution)
+        return canonical
+
+    def report(self) -> InterningReport:
+        """Get the statistics of the interner."""
+        return InterningReport(self.nb_lookups, self.nb_hits, self.bytes_saved)
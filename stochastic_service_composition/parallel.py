@@ -0,0 +1,256 @@
+"""
+This module implements the multi-process construction of the composition state space.
+
+The breadth-first explorations of build_system_service and composition_mdp
+are made level-synchronous: the frontier of each level is partitioned in
+chunks, the chunks are expanded by a pool of worker processes, and the
+results are merged in frontier order. Since the queue of a breadth-first
+search is the concatenation of its levels, the states are discovered, and
+numbered, exactly in the same order of the sequential exploration; hence,
+the output is identical to the sequential one.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    cast,
+)
+
+from mdp_dp_rl.processes.mdp import MDP
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_ACTION,
+    COMPOSITION_MDP_INITIAL_STATE,
+    DEFAULT_GAMMA,
+    _initial_distribution,
+    _state_transitions,
+)
+from stochastic_service_composition.services import (
+    FactoredSystemService,
+    Service,
+    system_service_transitions,
+)
+from stochastic_service_composition.sparse import SparseMDP, _composition_actions
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import (
+    Action,
+    CompositionState,
+    MDPDynamics,
+    Prob,
+    Reward,
+    State,
+)
+
+DEFAULT_CHUNK_SIZE = 256
+
+_Transitions = Dict[Action, Tuple[Dict[State, Prob], Reward]]
+
+# the context of the worker processes, set by the pool initializer
+_worker_context: Dict[str, Any] = {}
+
+
+def parallel_build_system_service(
+    *services: Service,
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Service:
+    """
+    Do the build_system_service between services, using multiple processes.
+
+    :param services: a list of service instances
+    :param max_workers: the maximum number of worker processes (default: the number of CPUs)
+    :param chunk_size: the number of states expanded by a worker at a time
+    :return: the system service, identical to the one of build_system_service
+    """
+    assert len(services) >= 2, "at least two services"
+    initial_state = tuple(service.initial_state for service in services)
+    factored_system_service = FactoredSystemService(services)
+
+    transition_function: MDPDynamics = {}
+    actions: Set[Tuple[Action, int]] = set()
+    final_states: Set[State] = set()
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_initialize_worker,
+        initargs=(None, services),
+    ) as executor:
+        for state, transitions in _parallel_explore(
+            executor, [initial_state], _expand_system_states, chunk_size
+        ):
+            transition_function[state] = transitions
+            actions.update(transitions)
+            if factored_system_service.is_final(cast(Tuple[State, ...], state)):
+                final_states.add(state)
+
+    return Service(
+        states=set(transition_function),
+        actions=actions,
+        final_states=final_states,
+        initial_state=initial_state,
+        transition_function=transition_function,
+    )
+
+
+def parallel_composition_dynamics(
+    target: Target,
+    *services: Service,
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Tuple[State, _Transitions]]:
+    """
+    Explore the composition MDP, using multiple processes.
+
+    Workers use a factored system service, hence the product of the
+    services is never materialized.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param max_workers: the maximum number of worker processes (default: the number of CPUs)
+    :param chunk_size: the number of states expanded by a worker at a time
+    :return: an iterator over pairs (state, transitions by action), in the same order of
+      composition.iter_composition_dynamics.
+    """
+    system_initial_state = tuple(service.initial_state for service in services)
+    initial_transition_dist = _initial_distribution(target, system_initial_state)
+    yield COMPOSITION_MDP_INITIAL_STATE, {
+        COMPOSITION_MDP_INITIAL_ACTION: (initial_transition_dist, 0.0)
+    }
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_initialize_worker,
+        initargs=(target, services),
+    )
+    try:
+        yield from _parallel_explore(
+            executor,
+            list(initial_transition_dist),
+            _expand_composition_states,
+            chunk_size,
+        )
+    finally:
+        # if the consumer stops early, the pending chunks are not expanded
+        executor.shutdown(cancel_futures=True)
+
+
+def parallel_composition_mdp(
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> MDP:
+    """
+    Compute the composition MDP, using multiple processes.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param max_workers: the maximum number of worker processes (default: the number of CPUs)
+    :param chunk_size: the number of states expanded by a worker at a time
+    :return: the composition MDP, identical to the one of composition.composition_mdp
+    """
+    transition_function: MDPDynamics = dict(
+        parallel_composition_dynamics(
+            target, *services, max_workers=max_workers, chunk_size=chunk_size
+        )
+    )
+    return MDP(transition_function, gamma)
+
+
+def parallel_composition_sparse_mdp(
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> SparseMDP:
+    """
+    Compute the composition MDP in sparse format, using multiple processes.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param max_workers: the maximum number of worker processes (default: the number of CPUs)
+    :param chunk_size: the number of states expanded by a worker at a time
+    :return: the composition MDP, identical to the one of sparse.composition_sparse_mdp
+    """
+    return SparseMDP.from_dynamics(
+        parallel_composition_dynamics(
+            target, *services, max_workers=max_workers, chunk_size=chunk_size
+        ),
+        gamma,
+        actions=_composition_actions(len(services)),
+    )
+
+
+def _parallel_explore(
+    executor: Executor,
+    initial_states: List[State],
+    expand_chunk: Callable[[List[State]], List[_Transitions]],
+    chunk_size: int,
+) -> Iterator[Tuple[State, _Transitions]]:
+    """
+    Do a level-synchronous breadth-first exploration.
+
+    :param executor: the executor that expands the chunks of the frontier
+    :param initial_states: the states of the first level
+    :param expand_chunk: the (picklable) function that expands a chunk of states
+    :param chunk_size: the maximum number of states in a chunk
+    :return: an iterator over pairs (state, transitions), in breadth-first order
+    """
+    discovered = set(initial_states)
+    frontier = initial_states
+    while len(frontier) > 0:
+        chunks = [
+            frontier[start : start + chunk_size]
+            for start in range(0, len(frontier), chunk_size)
+        ]
+        next_frontier: List[State] = []
+        # executor.map returns the results in the order of the chunks
+        for chunk, chunk_transitions in zip(chunks, executor.map(expand_chunk, chunks)):
+            for state, transitions in zip(chunk, chunk_transitions):
+                for next_state_dist, _reward in transitions.values():
+                    for next_state in next_state_dist:
+                        if next_state not in discovered:
+                            discovered.add(next_state)
+                            next_frontier.append(next_state)
+                yield state, transitions
+        frontier = next_frontier
+
+
+def _initialize_worker(target: Optional[Target], services: Sequence[Service]) -> None:
+    """Initialize the context of a worker process."""
+    _worker_context["target"] = target
+    _worker_context["services"] = services
+    _worker_context["system_service"] = FactoredSystemService(services)
+
+
+def _expand_system_states(states: List[State]) -> List[_Transitions]:
+    """Expand a chunk of system states, in a worker process."""
+    services = _worker_context["services"]
+    return [
+        system_service_transitions(services, cast(Tuple[State, ...], state))
+        for state in states
+    ]
+
+
+def _expand_composition_states(states: List[State]) -> List[_Transitions]:
+    """Expand a chunk of composition states, in a worker process."""
+    target = _worker_context["target"]
+    system_service = _worker_context["system_service"]
+    return [
+        _state_transitions(
+            target,
+            system_service.transition_function[cast(CompositionState, state)[0]],
+            state,
+            capabilities=system_service.capabilities,
+        )
+        for state in states
+    ]
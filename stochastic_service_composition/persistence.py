@@ -0,0 +1,162 @@
+"""
+This module implements the persistence of sparse composition MDPs and policies.
+
+A composition file is made of:
+
+- a magic string, followed by the length of the header (8 bytes, little endian);
+- a JSON header, with the discount factor, user metadata, and the dtype,
+  shape and offset of every array;
+- the arrays of the dynamics (and, optionally, of the policy), in raw
+  format and aligned to ALIGNMENT bytes, so that they can be memory-mapped;
+- the table of states and actions, pickled.
+
+Loading a composition file with memory mapping does not read the arrays,
+hence its cost is dominated by the unpickling of the state table.
+"""
+import json
+import pickle  # nosec
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+import numpy as np
+
+from stochastic_service_composition.solvers import SparsePolicy
+from stochastic_service_composition.sparse import SparseMDP
+
+MAGIC = b"SSCMDP01"
+ALIGNMENT = 64
+_HEADER_LENGTH_SIZE = 8
+_MDP_ARRAYS = (
+    "state_ptr",
+    "pair_actions",
+    "rewards",
+    "pair_ptr",
+    "next_states",
+    "probabilities",
+)
+_POLICY_ARRAYS = ("pair_ids", "values")
+
+
+class LoadedComposition(NamedTuple):
+    """The content of a composition file."""
+
+    mdp: SparseMDP
+    policy: Optional[SparsePolicy]
+    metadata: Dict[str, str]
+
+
+def save_composition(
+    path: Union[str, Path],
+    mdp: SparseMDP,
+    policy: Optional[SparsePolicy] = None,
+    metadata: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    Save a sparse MDP, and optionally its policy, to a composition file.
+
+    :param path: the path of the composition file
+    :param mdp: the sparse MDP
+    :param policy: the policy of the MDP (optional)
+    :param metadata: JSON-serializable metadata, e.g. the spec hash of the problem (optional)
+    :raises ValueError: if the policy is not defined over the MDP
+    """
+    arrays = {name: getattr(mdp, name) for name in _MDP_ARRAYS}
+    if policy is not None:
+        if policy.mdp is not mdp:
+            raise ValueError("the policy must be defined over the saved MDP")
+        arrays.update({name: getattr(policy, name) for name in _POLICY_ARRAYS})
+    arrays = {name: np.ascontiguousarray(array_) for name, array_ in arrays.items()}
+    state_table = pickle.dumps((mdp.states, mdp.actions), pickle.HIGHEST_PROTOCOL)
+
+    # the offsets are relative to the end of the header
+    array_specs = {}
+    offset = 0
+    for name, array_ in arrays.items():
+        array_specs[name] = {
+            "dtype": array_.dtype.str,
+            "shape": list(array_.shape),
+            "offset": offset,
+        }
+        offset = _align(offset + array_.nbytes)
+    header = {
+        "gamma": mdp.gamma,
+        "metadata": metadata or {},
+        "arrays": array_specs,
+        "state_table": {"offset": offset, "length": len(state_table)},
+    }
+    encoded_header = json.dumps(header).encode("utf-8")
+    data_start = _align(len(MAGIC) + _HEADER_LENGTH_SIZE + len(encoded_header))
+
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(len(encoded_header).to_bytes(_HEADER_LENGTH_SIZE, "little"))
+        file.write(encoded_header)
+        for name, array_ in arrays.items():
+            file.seek(data_start + array_specs[name]["offset"])
+            file.write(array_.tobytes())
+        file.seek(data_start + offset)
+        file.write(state_table)
+
+
+def load_composition(path: Union[str, Path], mmap: bool = True) -> LoadedComposition:
+    """
+    Load a sparse MDP, and its policy if any, from a composition file.
+
+    :param path: the path of the composition file
+    :param mmap: whether to memory-map the arrays (read-only) instead of reading them
+    :return: the MDP, the policy (None if it was not saved) and the metadata
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a composition file")
+        header_length = int.from_bytes(file.read(_HEADER_LENGTH_SIZE), "little")
+        header = json.loads(file.read(header_length).decode("utf-8"))
+        data_start = _align(len(MAGIC) + _HEADER_LENGTH_SIZE + header_length)
+        state_table_spec = header["state_table"]
+        file.seek(data_start + state_table_spec["offset"])
+        states, actions = pickle.loads(  # nosec
+            file.read(state_table_spec["length"])
+        )
+
+    arrays = {
+        name: _load_array(path, data_start, spec, mmap)
+        for name, spec in header["arrays"].items()
+    }
+    mdp = SparseMDP(
+        states,
+        actions,
+        state_ptr=arrays["state_ptr"],
+        pair_actions=arrays["pair_actions"],
+        rewards=arrays["rewards"],
+        pair_ptr=arrays["pair_ptr"],
+        next_states=arrays["next_states"],
+        probabilities=arrays["probabilities"],
+        gamma=header["gamma"],
+    )
+    policy = None
+    if all(name in arrays for name in _POLICY_ARRAYS):
+        policy = SparsePolicy(
+            mdp, pair_ids=arrays["pair_ids"], values=arrays["values"]
+        )
+    return LoadedComposition(mdp, policy, header["metadata"])
+
+
+def _load_array(
+    path: Union[str, Path], data_start: int, spec: Dict, mmap: bool
+) -> np.ndarray:
+    """Load an array of a composition file."""
+    dtype = np.dtype(spec["dtype"])
+    shape = tuple(spec["shape"])
+    offset = data_start + spec["offset"]
+    if int(np.prod(shape)) == 0:
+        # empty arrays cannot be memory-mapped
+        return np.empty(shape, dtype=dtype)
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+    array_ = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)), offset=offset)
+    return array_.reshape(shape)
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next multiple of ALIGNMENT."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -0,0 +1,156 @@
+"""
+This module implements a qualitative realizability check of a target by a community.
+
+The check is a safety game on the graph of the composition: in every state,
+the orchestrator chooses a service that can perform the requested action,
+and the environment chooses the next action of the target and the next
+state of the service, among the ones with positive probability. The target
+is realizable if the orchestrator can avoid forever the states in which no
+service can perform the requested action, i.e. if the initial state is not
+in the attractor of the environment to those states.
+
+The probabilities and the rewards are ignored, so that there is no numeric
+solving: the attractor is computed backwards from the failure states with a
+counter of the choices not yet losing for every state, in time linear in the
+size of the graph. The graph is explored on the slice of the community (see
+slicing.py), with a factored system service.
+"""
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, cast
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_UNDEFINED_ACTION,
+    _composition_dynamics,
+)
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import Action, CompositionState, State
+
+
+class UnservableRequest(NamedTuple):
+    """A request of the target that the orchestrator cannot be sure to serve."""
+
+    system_state: Tuple[State, ...]
+    target_state: State
+    action: Action
+
+
+class _GameGraph(NamedTuple):
+    """The game graph of a composition: the states, and the choices of the orchestrator."""
+
+    states: List[State]
+    choice_successors: List[List[int]]
+    choice_state: List[int]
+    predecessors: Dict[int, List[int]]
+    nb_choices_by_state: Dict[int, int]
+    failures: List[int]
+
+
+def find_unservable_request(
+    target: Target, *services: Service
+) -> Optional[UnservableRequest]:
+    """
+    Check whether a community can serve a target, whatever the outcomes of the actions.
+
+    If the target is not realizable, the environment can force the
+    composition into a state where the requested action cannot be performed
+    by any service; the first one met from the initial state, following a
+    strategy of the environment that reaches the failures as soon as
+    possible, is returned as counterexample.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :return: None if the target is realizable, otherwise an unservable request.
+    """
+    graph = _game_graph(target, services)
+    losing_states, losing_successor = _environment_attractor(graph)
+    initial_state_id = 0
+    if initial_state_id not in losing_states:
+        return None
+    failure = _counterexample(graph, losing_successor, initial_state_id)
+    system_state, target_state, action = cast(CompositionState, graph.states[failure])
+    return UnservableRequest(system_state, target_state, action)
+
+
+def is_realizable(target: Target, *services: Service) -> bool:
+    """
+    Check whether a community can serve a target, whatever the outcomes of the actions.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :return: True if the target is realizable.
+    """
+    return find_unservable_request(target, *services) is None
+
+
+def _game_graph(target: Target, services: Sequence[Service]) -> _GameGraph:
+    """Explore the game graph of the composition, on the slice of the community."""
+    state_ids: Dict[State, int] = {}
+    graph = _GameGraph([], [], [], {}, {}, [])
+
+    def _get_state_id(state: State) -> int:
+        state_id = state_ids.get(state)
+        if state_id is None:
+            state_id = len(graph.states)
+            state_ids[state] = state_id
+            graph.states.append(state)
+        return state_id
+
+    for state, transitions in _composition_dynamics(
+        target, services, factored=True, sliced=True
+    ):
+        state_id = _get_state_id(state)
+        if COMPOSITION_MDP_UNDEFINED_ACTION in transitions:
+            graph.failures.append(state_id)
+            continue
+        graph.nb_choices_by_state[state_id] = len(transitions)
+        for next_state_dist, _reward in transitions.values():
+            choice_id = len(graph.choice_successors)
+            successors = [_get_state_id(next_state) for next_state in next_state_dist]
+            graph.choice_successors.append(successors)
+            graph.choice_state.append(state_id)
+            for successor in successors:
+                graph.predecessors.setdefault(successor, []).append(choice_id)
+    return graph
+
+
+def _environment_attractor(graph: _GameGraph) -> Tuple[Set[int], Dict[int, int]]:
+    """
+    Compute the attractor of the environment to the failures.
+
+    A choice is losing if one of its successors is losing, a state if all its
+    choices are losing.
+
+    :param graph: the game graph
+    :return: the losing states, and the losing successor of every losing choice
+    """
+    nb_choices_by_state = dict(graph.nb_choices_by_state)
+    losing_successor: Dict[int, int] = {}
+    losing_states = set(graph.failures)
+    queue: Deque[int] = deque(graph.failures)
+    while len(queue) > 0:
+        state_id = queue.popleft()
+        for choice_id in graph.predecessors.get(state_id, []):
+            if choice_id in losing_successor:
+                continue
+            losing_successor[choice_id] = state_id
+            predecessor = graph.choice_state[choice_id]
+            nb_choices_by_state[predecessor] -= 1
+            if nb_choices_by_state[predecessor] == 0:
+                losing_states.add(predecessor)
+                queue.append(predecessor)
+    return losing_states, losing_successor
+
+
+def _counterexample(
+    graph: _GameGraph, losing_successor: Dict[int, int], state_id: int
+) -> int:
+    """Follow the losing choices from a losing state, up to a failure."""
+    # the successors of the losing choices have been found losing earlier:
+    # following them, the failures are reached
+    first_choice_by_state: Dict[int, int] = {}
+    for choice_id, choice_state_id in enumerate(graph.choice_state):
+        first_choice_by_state.setdefault(choice_state_id, choice_id)
+    while state_id in first_choice_by_state:
+        state_id = losing_successor[first_choice_by_state[state_id]]
+    return state_id
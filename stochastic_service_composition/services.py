@@ -1,13 +1,29 @@
 """This module contains the implementation of the service abstraction."""
 
 from collections import deque
-from typing import Deque, Set, Tuple
+from typing import (
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
+from stochastic_service_composition.interning import Interner
 from stochastic_service_composition.types import (
     Action,
+    MDPDynamics,
+    Prob,
+    Reward,
     State,
     TransitionFunction,
-    MDPDynamics,
 )
 
 
@@ -138,6 +154,7 @@ def build_service_from_transitions(
     transition_function: MDPDynamics,
     initial_state: State,
     final_states: Set[State],
+    interner: Optional[Interner] = None,
 ) -> Service:
     """
     Initialize a service from transitions, initial state and final states.
@@ -148,8 +165,13 @@ def build_service_from_transitions(
     :param transition_function: the transition function
     :param initial_state: the initial state
     :param final_states: the final states
+    :param interner: the interner of states and distributions (optional)
     :return: the service
     """
+    if interner is not None:
+        transition_function = _intern_transition_function(transition_function, interner)
+        initial_state = interner.intern(initial_state)
+        final_states = {interner.intern(final_state) for final_state in final_states}
     states = set()
     actions = set()
     for start_state, transitions_by_action in transition_function.items():
@@ -167,11 +189,14 @@ def build_service_from_transitions(
     return Service(states, actions, final_states, initial_state, transition_function)
 
 
-def build_system_service(*services: Service) -> Service:
+def build_system_service(
+    *services: Service, interner: Optional[Interner] = None
+) -> Service:
     """
     Do the build_system_service between services.
 
     :param services: a list of service instances
+    :param interner: the interner of system states and distributions (optional)
     :return: the system service
     """
     assert len(services) >= 2, "at least two services"
@@ -182,6 +207,8 @@ def build_system_service(*services: Service) -> Service:
     new_initial_state: Tuple[State, ...] = tuple(
         service.initial_state for service in services
     )
+    if interner is not None:
+        new_initial_state = interner.intern(new_initial_state)
     new_transition_function: MDPDynamics = {}
 
     queue: Deque[Tuple[State, ...]] = deque()
@@ -201,28 +228,14 @@ def build_system_service(*services: Service) -> Service:
         ):
             new_final_states.add(current_state)
 
-        next_state_template = current_state
-        for i in range(len(services)):
-            current_service: Service = services[i]
-            current_service_state = list(next_state_template)[i]
-            for a, (next_service_states, reward) in current_service.transition_function[
-                current_service_state
-            ].items():
-                symbol = (a, i)
-                actions.add(symbol)
-                new_transition_function.setdefault(current_state, {})[symbol] = (
-                    {},
-                    reward,
-                )
-                for next_service_state, prob in next_service_states.items():
-                    # we need to transform it to list temporarily
-                    next_state_list = list(next_state_template)
-                    next_state_list[i] = next_service_state
-                    next_state = tuple(next_state_list)
-                    new_transition_function[current_state][symbol][0][next_state] = prob
-                    if next_state not in visited and next_state not in to_be_visited:
-                        to_be_visited.add(next_state)
-                        queue.append(next_state)
+        transitions = system_service_transitions(services, current_state, interner)
+        new_transition_function[current_state] = transitions
+        for symbol, (next_states, _reward) in transitions.items():
+            actions.add(symbol)
+            for next_state in cast(Dict[Tuple[State, ...], Prob], next_states):
+                if next_state not in visited and next_state not in to_be_visited:
+                    to_be_visited.add(next_state)
+                    queue.append(next_state)
 
     new_service = Service(
         states=new_states,
@@ -232,3 +245,285 @@ def build_system_service(*services: Service) -> Service:
         transition_function=new_transition_function,
     )
     return new_service
+
+
+def system_service_transitions(
+    services: Sequence[Service],
+    system_state: Tuple[State, ...],
+    interner: Optional[Interner] = None,
+) -> Dict[Tuple[Action, int], Tuple[Dict[State, Prob], Reward]]:
+    """
+    Compute the transitions of the system service from a system state.
+
+    Only the outgoing transitions of the given system state are computed,
+    hence the product of the services is never materialized.
+
+    :param services: a list of service instances
+    :param system_state: the system state, i.e. one state for each service
+    :param interner: the interner of system states and distributions (optional)
+    :return: the transitions of the system service, indexed by (action, service index)
+    """
+    transitions: Dict[Tuple[Action, int], Tuple[Dict[State, Prob], Reward]] = {}
+    for i, current_service_state in enumerate(system_state):
+        current_service: Service = services[i]
+        for a, (next_service_states, reward) in current_service.transition_function[
+            current_service_state
+        ].items():
+            transitions[(a, i)] = (
+                _replace_component(system_state, i, next_service_states, interner),
+                reward,
+            )
+    return transitions
+
+
+def _replace_component(
+    system_state: Tuple[State, ...],
+    i: int,
+    next_service_states: Dict[State, Prob],
+    interner: Optional[Interner] = None,
+) -> Dict[State, Prob]:
+    """Lift a distribution over the next states of the i-th service to system states."""
+    next_system_states: Dict[State, Prob] = {}
+    for next_service_state, prob in next_service_states.items():
+        # we need to transform it to list temporarily
+        next_state_list = list(system_state)
+        next_state_list[i] = next_service_state
+        next_system_states[tuple(next_state_list)] = prob
+    if interner is not None:
+        return interner.intern_distribution(next_system_states)
+    return next_system_states
+
+
+def _intern_transition_function(
+    transition_function: MDPDynamics, interner: Interner
+) -> MDPDynamics:
+    """Intern the states, the actions and the distributions of a transition function."""
+    return {
+        interner.intern(state): {
+            interner.intern(action): (
+                interner.intern_distribution(transition[0]),
+                transition[1],
+            )
+            for action, transition in transitions_by_action.items()
+        }
+        for state, transitions_by_action in transition_function.items()
+    }
+
+
+class CapabilityIndex:
+    """
+    An index of the services of a community that can perform every action.
+
+    For every component service, it stores the actions offered in every
+    state; for every action, the services that offer it in some state. Hence,
+    the services that can perform an action in a system state are found
+    without listing all the transitions of the system state.
+    """
+
+    def __init__(
+        self,
+        actions_by_state: Sequence[Mapping[State, FrozenSet[Action]]],
+        services_by_action: Mapping[Action, Tuple[int, ...]],
+    ):
+        """
+        Initialize the index.
+
+        :param actions_by_state: for every service, the actions offered in every state
+        :param services_by_action: for every action, the (sorted) indices of the services that offer it
+        """
+        self.actions_by_state = actions_by_state
+        self.services_by_action = services_by_action
+
+    @classmethod
+    def from_services(cls, services: Sequence[Service]) -> "CapabilityIndex":
+        """Build the index of a community of services."""
+        actions_by_state = [
+            {
+                state: frozenset(transitions_by_action)
+                for state, transitions_by_action in service.transition_function.items()
+            }
+            for service in services
+        ]
+        services_by_action: Dict[Action, List[int]] = {}
+        for i, service in enumerate(services):
+            for action in service.actions:
+                services_by_action.setdefault(action, []).append(i)
+        return cls(
+            actions_by_state,
+            {action: tuple(ids) for action, ids in services_by_action.items()},
+        )
+
+    @classmethod
+    def from_system_service(
+        cls, system_service: Union[Service, "FactoredSystemService"]
+    ) -> "CapabilityIndex":
+        """
+        Build the index of the community of a system service.
+
+        The index of a factored system service is the one of its services;
+        the one of a materialized system service is built from its transitions.
+
+        :param system_service: the system service, either materialized or factored
+        :return: the capability index
+        """
+        if isinstance(system_service, FactoredSystemService):
+            return system_service.capabilities
+        nb_services = len(cast(Tuple[State, ...], system_service.initial_state))
+        actions_by_state: List[Dict[State, Set[Action]]] = [
+            {} for _ in range(nb_services)
+        ]
+        for state, transitions in system_service.transition_function.items():
+            system_state = cast(Tuple[State, ...], state)
+            component_i: State
+            for i, component_i in enumerate(system_state):
+                actions_by_state[i].setdefault(component_i, set())
+            for action, i in transitions:
+                actions_by_state[i][system_state[i]].add(action)
+        services_by_action: Dict[Action, Set[int]] = {}
+        for action, i in system_service.actions:
+            services_by_action.setdefault(action, set()).add(i)
+        return cls(
+            [
+                {state: frozenset(actions) for state, actions in by_state.items()}
+                for by_state in actions_by_state
+            ],
+            {action: tuple(sorted(ids)) for action, ids in services_by_action.items()},
+        )
+
+    def candidates(self, system_state: Tuple[State, ...], action: Action) -> List[int]:
+        """
+        Get the services that can perform an action in a system state.
+
+        :param system_state: the system state
+        :param action: the action
+        :return: the (sorted) indices of the services that can perform the action
+        """
+        return [
+            i
+            for i in self.services_by_action.get(action, ())
+            if action in self.actions_by_state[i].get(system_state[i], ())
+        ]
+
+
+class FactoredSystemService:
+    """
+    A system service that keeps the component services separate.
+
+    Differently from build_system_service, the product of the services is never
+    materialized: the transitions from a system state are computed on demand,
+    by changing only the component of the service that performs the action.
+    Hence, the memory footprint is linear in the size of the services.
+    """
+
+    def __init__(
+        self, services: Sequence[Service], interner: Optional[Interner] = None
+    ):
+        """
+        Initialize the factored system service.
+
+        :param services: a list of service instances
+        :param interner: the interner of system states and distributions (optional)
+        """
+        assert len(services) >= 1, "at least one service"
+        self.services: Tuple[Service, ...] = tuple(services)
+        self.initial_state: Tuple[State, ...] = tuple(
+            service.initial_state for service in services
+        )
+        if interner is not None:
+            self.initial_state = interner.intern(self.initial_state)
+        self.interner = interner
+        self.transition_function = _FactoredTransitionFunction(self.services, interner)
+        self.capabilities = CapabilityIndex.from_services(self.services)
+
+    @property
+    def actions(self) -> Set[Tuple[Action, int]]:
+        """Get the actions of the system service, i.e. pairs (action, service index)."""
+        return {
+            (action, i)
+            for i, service in enumerate(self.services)
+            for action in service.actions
+        }
+
+    def is_final(self, system_state: Tuple[State, ...]) -> bool:
+        """Check whether a system state is final, i.e. all its components are final."""
+        return all(
+            component_i in self.services[i].final_states
+            for i, component_i in enumerate(system_state)
+        )
+
+    def successors(
+        self, system_state: Tuple[State, ...], symbol: Tuple[Action, int]
+    ) -> Tuple[Dict[State, Prob], Reward]:
+        """
+        Get the successor distribution of a system state, for a given action.
+
+        :param system_state: the system state
+        :param symbol: the pair (action, index of the service performing it)
+        :return: the distribution over next system states, and the reward
+        """
+        return self.transition_function[system_state][symbol]
+
+
+class _FactoredTransitionFunction:
+    """
+    The transition function of a factored system service.
+
+    It can be indexed by system state like the one of a (materialized) system
+    service, but, since the transitions are computed on demand, it cannot be
+    iterated. The transitions from a system state are computed lazily, i.e.
+    only the ones that are looked up.
+    """
+
+    def __init__(
+        self, services: Sequence[Service], interner: Optional[Interner] = None
+    ):
+        """Initialize the transition function."""
+        self._services = services
+        self._interner = interner
+
+    def __getitem__(
+        self, system_state: Tuple[State, ...]
+    ) -> Mapping[Tuple[Action, int], Tuple[Dict[State, Prob], Reward]]:
+        """Get the transitions from a system state."""
+        return _LazySystemTransitions(self._services, system_state, self._interner)
+
+
+class _LazySystemTransitions(Mapping):
+    """The transitions of a factored system service from a system state, computed on lookup."""
+
+    def __init__(
+        self,
+        services: Sequence[Service],
+        system_state: Tuple[State, ...],
+        interner: Optional[Interner] = None,
+    ):
+        """Initialize the transitions."""
+        self._services = services
+        self._system_state = system_state
+        self._interner = interner
+
+    def __getitem__(
+        self, symbol: Tuple[Action, int]
+    ) -> Tuple[Dict[State, Prob], Reward]:
+        """Get the transition of an action of a service."""
+        action, i = symbol
+        next_service_states, reward = self._services[i].transition_function[
+            self._system_state[i]
+        ][action]
+        next_system_states = _replace_component(
+            self._system_state, i, next_service_states, self._interner
+        )
+        return next_system_states, reward
+
+    def __iter__(self) -> Iterator[Tuple[Action, int]]:
+        """Iterate over the pairs (action, service index)."""
+        for i, component_i in enumerate(self._system_state):
+            for action in self._services[i].transition_function[component_i]:
+                yield action, i
+
+    def __len__(self) -> int:
+        """Get the number of transitions."""
+        return sum(
+            len(self._services[i].transition_function[component_i])
+            for i, component_i in enumerate(self._system_state)
+        )
@@ -0,0 +1,215 @@
+"""
+This module implements the probabilistic simulation between services.
+
+A service A simulates a service B, with respect to a set of actions, if
+there is a relation R between the states of B and the states of A, that
+contains the pair of initial states, and such that for every pair (b, a) in
+R and every action x of b:
+
+- a can perform x too, with a reward not lower than the one of b;
+- the distributions of the next states of b and a can be coupled within R,
+  i.e. there is a joint distribution, whose marginals are the two
+  distributions, that gives positive probability only to pairs in R.
+
+The existence of a coupling is checked with a maximum flow from the next
+states of b to the next states of a (Jonsson & Larsen, 1991); the greatest
+simulation is computed by removing the pairs without coupling until a
+fixpoint is reached.
+
+If A simulates B, A is never worse than B to serve the target: every
+execution of B can be matched by an execution of A, step by step, with
+rewards that are not lower and failures that are not more likely. B is then
+dominated by A.
+"""
+from collections import deque
+from typing import Dict, List, Sequence, Set, Tuple
+
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.types import Action, Prob, State
+
+DEFAULT_TOLERANCE = 1e-9
+
+
+def simulation_relation(
+    simulated: Service,
+    simulating: Service,
+    actions: Set[Action],
+    tol: float = DEFAULT_TOLERANCE,
+) -> Set[Tuple[State, State]]:
+    """
+    Compute the greatest probabilistic simulation between two services.
+
+    :param simulated: the simulated service B
+    :param simulating: the simulating service A
+    :param actions: the actions to consider; the other actions are ignored
+    :param tol: the tolerance on the probability mass of a coupling
+    :return: the pairs (b, a) such that the state a of A simulates the state b of B
+    """
+
+    def _transitions(service: Service, state: State) -> Dict:
+        return {
+            action: transition
+            for action, transition in service.transition_function.get(
+                state, {}
+            ).items()
+            if action in actions
+        }
+
+    relation = set()
+    for b in simulated.states:
+        b_transitions = _transitions(simulated, b)
+        for a in simulating.states:
+            a_transitions = _transitions(simulating, a)
+            if all(
+                action in a_transitions
+                and a_transitions[action][1] >= b_transitions[action][1]
+                for action in b_transitions
+            ):
+                relation.add((b, a))
+
+    changed = True
+    while changed:
+        changed = False
+        for b, a in list(relation):
+            b_transitions = _transitions(simulated, b)
+            a_transitions = _transitions(simulating, a)
+            if not all(
+                _has_coupling(
+                    b_transitions[action][0], a_transitions[action][0], relation, tol
+                )
+                for action in b_transitions
+            ):
+                relation.remove((b, a))
+                changed = True
+    return relation
+
+
+def dominates(
+    simulating: Service,
+    simulated: Service,
+    actions: Set[Action],
+    tol: float = DEFAULT_TOLERANCE,
+) -> bool:
+    """
+    Check whether a service dominates another one, i.e. it simulates it from the initial states.
+
+    :param simulating: the (candidate) dominating service A
+    :param simulated: the (candidate) dominated service B
+    :param actions: the actions to consider, e.g. the actions of the target
+    :param tol: the tolerance on the probability mass of a coupling
+    :return: True if A simulates B
+    """
+    relation = simulation_relation(simulated, simulating, actions, tol)
+    return (simulated.initial_state, simulating.initial_state) in relation
+
+
+def dominated_services(
+    services: Sequence[Service],
+    actions: Set[Action],
+    tol: float = DEFAULT_TOLERANCE,
+) -> Dict[int, int]:
+    """
+    Find the services of a community dominated by another service of the community.
+
+    Among equivalent services, i.e. services that dominate each other, the
+    one with the lowest index is not dominated.
+
+    :param services: the community of services
+    :param actions: the actions to consider, e.g. the actions of the target
+    :param tol: the tolerance on the probability mass of a coupling
+    :return: the index of the dominating (not dominated) service, by index of dominated service
+    """
+    nb_services = len(services)
+    dominance = [
+        [
+            i != j and dominates(services[i], services[j], actions, tol)
+            for j in range(nb_services)
+        ]
+        for i in range(nb_services)
+    ]
+    dominated = {
+        j
+        for j in range(nb_services)
+        for i in range(nb_services)
+        if dominance[i][j] and (not dominance[j][i] or i < j)
+    }
+    # simulation is transitive: every dominated service has a dominating service that is not dominated
+    return {
+        j: min(
+            i for i in range(nb_services) if dominance[i][j] and i not in dominated
+        )
+        for j in sorted(dominated)
+    }
+
+
+def _has_coupling(
+    distribution: Dict[State, Prob],
+    other_distribution: Dict[State, Prob],
+    relation: Set[Tuple[State, State]],
+    tol: float,
+) -> bool:
+    """
+    Check whether two distributions can be coupled within a relation, with a maximum flow.
+
+    :param distribution: the distribution over the states of the simulated service
+    :param other_distribution: the distribution over the states of the simulating service
+    :param relation: the relation between the states of the two services
+    :param tol: the tolerance on the probability mass of the coupling
+    :return: True if there is a coupling
+    """
+    sources = [state for state, prob in distribution.items() if prob > 0.0]
+    targets = [state for state, prob in other_distribution.items() if prob > 0.0]
+    # nodes: 0 is the source, then the sources, then the targets, then the sink
+    nb_nodes = len(sources) + len(targets) + 2
+    sink = nb_nodes - 1
+    capacities: List[Dict[int, float]] = [{} for _ in range(nb_nodes)]
+    for i, state in enumerate(sources, start=1):
+        capacities[0][i] = distribution[state]
+        capacities[i][0] = 0.0
+        for j, other_state in enumerate(targets, start=len(sources) + 1):
+            if (state, other_state) in relation:
+                capacities[i][j] = float("inf")
+                capacities[j][i] = 0.0
+    for j, other_state in enumerate(targets, start=len(sources) + 1):
+        capacities[j][sink] = other_distribution[other_state]
+        capacities[sink][j] = 0.0
+
+    total_flow = _max_flow(capacities, 0, sink, tol)
+    return total_flow >= sum(distribution[state] for state in sources) - tol
+
+
+def _max_flow(
+    capacities: List[Dict[int, float]], source: int, sink: int, tol: float
+) -> float:
+    """
+    Compute the maximum flow of a network with the Edmonds-Karp algorithm.
+
+    :param capacities: the residual capacities of the edges, by node; they are updated in place
+    :param source: the source node
+    :param sink: the sink node
+    :param tol: the capacities up to the tolerance are considered saturated
+    :return: the value of the maximum flow
+    """
+    total_flow = 0.0
+    while True:
+        # breadth-first search of an augmenting path
+        parents = {source: source}
+        queue = deque([source])
+        while len(queue) > 0 and sink not in parents:
+            node = queue.popleft()
+            for next_node, capacity in capacities[node].items():
+                if capacity > tol and next_node not in parents:
+                    parents[next_node] = node
+                    queue.append(next_node)
+        if sink not in parents:
+            return total_flow
+        path = []
+        node = sink
+        while node != source:
+            path.append((parents[node], node))
+            node = parents[node]
+        flow = min(capacities[start][end] for start, end in path)
+        for start, end in path:
+            capacities[start][end] -= flow
+            capacities[end][start] += flow
+        total_flow += flow
@@ -0,0 +1,213 @@
+"""
+This module implements the relevance slicing of a community against a target.
+
+The composition only uses the transitions of the services whose action is
+requested by the target. Hence, before building the product of the
+services, every service can be restricted to the actions of the target and
+to the states reachable with them; a service that cannot perform any action
+of the target from its initial state is never chosen, and never leaves its
+initial state, so it can be dropped altogether.
+
+The composition of the sliced community is the same of the original one, up
+to the renumbering of the services and the components of the dropped
+services in the system states; a CommunitySlice maps them back, so that the
+composition of the sliced community can be returned over the states and the
+service indices of the original community.
+
+Optionally, the services dominated by another service of the slice (see
+simulation.py) are dropped too, and kept as hot spares of their dominating
+service: the product shrinks by a whole factor for every dropped service.
+If a dominating service fails, CommunitySlice.swap_spares replaces it with
+its spares, and the new slice can be composed as it is.
+Unlike slicing, this is not exact: the composition without a spare is a
+lower bound of the original one, which can also use the spare and its
+dominating service alternately, e.g. the spare while the dominating service
+is being repaired.
+"""
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from stochastic_service_composition.interning import Interner
+from stochastic_service_composition.services import (
+    Service,
+    build_service_from_transitions,
+)
+from stochastic_service_composition.simulation import dominated_services
+from stochastic_service_composition.types import Action, MDPDynamics, State
+
+
+class CommunitySlice:
+    """The services of a community that are relevant for a target, restricted to the target actions."""
+
+    def __init__(
+        self,
+        services: Sequence[Service],
+        service_ids: Sequence[int],
+        initial_state: Tuple[State, ...],
+        spares: Optional[Dict[int, int]] = None,
+        spare_services: Optional[Dict[int, Service]] = None,
+    ):
+        """
+        Initialize the slice.
+
+        :param services: the sliced services that are kept
+        :param service_ids: the index of every kept service in the original community
+        :param initial_state: the initial system state of the original community
+        :param spares: the index of the dominating service, by index of dropped dominated service (optional)
+        :param spare_services: the sliced dropped dominated services, by index (optional)
+        """
+        self.services = list(services)
+        self.service_ids = list(service_ids)
+        self.initial_state = initial_state
+        self.spares: Dict[int, int] = dict(spares) if spares is not None else {}
+        self.spare_services: Dict[int, Service] = (
+            dict(spare_services) if spare_services is not None else {}
+        )
+
+    @property
+    def nb_services(self) -> int:
+        """Get the number of services of the original community."""
+        return len(self.initial_state)
+
+    def lift_system_state(self, system_state: Tuple[State, ...]) -> Tuple[State, ...]:
+        """
+        Map a system state of the sliced community to the original community.
+
+        :param system_state: the system state of the sliced community
+        :return: the system state of the original community, where the dropped services are in their initial state
+        """
+        components = list(self.initial_state)
+        for service_id, component in zip(self.service_ids, system_state):
+            components[service_id] = component
+        return tuple(components)
+
+    def swap_spares(self, service_id: int) -> "CommunitySlice":
+        """
+        Replace a (failed) service of the slice with its spares.
+
+        The failed service is never chosen in the composition of the result,
+        and stays in its initial state in the system states of the community.
+
+        :param service_id: the index of the service in the original community
+        :return: the slice where the spares of the service are kept instead of it
+        """
+        spare_ids = [
+            spare_id
+            for spare_id, dominating_id in self.spares.items()
+            if dominating_id == service_id
+        ]
+        if len(spare_ids) == 0:
+            raise ValueError(f"service {service_id} has no spares")
+        services_by_id = {
+            kept_id: service
+            for kept_id, service in zip(self.service_ids, self.services)
+            if kept_id != service_id
+        }
+        services_by_id.update(
+            {spare_id: self.spare_services[spare_id] for spare_id in spare_ids}
+        )
+        service_ids = sorted(services_by_id)
+        return CommunitySlice(
+            [services_by_id[kept_id] for kept_id in service_ids],
+            service_ids,
+            self.initial_state,
+            {
+                spare_id: dominating_id
+                for spare_id, dominating_id in self.spares.items()
+                if spare_id not in spare_ids
+            },
+            {
+                spare_id: service
+                for spare_id, service in self.spare_services.items()
+                if spare_id not in spare_ids
+            },
+        )
+
+    def lift_action(self, action: Action) -> Action:
+        """Map an action of the composition of the sliced community to the original community."""
+        if isinstance(action, int):
+            return self.service_ids[action]
+        return action
+
+
+def slice_service(
+    service: Service, actions: Set[Action], interner: Optional[Interner] = None
+) -> Service:
+    """
+    Restrict a service to a set of actions, and to the states reachable with them.
+
+    :param service: the service
+    :param actions: the actions to keep, e.g. the actions of the target
+    :param interner: the interner of states and distributions (optional)
+    :return: the sliced service; its states without kept actions have no transitions
+    """
+    transition_function: MDPDynamics = {}
+    queue = deque([service.initial_state])
+    transition_function[service.initial_state] = {}
+    while len(queue) > 0:
+        state = queue.popleft()
+        for action, transition in service.transition_function.get(state, {}).items():
+            if action not in actions:
+                continue
+            transition_function[state][action] = transition
+            for next_state in transition[0]:
+                if next_state not in transition_function:
+                    transition_function[next_state] = {}
+                    queue.append(next_state)
+    final_states = service.final_states.intersection(transition_function)
+    return build_service_from_transitions(
+        transition_function, service.initial_state, final_states, interner=interner
+    )
+
+
+def slice_community(
+    actions: Set[Action],
+    services: Sequence[Service],
+    interner: Optional[Interner] = None,
+    prune_dominated: bool = False,
+) -> CommunitySlice:
+    """
+    Slice a community with respect to a set of actions, e.g. the actions of a target.
+
+    At least one service is kept, so that the system service of the slice is defined.
+
+    :param actions: the actions to keep
+    :param services: the community of services
+    :param interner: the interner of states and distributions (optional)
+    :param prune_dominated: if True, drop the services dominated by another service, and keep them as spares.
+    :return: the slice of the community
+    """
+    sliced_services: List[Service] = []
+    service_ids: List[int] = []
+    for service_id, service in enumerate(services):
+        sliced_service = slice_service(service, actions, interner)
+        if len(sliced_service.actions) > 0 or (
+            service_id == len(services) - 1 and len(service_ids) == 0
+        ):
+            sliced_services.append(sliced_service)
+            service_ids.append(service_id)
+    spares: Dict[int, int] = {}
+    spare_services: Dict[int, Service] = {}
+    if prune_dominated:
+        dominated = dominated_services(sliced_services, actions)
+        spares = {
+            service_ids[index]: service_ids[dominating_index]
+            for index, dominating_index in dominated.items()
+        }
+        spare_services = {
+            service_ids[index]: sliced_services[index] for index in dominated
+        }
+        sliced_services = [
+            service
+            for index, service in enumerate(sliced_services)
+            if index not in dominated
+        ]
+        service_ids = [
+            service_id for service_id in service_ids if service_id not in spares
+        ]
+    initial_state = tuple(service.initial_state for service in services)
+    if interner is not None:
+        initial_state = interner.intern(initial_state)
+    return CommunitySlice(
+        sliced_services, service_ids, initial_state, spares, spare_services
+    )
@@ -0,0 +1,803 @@
+"""
+This module implements dynamic programming solvers for sparse MDPs.
+
+All the solvers maximize the expected discounted reward, and differ only in
+how Bellman backups are scheduled:
+
+- value iteration does synchronous, batched backups over all the (state, action) pairs;
+- Gauss-Seidel value iteration does in-place backups, state by state;
+- modified policy iteration alternates greedy improvements with a fixed
+  number of (batched) partial evaluation sweeps;
+- prioritized sweeping does in-place backups only where the Bellman residual
+  is above the tolerance, propagating changes backwards from a set of states;
+- topological value iteration solves the strongly connected components of
+  the MDP one at a time, in reverse topological order.
+
+All the solvers can be warm-started from a previous value function, e.g. the
+one of the policy computed before an update of the composition.
+
+Many variants of the same MDP, with different discount factors and/or
+rewards, can be solved together by a stacked value iteration.
+
+A fixed policy can be evaluated exactly, by solving the linear system
+(I - gamma * P_pi) v = r_pi with a sparse direct solver; this requires scipy,
+and falls back to iterative evaluation when scipy is not installed or the
+MDP is too large to factorize.
+"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from mdp_dp_rl.processes.mdp import MDP
+
+from stochastic_service_composition.sparse import (
+    INDEX_DTYPE,
+    SparseMDP,
+    _concatenate_ranges,
+)
+from stochastic_service_composition.types import Action, State
+
+try:
+    import scipy.sparse
+    import scipy.sparse.linalg
+except ImportError:  # pragma: no cover
+    scipy = None
+
+VALUE_ITERATION = "value_iteration"
+GAUSS_SEIDEL = "gauss_seidel"
+MODIFIED_POLICY_ITERATION = "modified_policy_iteration"
+PRIORITIZED_SWEEPING = "prioritized_sweeping"
+TOPOLOGICAL_VALUE_ITERATION = "topological_value_iteration"
+DEFAULT_TOLERANCE = 1e-4
+DEFAULT_MAX_ITERATIONS = 10000
+DEFAULT_EVALUATION_SWEEPS = 20
+DEFAULT_MAX_DIRECT_STATES = 1_000_000
+
+
+class SparsePolicy:
+    """A deterministic policy over a sparse MDP, together with its value function."""
+
+    def __init__(self, mdp: SparseMDP, pair_ids: np.ndarray, values: np.ndarray):
+        """
+        Initialize the policy.
+
+        :param mdp: the sparse MDP
+        :param pair_ids: the chosen (state, action) pair of every state
+        :param values: the value of every state
+        """
+        self.mdp = mdp
+        self.pair_ids = pair_ids
+        self.values = values
+
+    @property
+    def action_ids(self) -> np.ndarray:
+        """Get the identifier of the chosen action of every state."""
+        return self.mdp.pair_actions[self.pair_ids]
+
+    @property
+    def policy_data(self) -> Dict[State, Dict[Action, float]]:
+        """Get the policy data, in the same format of mdp_dp_rl policies."""
+        return {
+            state: {action: 1.0}
+            for state, action in self.get_state_to_action_map().items()
+        }
+
+    def get_action_for_state(self, state: State) -> Action:
+        """Get the action chosen in a state."""
+        state_id = self.mdp.get_state_id(state)
+        return self.mdp.actions[self.mdp.pair_actions[self.pair_ids[state_id]]]
+
+    def get_value_for_state(self, state: State) -> float:
+        """Get the value of a state."""
+        return float(self.values[self.mdp.get_state_id(state)])
+
+    def get_state_to_action_map(self) -> Dict[State, Action]:
+        """Get the mapping from states to chosen actions."""
+        actions = self.mdp.actions
+        return {
+            state: actions[action_id]
+            for state, action_id in zip(self.mdp.states, self.action_ids)
+        }
+
+    def __repr__(self) -> str:
+        """Get the string representation."""
+        return f"{type(self).__name__}({self.get_state_to_action_map()})"
+
+
+class _BellmanOperator:
+    """Batched Bellman backups over the (state, action) pairs of a sparse MDP."""
+
+    def __init__(self, mdp: SparseMDP):
+        """Initialize the operator, precomputing the CSR expansions."""
+        self.mdp = mdp
+        self.pair_states = mdp.pair_states
+        self.transition_pairs = mdp.transition_pairs
+        self.pair_range = np.arange(mdp.nb_pairs, dtype=INDEX_DTYPE)
+
+    def q_values(self, values: np.ndarray) -> np.ndarray:
+        """Compute the Q-value of every (state, action) pair."""
+        mdp = self.mdp
+        expected_values = np.bincount(
+            self.transition_pairs,
+            weights=mdp.probabilities * values[mdp.next_states],
+            minlength=mdp.nb_pairs,
+        )
+        return mdp.rewards + mdp.gamma * expected_values
+
+    def stacked_q_values(
+        self, values: np.ndarray, rewards: np.ndarray, gammas: np.ndarray
+    ) -> np.ndarray:
+        """
+        Compute the Q-values of many variants of the MDP, with the same transitions.
+
+        :param values: the value function of every variant, with shape (nb_variants, nb_states)
+        :param rewards: the rewards of every variant, with shape (nb_variants, nb_pairs)
+        :param gammas: the discount factor of every variant
+        :return: the Q-values of every variant, with shape (nb_variants, nb_pairs)
+        """
+        mdp = self.mdp
+        nb_variants = len(values)
+        # offset the pairs of every variant, to sum all the variants with one bincount
+        keys = (
+            np.arange(nb_variants)[:, np.newaxis] * mdp.nb_pairs + self.transition_pairs
+        )
+        expected_values = np.bincount(
+            keys.ravel(),
+            weights=(mdp.probabilities * values[:, mdp.next_states]).ravel(),
+            minlength=nb_variants * mdp.nb_pairs,
+        ).reshape(nb_variants, mdp.nb_pairs)
+        return rewards + gammas[:, np.newaxis] * expected_values
+
+    def greedy(self, q_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the greedy values and pairs from the Q-values.
+
+        Ties are broken in favour of the pair with the lowest identifier.
+
+        :param q_values: the Q-value of every (state, action) pair
+        :return: the greedy value and the greedy pair of every state
+        """
+        starts = self.mdp.state_ptr[:-1]
+        values = np.maximum.reduceat(q_values, starts)
+        candidates = np.where(
+            q_values == values[self.pair_states], self.pair_range, self.mdp.nb_pairs
+        )
+        pair_ids = np.minimum.reduceat(candidates, starts)
+        return values, pair_ids
+
+
+def value_iteration(
+    mdp: SparseMDP,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    initial_values: Optional[np.ndarray] = None,
+) -> SparsePolicy:
+    """
+    Solve a sparse MDP with (synchronous) value iteration.
+
+    :param mdp: the sparse MDP
+    :param tol: the tolerance on the maximum value change between iterations
+    :param max_iterations: the maximum number of iterations
+    :param initial_values: the initial value function (default: all zeros)
+    :return: the optimal policy
+    """
+    operator = _BellmanOperator(mdp)
+    values = _initial_values(mdp, initial_values)
+    for _ in range(max_iterations):
+        new_values, _pair_ids = operator.greedy(operator.q_values(values))
+        residual = np.max(np.abs(new_values - values), initial=0.0)
+        values = new_values
+        if residual < tol:
+            break
+    _values, pair_ids = operator.greedy(operator.q_values(values))
+    return SparsePolicy(mdp, pair_ids, values)
+
+
+def gauss_seidel_value_iteration(
+    mdp: SparseMDP,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    initial_values: Optional[np.ndarray] = None,
+) -> SparsePolicy:
+    """
+    Solve a sparse MDP with Gauss-Seidel value iteration.
+
+    Values are updated in place, in order of state identifier; hence, every
+    backup already uses the values updated earlier in the same sweep.
+
+    :param mdp: the sparse MDP
+    :param tol: the tolerance on the maximum value change between sweeps
+    :param max_iterations: the maximum number of sweeps
+    :param initial_values: the initial value function (default: all zeros)
+    :return: the optimal policy
+    """
+    values = _initial_values(mdp, initial_values).copy()
+    for _ in range(max_iterations):
+        residual = 0.0
+        for state_id in range(mdp.nb_states):
+            best_value = _state_backup(mdp, values, state_id)
+            residual = max(residual, abs(best_value - values[state_id]))
+            values[state_id] = best_value
+        if residual < tol:
+            break
+    operator = _BellmanOperator(mdp)
+    _values, pair_ids = operator.greedy(operator.q_values(values))
+    return SparsePolicy(mdp, pair_ids, values)
+
+
+def modified_policy_iteration(
+    mdp: SparseMDP,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    initial_values: Optional[np.ndarray] = None,
+    evaluation_sweeps: int = DEFAULT_EVALUATION_SWEEPS,
+) -> SparsePolicy:
+    """
+    Solve a sparse MDP with modified policy iteration.
+
+    :param mdp: the sparse MDP
+    :param tol: the tolerance on the Bellman residual of the greedy policy
+    :param max_iterations: the maximum number of policy improvements
+    :param initial_values: the initial value function (default: all zeros)
+    :param evaluation_sweeps: the number of partial evaluation sweeps per improvement
+    :return: the optimal policy
+    """
+    operator = _BellmanOperator(mdp)
+    values = _initial_values(mdp, initial_values)
+    new_values, pair_ids = operator.greedy(operator.q_values(values))
+    for _ in range(max_iterations):
+        residual = np.max(np.abs(new_values - values), initial=0.0)
+        values = new_values
+        if residual < tol:
+            break
+        # partial evaluation of the greedy policy
+        for _ in range(evaluation_sweeps):
+            values = operator.q_values(values)[pair_ids]
+        new_values, pair_ids = operator.greedy(operator.q_values(values))
+    return SparsePolicy(mdp, pair_ids, values)
+
+
+def prioritized_sweeping(
+    mdp: SparseMDP,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    initial_values: Optional[np.ndarray] = None,
+    changed_states: Optional[Iterable[int]] = None,
+) -> SparsePolicy:
+    """
+    Solve a sparse MDP with prioritized sweeping.
+
+    Starting from the changed states, states are backed up in order of
+    decreasing Bellman residual; after a backup, the predecessors of the
+    updated state are re-prioritized. States whose residual is below the
+    tolerance are never backed up; hence, when warm-started from the value
+    function of a previous solution, only the region affected by the change
+    is swept. As for the other solvers, max_iterations bounds the number of
+    sweeps: the backups stop after max_iterations times the number of states.
+
+    :param mdp: the sparse MDP
+    :param tol: the tolerance on the Bellman residual
+    :param max_iterations: the maximum number of sweeps, each worth one backup per state
+    :param initial_values: the initial value function (default: all zeros)
+    :param changed_states: the identifiers of the states to start from (default: all states)
+    :return: the optimal policy
+    """
+    values = _initial_values(mdp, initial_values).copy()
+    predecessor_ptr, predecessors = _predecessors(mdp)
+    if changed_states is None:
+        changed_states = range(mdp.nb_states)
+
+    queue: List[Tuple[float, int]] = []
+    priorities: Dict[int, float] = {}
+
+    def _push(state_id: int) -> None:
+        residual = abs(_state_backup(mdp, values, state_id) - values[state_id])
+        if residual >= tol and residual > priorities.get(state_id, 0.0):
+            priorities[state_id] = residual
+            heapq.heappush(queue, (-residual, state_id))
+
+    for state_id in changed_states:
+        _push(int(state_id))
+    nb_backups = 0
+    max_backups = max_iterations * mdp.nb_states
+    while len(queue) > 0 and nb_backups < max_backups:
+        _priority, state_id = heapq.heappop(queue)
+        if state_id not in priorities:
+            # stale entry, the state has already been backed up
+            continue
+        del priorities[state_id]
+        values[state_id] = _state_backup(mdp, values, state_id)
+        nb_backups += 1
+        for predecessor in predecessors[
+            predecessor_ptr[state_id] : predecessor_ptr[state_id + 1]
+        ]:
+            _push(int(predecessor))
+
+    operator = _BellmanOperator(mdp)
+    _values, pair_ids = operator.greedy(operator.q_values(values))
+    return SparsePolicy(mdp, pair_ids, values)
+
+
+def topological_value_iteration(
+    mdp: SparseMDP,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    initial_values: Optional[np.ndarray] = None,
+    max_workers: Optional[int] = 1,
+) -> SparsePolicy:
+    """
+    Solve a sparse MDP with topological value iteration.
+
+    The strongly connected components of the MDP are solved one at a time,
+    each to convergence, in reverse topological order: when a component is
+    solved, the values of all its successors are already final. Hence, every
+    sweep is restricted to a single component, and transient components are
+    solved with a single backup per state. Components at the same depth of the
+    component DAG are independent, and can be solved by concurrent threads.
+
+    :param mdp: the sparse MDP
+    :param tol: the tolerance on the maximum value change between sweeps of a component
+    :param max_iterations: the maximum number of sweeps of a component
+    :param initial_values: the initial value function (default: all zeros)
+    :param max_workers: the maximum number of threads (1: solve in the current thread; None: the number of CPUs)
+    :return: the optimal policy
+    """
+    values = _initial_values(mdp, initial_values).copy()
+    components, nb_components = _strongly_connected_components(mdp)
+    # states of every component, in CSR format
+    component_states = np.argsort(components, kind="stable")
+    component_ptr = np.zeros(nb_components + 1, dtype=np.int64)
+    np.cumsum(np.bincount(components, minlength=nb_components), out=component_ptr[1:])
+
+    def _solve(component: int) -> None:
+        start, end = component_ptr[component], component_ptr[component + 1]
+        states = component_states[start:end]
+        _solve_component(mdp, values, states, tol, max_iterations)
+
+    levels = _component_levels(mdp, components, nb_components)
+    level_order = np.argsort(levels, kind="stable")
+    level_ptr = np.searchsorted(
+        levels[level_order], np.arange(levels.max(initial=0) + 2)
+    )
+    if max_workers == 1:
+        for component in level_order:
+            _solve(component)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for level in range(len(level_ptr) - 1):
+                # the components of a level depend only on the ones of the lower levels
+                level_components = level_order[level_ptr[level] : level_ptr[level + 1]]
+                list(executor.map(_solve, level_components))
+
+    operator = _BellmanOperator(mdp)
+    _values, pair_ids = operator.greedy(operator.q_values(values))
+    return SparsePolicy(mdp, pair_ids, values)
+
+
+_SOLVERS: Dict[str, Callable[..., SparsePolicy]] = {
+    VALUE_ITERATION: value_iteration,
+    GAUSS_SEIDEL: gauss_seidel_value_iteration,
+    MODIFIED_POLICY_ITERATION: modified_policy_iteration,
+    PRIORITIZED_SWEEPING: prioritized_sweeping,
+    TOPOLOGICAL_VALUE_ITERATION: topological_value_iteration,
+}
+
+
+def solve_variants(
+    mdp: Union[SparseMDP, MDP],
+    gammas: Optional[Sequence[float]] = None,
+    rewards: Optional[Sequence[np.ndarray]] = None,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+) -> List[SparsePolicy]:
+    """
+    Compute the optimal policies of many variants of an MDP, with the same transitions.
+
+    The i-th variant has discount factor gammas[i] and rewards rewards[i];
+    if only one discount factor (or reward vector) is given, it is shared by
+    all the variants. The variants are solved by a single value iteration
+    over the stacked value functions, where every iteration updates only
+    the variants that have not converged yet.
+
+    :param mdp: the MDP, either sparse or an instance of mdp_dp_rl.processes.mdp.MDP
+    :param gammas: the discount factors (default: the one of the MDP)
+    :param rewards: the reward vectors, over the (state, action) pairs of the sparse MDP (default: the ones of the MDP)
+    :param tol: the tolerance on the maximum value change between iterations, for every variant
+    :param max_iterations: the maximum number of iterations
+    :return: the optimal policy of every variant, over the variant of the sparse MDP
+    """
+    if not isinstance(mdp, SparseMDP):
+        mdp = SparseMDP.from_mdp(mdp)
+    gamma_array = np.atleast_1d(
+        np.asarray(mdp.gamma if gammas is None else gammas, dtype=float)
+    )
+    reward_matrix = np.atleast_2d(
+        np.asarray(mdp.rewards if rewards is None else rewards, dtype=float)
+    )
+    if (
+        gamma_array.ndim != 1
+        or reward_matrix.ndim != 2
+        or reward_matrix.shape[1] != mdp.nb_pairs
+    ):
+        raise ValueError(
+            f"expected a vector of discount factors and reward vectors of length "
+            f"{mdp.nb_pairs}, got shapes {gamma_array.shape} and "
+            f"{reward_matrix.shape}"
+        )
+    nb_gammas, nb_rewards = len(gamma_array), len(reward_matrix)
+    if nb_gammas != nb_rewards and 1 not in (nb_gammas, nb_rewards):
+        raise ValueError(
+            f"got {nb_gammas} discount factors and {nb_rewards} reward vectors"
+        )
+    nb_variants = max(nb_gammas, nb_rewards)
+    gamma_array = np.broadcast_to(gamma_array, (nb_variants,))
+    reward_matrix = np.broadcast_to(reward_matrix, (nb_variants, mdp.nb_pairs))
+
+    operator = _BellmanOperator(mdp)
+    values = np.zeros((nb_variants, mdp.nb_states))
+    active = np.arange(nb_variants)
+    for _ in range(max_iterations):
+        if len(active) == 0:
+            break
+        q_values = operator.stacked_q_values(
+            values[active], reward_matrix[active], gamma_array[active]
+        )
+        new_values = np.maximum.reduceat(q_values, mdp.state_ptr[:-1], axis=1)
+        residuals = np.max(np.abs(new_values - values[active]), axis=1, initial=0.0)
+        values[active] = new_values
+        active = active[residuals >= tol]
+
+    policies = []
+    q_values = operator.stacked_q_values(values, reward_matrix, gamma_array)
+    for variant in range(nb_variants):
+        _values, pair_ids = operator.greedy(q_values[variant])
+        variant_mdp = mdp.with_rewards(
+            reward_matrix[variant], float(gamma_array[variant])
+        )
+        policies.append(SparsePolicy(variant_mdp, pair_ids, values[variant]))
+    return policies
+
+
+def evaluate_policy(
+    mdp: Union[SparseMDP, MDP],
+    policy: Union[SparsePolicy, Mapping[State, Action]],
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    max_direct_states: int = DEFAULT_MAX_DIRECT_STATES,
+) -> SparsePolicy:
+    """
+    Compute the value function of a fixed policy.
+
+    The values are the solution of the sparse linear system (I - gamma * P_pi) v = r_pi,
+    where P_pi and r_pi are the transition matrix and the rewards of the chosen
+    (state, action) pairs. If scipy is installed and the MDP has at most
+    max_direct_states states, the system is solved with a sparse LU
+    factorization; otherwise, by iterating the Bellman operator of the policy.
+
+    The policy may be a policy of another MDP with the same states, e.g. the
+    policy computed before an update of the composition: this allows to check
+    whether it is still good enough.
+
+    :param mdp: the MDP, either sparse or an instance of mdp_dp_rl.processes.mdp.MDP
+    :param policy: the policy, either sparse or a mapping from states to actions
+    :param tol: the tolerance on the maximum value change between iterations (iterative evaluation only)
+    :param max_iterations: the maximum number of iterations (iterative evaluation only)
+    :param max_direct_states: the maximum number of states for the direct solution
+    :return: the policy over the states of the (sparse) MDP, with its exact values
+    """
+    if not isinstance(mdp, SparseMDP):
+        mdp = SparseMDP.from_mdp(mdp)
+    pair_ids = _policy_pair_ids(mdp, policy)
+    transition_counts = np.diff(mdp.pair_ptr)[pair_ids]
+    transition_ids = _concatenate_ranges(mdp.pair_ptr[pair_ids], transition_counts)
+    transition_states = np.repeat(np.arange(mdp.nb_states), transition_counts)
+    next_states = mdp.next_states[transition_ids]
+    probabilities = mdp.probabilities[transition_ids]
+    rewards = mdp.rewards[pair_ids]
+
+    if scipy is not None and mdp.nb_states <= max_direct_states:
+        transition_matrix = scipy.sparse.csc_matrix(
+            (probabilities, (transition_states, next_states)),
+            shape=(mdp.nb_states, mdp.nb_states),
+        )
+        system = scipy.sparse.identity(mdp.nb_states, format="csc") - (
+            mdp.gamma * transition_matrix
+        )
+        values = np.atleast_1d(scipy.sparse.linalg.spsolve(system, rewards))
+        return SparsePolicy(mdp, pair_ids, values)
+
+    values = np.zeros(mdp.nb_states)
+    for _ in range(max_iterations):
+        expected_values = np.bincount(
+            transition_states,
+            weights=probabilities * values[next_states],
+            minlength=mdp.nb_states,
+        )
+        new_values = rewards + mdp.gamma * expected_values
+        residual = np.max(np.abs(new_values - values), initial=0.0)
+        values = new_values
+        if residual < tol:
+            break
+    return SparsePolicy(mdp, pair_ids, values)
+
+
+def solve(
+    mdp: Union[SparseMDP, MDP],
+    method: str = VALUE_ITERATION,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    initial_values: Optional[np.ndarray] = None,
+    initial_policy: Optional[SparsePolicy] = None,
+    **kwargs,
+) -> SparsePolicy:
+    """
+    Compute the optimal policy of an MDP.
+
+    The solver can be warm-started either from a value function or from a
+    previous policy. Since incremental updates of a composition preserve the
+    identifiers of the existing states, the initial value function may be
+    shorter than the number of states: the missing values are set to zero.
+
+    :param mdp: the MDP, either sparse or an instance of mdp_dp_rl.processes.mdp.MDP
+    :param method: the solver, one of 'value_iteration', 'gauss_seidel', 'modified_policy_iteration',
+      'prioritized_sweeping' and 'topological_value_iteration'
+    :param tol: the tolerance of the stopping criterion
+    :param max_iterations: the maximum number of iterations
+    :param initial_values: the initial value function (optional)
+    :param initial_policy: a previous policy, whose values are used as initial value function (optional)
+    :param kwargs: further solver-specific keyword arguments
+    :return: the optimal policy
+    """
+    if method not in _SOLVERS:
+        raise ValueError(
+            f"method '{method}' not supported; expected one of {sorted(_SOLVERS)}"
+        )
+    if not isinstance(mdp, SparseMDP):
+        mdp = SparseMDP.from_mdp(mdp)
+    if initial_values is None and initial_policy is not None:
+        initial_values = initial_policy.values
+    return _SOLVERS[method](
+        mdp,
+        tol=tol,
+        max_iterations=max_iterations,
+        initial_values=initial_values,
+        **kwargs,
+    )
+
+
+def _initial_values(
+    mdp: SparseMDP, initial_values: Optional[np.ndarray]
+) -> np.ndarray:
+    """Get the initial value function, padded with zeros for the missing states."""
+    if initial_values is None:
+        return np.zeros(mdp.nb_states)
+    initial_values = np.asarray(initial_values, dtype=float)
+    if len(initial_values) > mdp.nb_states:
+        raise ValueError(
+            f"expected at most {mdp.nb_states} initial values, got {len(initial_values)}"
+        )
+    return np.pad(initial_values, (0, mdp.nb_states - len(initial_values)))
+
+
+def _policy_pair_ids(
+    mdp: SparseMDP, policy: Union[SparsePolicy, Mapping[State, Action]]
+) -> np.ndarray:
+    """
+    Get the (state, action) pair chosen by a policy in every state of a sparse MDP.
+
+    :param mdp: the sparse MDP
+    :param policy: the policy, either sparse or a mapping from states to actions
+    :return: the chosen pair of every state
+    """
+    if isinstance(policy, SparsePolicy):
+        if policy.mdp is mdp:
+            return policy.pair_ids
+        policy = policy.get_state_to_action_map()
+    action_ids = {action: action_id for action_id, action in enumerate(mdp.actions)}
+    chosen_actions = np.empty(mdp.nb_states, dtype=INDEX_DTYPE)
+    for state_id, state in enumerate(mdp.states):
+        if state not in policy:
+            raise ValueError(f"the policy does not choose any action in state {state}")
+        chosen_actions[state_id] = action_ids.get(policy[state], -1)
+    is_chosen = mdp.pair_actions == chosen_actions[mdp.pair_states]
+    pair_ids = np.flatnonzero(is_chosen).astype(INDEX_DTYPE)
+    if len(pair_ids) != mdp.nb_states:
+        state_id = np.flatnonzero(
+            np.bincount(mdp.pair_states[is_chosen], minlength=mdp.nb_states) == 0
+        )[0]
+        state = mdp.states[state_id]
+        raise ValueError(
+            f"action {policy[state]} chosen by the policy is not available in state {state}"
+        )
+    return pair_ids
+
+
+def _state_backup(mdp: SparseMDP, values: np.ndarray, state_id: int) -> float:
+    """Compute the Bellman backup of a single state."""
+    best_value = -np.inf
+    for pair_id in range(mdp.state_ptr[state_id], mdp.state_ptr[state_id + 1]):
+        start, end = mdp.pair_ptr[pair_id], mdp.pair_ptr[pair_id + 1]
+        q_value = mdp.rewards[pair_id] + mdp.gamma * np.dot(
+            mdp.probabilities[start:end], values[mdp.next_states[start:end]]
+        )
+        best_value = max(best_value, q_value)
+    return best_value
+
+
+def _predecessors(mdp: SparseMDP) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the predecessors of every state, in CSR format.
+
+    :param mdp: the sparse MDP
+    :return: the row pointers and the (unique) predecessor identifiers
+    """
+    sources = mdp.pair_states[mdp.transition_pairs]
+    edges = np.unique(np.stack([mdp.next_states, sources]), axis=1)
+    counts = np.bincount(edges[0], minlength=mdp.nb_states)
+    predecessor_ptr = np.zeros(mdp.nb_states + 1, dtype=np.int64)
+    np.cumsum(counts, out=predecessor_ptr[1:])
+    return predecessor_ptr, edges[1]
+
+
+def _solve_component(
+    mdp: SparseMDP,
+    values: np.ndarray,
+    states: np.ndarray,
+    tol: float,
+    max_iterations: int,
+) -> None:
+    """
+    Solve a strongly connected component, whose successors have already been solved.
+
+    :param mdp: the sparse MDP
+    :param values: the value function, updated in place
+    :param states: the identifiers of the states of the component
+    :param tol: the tolerance on the maximum value change between sweeps
+    :param max_iterations: the maximum number of sweeps
+    """
+    if len(states) == 1:
+        state_id = int(states[0])
+        start = mdp.pair_ptr[mdp.state_ptr[state_id]]
+        end = mdp.pair_ptr[mdp.state_ptr[state_id + 1]]
+        successors = mdp.next_states[start:end]
+        if not np.any(successors == state_id):
+            # transient state: its successors are final, one backup is enough
+            values[state_id] = _state_backup(mdp, values, state_id)
+            return
+
+    pair_counts = np.diff(mdp.state_ptr)[states]
+    pair_ids = _concatenate_ranges(mdp.state_ptr[states], pair_counts)
+    transition_counts = np.diff(mdp.pair_ptr)[pair_ids]
+    transition_ids = _concatenate_ranges(mdp.pair_ptr[pair_ids], transition_counts)
+    transition_pairs = np.repeat(np.arange(len(pair_ids)), transition_counts)
+    pair_starts = np.cumsum(pair_counts) - pair_counts
+    rewards = mdp.rewards[pair_ids]
+    probabilities = mdp.probabilities[transition_ids]
+    next_states = mdp.next_states[transition_ids]
+    for _ in range(max_iterations):
+        expected_values = np.bincount(
+            transition_pairs,
+            weights=probabilities * values[next_states],
+            minlength=len(pair_ids),
+        )
+        q_values = rewards + mdp.gamma * expected_values
+        new_values = np.maximum.reduceat(q_values, pair_starts)
+        residual = np.max(np.abs(new_values - values[states]), initial=0.0)
+        values[states] = new_values
+        if residual < tol:
+            break
+
+
+def _strongly_connected_components(mdp: SparseMDP) -> Tuple[np.ndarray, int]:
+    """
+    Compute the strongly connected components of a sparse MDP (iterative Tarjan).
+
+    Components are numbered in order of completion, i.e. in reverse
+    topological order: the successors of a component have lower numbers.
+
+    :param mdp: the sparse MDP
+    :return: the component of every state, and the number of components
+    """
+    search = _TarjanSearch(mdp)
+    for root in range(mdp.nb_states):
+        if search.index[root] == -1:
+            search.search(root)
+    return np.array(search.components, dtype=INDEX_DTYPE), search.nb_components
+
+
+class _TarjanSearch:
+    """The iterative Tarjan search of the strongly connected components of a sparse MDP."""
+
+    def __init__(self, mdp: SparseMDP):
+        """Initialize the search, with no visited states."""
+        # the successors of the state s are next_states[successor_ptr[s]:successor_ptr[s+1]]
+        self.successor_ptr: List[int] = mdp.pair_ptr[mdp.state_ptr].tolist()
+        self.next_states: List[int] = mdp.next_states.tolist()
+        self.index = [-1] * mdp.nb_states
+        self.lowlink = [0] * mdp.nb_states
+        self.on_stack = [False] * mdp.nb_states
+        self.components = [-1] * mdp.nb_states
+        self.stack: List[int] = []
+        self.nb_visited = 0
+        self.nb_components = 0
+
+    def search(self, root: int) -> None:
+        """Search the components reachable from an unvisited state."""
+        self._visit(root)
+        work = [(root, self.successor_ptr[root])]
+        while len(work) > 0:
+            if self._advance(work):
+                continue
+            state, _position = work.pop()
+            if len(work) > 0:
+                parent = work[-1][0]
+                self.lowlink[parent] = min(self.lowlink[parent], self.lowlink[state])
+            if self.lowlink[state] == self.index[state]:
+                self._pop_component(state)
+
+    def _visit(self, state: int) -> None:
+        """Visit a state, and push it on the stack."""
+        self.index[state] = self.lowlink[state] = self.nb_visited
+        self.nb_visited += 1
+        self.stack.append(state)
+        self.on_stack[state] = True
+
+    def _advance(self, work: List[Tuple[int, int]]) -> bool:
+        """Follow the next successor of the state on top of the work stack; return False if there is none."""
+        state, position = work[-1]
+        if position == self.successor_ptr[state + 1]:
+            return False
+        work[-1] = (state, position + 1)
+        successor = self.next_states[position]
+        if self.index[successor] == -1:
+            self._visit(successor)
+            work.append((successor, self.successor_ptr[successor]))
+        elif self.on_stack[successor]:
+            self.lowlink[state] = min(self.lowlink[state], self.index[successor])
+        return True
+
+    def _pop_component(self, root: int) -> None:
+        """Pop the component of a root state from the stack."""
+        while True:
+            member = self.stack.pop()
+            self.on_stack[member] = False
+            self.components[member] = self.nb_components
+            if member == root:
+                break
+        self.nb_components += 1
+
+
+def _component_levels(
+    mdp: SparseMDP, components: np.ndarray, nb_components: int
+) -> np.ndarray:
+    """
+    Compute the depth of every component in the component DAG.
+
+    Components without successors have level 0; every other component has
+    level one plus the maximum level of its successors.
+
+    :param mdp: the sparse MDP
+    :param components: the component of every state, in reverse topological order
+    :param nb_components: the number of components
+    :return: the level of every component
+    """
+    sources = components[mdp.pair_states[mdp.transition_pairs]]
+    targets = components[mdp.next_states]
+    crossing = sources != targets
+    edges = np.unique(np.stack([sources[crossing], targets[crossing]]), axis=1)
+    levels = [0] * nb_components
+    # edges are sorted by source, and targets have lower numbers than sources
+    for source, target in zip(edges[0].tolist(), edges[1].tolist()):
+        levels[source] = max(levels[source], levels[target] + 1)
+    return np.array(levels, dtype=np.int64)
@@ -0,0 +1,346 @@
+"""
+This module implements a sparse, integer-indexed representation of MDPs.
+
+Every state is interned to a contiguous integer identifier, and the dynamics
+are stored in compressed sparse row (CSR) format:
+
+- the outgoing (state, action) pairs of the state with id `s` are the ones
+  in the range `state_ptr[s]:state_ptr[s + 1]`;
+- the transitions of the pair with id `p` are the ones in the range
+  `pair_ptr[p]:pair_ptr[p + 1]` of the arrays `next_states` and `probabilities`;
+- the reward of the pair with id `p` is `rewards[p]`.
+"""
+import copy
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from mdp_dp_rl.processes.mdp import MDP
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_ACTION,
+    COMPOSITION_MDP_UNDEFINED_ACTION,
+    DEFAULT_GAMMA,
+    _composition_dynamics,
+)
+from stochastic_service_composition.interning import Interner
+from stochastic_service_composition.services import Service
+from stochastic_service_composition.slicing import CommunitySlice
+from stochastic_service_composition.target import Target
+from stochastic_service_composition.types import (
+    Action,
+    MDPDynamics,
+    Prob,
+    Reward,
+    State,
+)
+
+INDEX_DTYPE = np.int32
+POINTER_DTYPE = np.int64
+VALUE_DTYPE = np.float64
+
+
+class SparseMDP:
+    """An MDP with integer-indexed states and CSR-encoded dynamics."""
+
+    def __init__(
+        self,
+        states: Sequence[State],
+        actions: Sequence[Action],
+        state_ptr: np.ndarray,
+        pair_actions: np.ndarray,
+        rewards: np.ndarray,
+        pair_ptr: np.ndarray,
+        next_states: np.ndarray,
+        probabilities: np.ndarray,
+        gamma: float,
+    ):
+        """
+        Initialize the sparse MDP.
+
+        :param states: the states, indexed by their identifier
+        :param actions: the actions, indexed by their identifier
+        :param state_ptr: the row pointers from states to (state, action) pairs
+        :param pair_actions: the action identifier of every (state, action) pair
+        :param rewards: the reward of every (state, action) pair
+        :param pair_ptr: the row pointers from (state, action) pairs to transitions
+        :param next_states: the next state identifier of every transition
+        :param probabilities: the probability of every transition
+        :param gamma: the discount factor
+        """
+        self.states = list(states)
+        self.actions = list(actions)
+        self.state_ptr = state_ptr
+        self.pair_actions = pair_actions
+        self.rewards = rewards
+        self.pair_ptr = pair_ptr
+        self.next_states = next_states
+        self.probabilities = probabilities
+        self.gamma = gamma
+
+        self.state_ids: Dict[State, int] = {
+            state: state_id for state_id, state in enumerate(self.states)
+        }
+        self.action_ids: Dict[Action, int] = {
+            action: action_id for action_id, action in enumerate(self.actions)
+        }
+
+    @property
+    def nb_states(self) -> int:
+        """Get the number of states."""
+        return len(self.states)
+
+    @property
+    def nb_pairs(self) -> int:
+        """Get the number of (state, action) pairs."""
+        return len(self.pair_actions)
+
+    @property
+    def nb_transitions(self) -> int:
+        """Get the number of transitions."""
+        return len(self.next_states)
+
+    @property
+    def pair_states(self) -> np.ndarray:
+        """Get the source state identifier of every (state, action) pair."""
+        return np.repeat(
+            np.arange(self.nb_states, dtype=INDEX_DTYPE), np.diff(self.state_ptr)
+        )
+
+    @property
+    def transition_pairs(self) -> np.ndarray:
+        """Get the (state, action) pair identifier of every transition."""
+        return np.repeat(
+            np.arange(self.nb_pairs, dtype=INDEX_DTYPE), np.diff(self.pair_ptr)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Get the number of bytes used by the arrays of the dynamics."""
+        return sum(
+            array_.nbytes
+            for array_ in (
+                self.state_ptr,
+                self.pair_actions,
+                self.rewards,
+                self.pair_ptr,
+                self.next_states,
+                self.probabilities,
+            )
+        )
+
+    def get_state_id(self, state: State) -> int:
+        """Get the identifier of a state."""
+        return self.state_ids[state]
+
+    def get_pairs(self, state_id: int) -> range:
+        """Get the identifiers of the (state, action) pairs of a state."""
+        return range(self.state_ptr[state_id], self.state_ptr[state_id + 1])
+
+    def get_transitions(self, pair_id: int) -> Tuple[Dict[State, Prob], Reward]:
+        """Get the next state distribution and the reward of a (state, action) pair."""
+        start, end = self.pair_ptr[pair_id], self.pair_ptr[pair_id + 1]
+        next_state_dist = {
+            self.states[next_state]: float(prob)
+            for next_state, prob in zip(
+                self.next_states[start:end], self.probabilities[start:end]
+            )
+        }
+        return next_state_dist, float(self.rewards[pair_id])
+
+    def to_dynamics(self) -> MDPDynamics:
+        """Convert the sparse MDP into the dictionary-based dynamics."""
+        dynamics: MDPDynamics = {}
+        for state_id, state in enumerate(self.states):
+            transitions = dynamics.setdefault(state, {})
+            for pair_id in self.get_pairs(state_id):
+                action = self.actions[self.pair_actions[pair_id]]
+                transitions[action] = self.get_transitions(pair_id)
+        return dynamics
+
+    def to_mdp(self) -> MDP:
+        """Convert the sparse MDP into an instance of mdp_dp_rl.processes.mdp.MDP."""
+        return MDP(self.to_dynamics(), self.gamma)
+
+    def with_rewards(
+        self, rewards: Optional[np.ndarray] = None, gamma: Optional[float] = None
+    ) -> "SparseMDP":
+        """
+        Get a variant of the MDP, with other rewards and/or discount factor.
+
+        The variant shares the states and the transition arrays with this MDP.
+
+        :param rewards: the reward of every (state, action) pair (default: the same rewards)
+        :param gamma: the discount factor (default: the same discount factor)
+        :return: the variant of the MDP
+        """
+        variant = copy.copy(self)
+        if rewards is not None:
+            rewards = np.asarray(rewards, dtype=VALUE_DTYPE)
+            if rewards.shape != (self.nb_pairs,):
+                raise ValueError(
+                    f"expected {self.nb_pairs} rewards, got shape {rewards.shape}"
+                )
+            variant.rewards = rewards
+        if gamma is not None:
+            variant.gamma = gamma
+        return variant
+
+    @classmethod
+    def from_dynamics(
+        cls,
+        dynamics: Iterable[Tuple[State, Dict[Action, Tuple[Dict[State, Prob], Reward]]]],
+        gamma: float,
+        actions: Optional[Sequence[Action]] = None,
+    ) -> "SparseMDP":
+        """
+        Build a sparse MDP from a stream of (state, transitions by action).
+
+        State identifiers are assigned in order of first appearance, either as
+        source or as next state. Every state must appear exactly once as source.
+
+        :param dynamics: the pairs (state, transitions by action), e.g. the items of an MDPDynamics
+        :param gamma: the discount factor
+        :param actions: the known actions, to fix their identifiers (optional)
+        :return: the sparse MDP
+        """
+        states: List[State] = []
+        state_ids: Dict[State, int] = {}
+        action_list: List[Action] = list(actions) if actions is not None else []
+        action_ids = {action: action_id for action_id, action in enumerate(action_list)}
+
+        def _intern(state: State) -> int:
+            state_id = state_ids.get(state)
+            if state_id is None:
+                state_id = state_ids[state] = len(states)
+                states.append(state)
+            return state_id
+
+        pair_sources = array("q")
+        pair_actions = array("q")
+        rewards = array("d")
+        pair_ptr = array("q", [0])
+        next_states = array("q")
+        probabilities = array("d")
+        for state, transitions_by_action in dynamics:
+            state_id = _intern(state)
+            for action, (next_state_dist, reward) in transitions_by_action.items():
+                action_id = action_ids.get(action)
+                if action_id is None:
+                    action_id = action_ids[action] = len(action_list)
+                    action_list.append(action)
+                pair_sources.append(state_id)
+                pair_actions.append(action_id)
+                rewards.append(reward)
+                for next_state, prob in next_state_dist.items():
+                    next_states.append(_intern(next_state))
+                    probabilities.append(prob)
+                pair_ptr.append(len(next_states))
+
+        sources = np.array(pair_sources, dtype=np.int64)
+        state_ptr = _pointers(np.bincount(sources, minlength=len(states)))
+        pair_actions_array = np.array(pair_actions, dtype=INDEX_DTYPE)
+        rewards_array = np.array(rewards, dtype=VALUE_DTYPE)
+        pair_ptr_array = np.array(pair_ptr, dtype=POINTER_DTYPE)
+        next_states_array = np.array(next_states, dtype=INDEX_DTYPE)
+        probabilities_array = np.array(probabilities, dtype=VALUE_DTYPE)
+
+        if np.any(sources[1:] < sources[:-1]):
+            # pairs are not grouped by source state: sort them (stably) by state id
+            order = np.argsort(sources, kind="stable")
+            lengths = np.diff(pair_ptr_array)[order]
+            transition_order = _concatenate_ranges(pair_ptr_array[order], lengths)
+            pair_actions_array = pair_actions_array[order]
+            rewards_array = rewards_array[order]
+            pair_ptr_array = _pointers(lengths)
+            next_states_array = next_states_array[transition_order]
+            probabilities_array = probabilities_array[transition_order]
+
+        return cls(
+            states,
+            action_list,
+            state_ptr,
+            pair_actions_array,
+            rewards_array,
+            pair_ptr_array,
+            next_states_array,
+            probabilities_array,
+            gamma,
+        )
+
+    @classmethod
+    def from_mdp(cls, mdp: MDP) -> "SparseMDP":
+        """Build a sparse MDP from an instance of mdp_dp_rl.processes.mdp.MDP."""
+        dynamics = (
+            (
+                state,
+                {
+                    action: (next_state_dist, mdp.rewards[state][action])
+                    for action, next_state_dist in mdp.transitions[state].items()
+                },
+            )
+            for state in mdp.transitions
+        )
+        return cls.from_dynamics(dynamics, mdp.gamma)
+
+
+def composition_sparse_mdp(
+    target: Target,
+    *services: Service,
+    gamma: float = DEFAULT_GAMMA,
+    factored: bool = False,
+    interner: Optional[Interner] = None,
+    sliced: bool = False,
+    pruned: bool = False,
+    community: Optional[CommunitySlice] = None,
+) -> SparseMDP:
+    """
+    Compute the composition MDP in sparse format.
+
+    The result is equivalent to the one of composition.composition_mdp, but
+    the dictionary-based dynamics are never materialized. The initial
+    state COMPOSITION_MDP_INITIAL_STATE has always identifier 0, and the
+    identifier of the action of choosing the i-th service is always i.
+
+    :param target: the target service.
+    :param services: the community of services.
+    :param gamma: the discount factor.
+    :param factored: if True, use a factored system service instead of building the product of the services.
+    :param interner: the interner of states and distributions, shared with the system service (optional).
+    :param sliced: if True, restrict the services to the actions of the target before building their product;
+      the result is the same.
+    :param pruned: if True, also drop the services dominated by another service (see slicing.slice_community);
+      the result is a lower bound.
+    :param community: the slice of the community to compose, e.g. with spares swapped in (default: computed from
+      the services, according to sliced and pruned).
+    :return: the composition MDP, in sparse format.
+    """
+    return SparseMDP.from_dynamics(
+        _composition_dynamics(
+            target, services, factored, interner, sliced, pruned, community
+        ),
+        gamma,
+        actions=_composition_actions(len(services)),
+    )
+
+
+def _composition_actions(nb_services: int) -> List[Action]:
+    """Get the actions of a composition MDP, sorted by their identifier."""
+    return [
+        *range(nb_services),
+        COMPOSITION_MDP_INITIAL_ACTION,
+        COMPOSITION_MDP_UNDEFINED_ACTION,
+    ]
+
+
+def _concatenate_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate the ranges [starts[i], starts[i] + counts[i])."""
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(counts.sum())
+
+
+def _pointers(counts: np.ndarray) -> np.ndarray:
+    """Get the CSR row pointers from the number of elements of every row."""
+    pointers = np.zeros(len(counts) + 1, dtype=POINTER_DTYPE)
+    np.cumsum(counts, out=pointers[1:])
+    return pointers
@@ -1,6 +1,7 @@
 """Represent a target service."""
-from typing import Dict, Set
+from typing import Dict, Optional, Set
 
+from stochastic_service_composition.interning import Interner
 from stochastic_service_composition.services import Service
 from stochastic_service_composition.types import (
     Action,
@@ -101,6 +102,7 @@ def build_target_from_transitions(
     dynamics_function: TargetDynamics,
     initial_state: State,
     final_states: Set[State],
+    interner: Optional[Interner] = None,
 ) -> Target:
     """
     Initialize a service from transitions, initial state and final states.
@@ -111,8 +113,19 @@ def build_target_from_transitions(
     :param dynamics_function: the transition function
     :param initial_state: the initial state
     :param final_states: the final states
+    :param interner: the interner of states and actions (optional)
     :return: the service
     """
+    if interner is not None:
+        dynamics_function = {
+            interner.intern(start_state): {
+                interner.intern(action): (interner.intern(next_state), prob, reward)
+                for action, (next_state, prob, reward) in transitions_by_action.items()
+            }
+            for start_state, transitions_by_action in dynamics_function.items()
+        }
+        initial_state = interner.intern(initial_state)
+        final_states = {interner.intern(final_state) for final_state in final_states}
     states = set()
     actions = set()
     transition_function: TransitionFunction = {}
@@ -13,3 +13,5 @@ Prob = float
 TransitionFunction = Dict[State, Dict[Action, State]]
 MDPDynamics = Dict[State, Dict[Action, Tuple[Dict[State, Prob], Reward]]]
 TargetDynamics = Dict[State, Dict[Action, Tuple[State, Prob, Reward]]]
+# a (non-initial) state of the composition MDP: (system state, target state, symbol)
+CompositionState = Tuple[Tuple[State, ...], State, Action]
@@ -1,10 +1,13 @@
 """The conftest.py module."""
+from typing import Callable, Optional
+
 import pytest
 from pytest_lazyfixture import lazy_fixture
 
 from stochastic_service_composition.services import (
     Service,
     build_deterministic_service_from_transitions,
+    build_service_from_transitions,
 )
 from stochastic_service_composition.target import Target, build_target_from_transitions
 from stochastic_service_composition.types import TransitionFunction
@@ -203,3 +206,43 @@ def garden_bots_system_target():
         "t0",
         {"t0"},
     )
+
+
+def _build_machine(
+    action: str,
+    broken_prob: float,
+    action_reward: float = -1.0,
+    repair_reward: float = -10.0,
+    repair_action: Optional[str] = None,
+    check_action: Optional[str] = None,
+) -> Service:
+    """
+    Build a machine that can break, and has to be repaired with a penalty.
+
+    :param action: the action of the machine
+    :param broken_prob: the probability of breaking while doing the action
+    :param action_reward: the reward of the action
+    :param repair_reward: the reward of the repair
+    :param repair_action: the action that repairs the machine (default: the check action, or the action itself)
+    :param check_action: if given, after the action the machine is in state "done", and goes back to "available"
+      with the check action, with reward 0
+    :return: the machine
+    """
+    if repair_action is None:
+        repair_action = check_action if check_action is not None else action
+    next_state = "done" if check_action is not None else "available"
+    transition_function = {
+        "available": {
+            action: ({next_state: 1.0 - broken_prob, "broken": broken_prob}, action_reward)
+        },
+        "broken": {repair_action: ({"available": 1.0}, repair_reward)},
+    }
+    if check_action is not None:
+        transition_function["done"] = {check_action: ({"available": 1.0}, 0.0)}
+    return build_service_from_transitions(transition_function, "available", {"available"})
+
+
+@pytest.fixture()
+def machine_factory() -> Callable[..., Service]:
+    """Get the factory of machines that can break (see _build_machine)."""
+    return _build_machine
@@ -0,0 +1,64 @@
+"""This module contains the tests for the batch.py module."""
+import pytest
+
+from stochastic_service_composition.batch import (
+    batch_composition_mdps,
+    batch_composition_sparse_mdps,
+    batch_solve,
+)
+from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+@pytest.fixture()
+def garden_bots_targets(garden_bots_system_target):
+    """Get two targets of the garden bots system, with different recipes."""
+    watering_target = build_target_from_transitions(
+        {
+            "t0": {"clean": ("t1", 1.0, 1.0)},
+            "t1": {"water": ("t2", 1.0, 2.0)},
+            "t2": {"empty": ("t0", 1.0, 1.0)},
+        },
+        "t0",
+        {"t0"},
+    )
+    return [garden_bots_system_target, watering_target]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_batch_composition_mdps(
+    max_workers, garden_bots_targets, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the batch composition is equal to the compositions of every target."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+
+    actual = batch_composition_mdps(
+        garden_bots_targets, *services, max_workers=max_workers
+    )
+    actual_sparse = batch_composition_sparse_mdps(
+        garden_bots_targets, *services, max_workers=max_workers
+    )
+
+    assert len(actual) == len(actual_sparse) == len(garden_bots_targets)
+    for target, mdp, sparse_mdp in zip(garden_bots_targets, actual, actual_sparse):
+        expected = composition_mdp(target, *services)
+        assert mdp.transitions == expected.transitions
+        assert mdp.rewards == expected.rewards
+        expected_sparse = composition_sparse_mdp(target, *services)
+        assert sparse_mdp.states == expected_sparse.states
+        assert sparse_mdp.to_dynamics() == expected_sparse.to_dynamics()
+
+
+def test_batch_solve(
+    garden_bots_targets, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the batch solution gives the optimal policy of every target."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+
+    policies = batch_solve(garden_bots_targets, *services, factored=True, max_workers=2)
+
+    for target, policy in zip(garden_bots_targets, policies):
+        expected = solve(composition_sparse_mdp(target, *services))
+        assert policy.policy_data == expected.policy_data
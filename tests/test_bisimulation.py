@@ -0,0 +1,67 @@
+"""This module contains the tests for the bisimulation.py module."""
+import numpy as np
+
+from stochastic_service_composition.bisimulation import (
+    bisimulation_partition,
+    minimize,
+    solve_minimized,
+)
+from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
+
+
+def test_bisimulation_partition():
+    """Test the partition of a small MDP, with two bisimilar branches."""
+    dynamics = {
+        "s": {"a": ({"l1": 0.5, "r1": 0.5}, 0.0), "b": ({"x": 1.0}, 0.0)},
+        "l1": {"a": ({"l2": 1.0}, 1.0)},
+        "r1": {"a": ({"r2": 1.0}, 1.0)},
+        "l2": {"a": ({"l2": 1.0}, 0.0)},
+        "r2": {"a": ({"r2": 1.0}, 0.0)},
+        "x": {"a": ({"x": 1.0}, 1.0)},
+    }
+    mdp = SparseMDP.from_dynamics(dynamics.items(), 0.9)
+
+    blocks = bisimulation_partition(mdp)
+    block_of = dict(zip(mdp.states, blocks))
+
+    assert block_of["l1"] == block_of["r1"]
+    assert block_of["l2"] == block_of["r2"]
+    assert len(set(block_of.values())) == 4
+    quotient, _ = minimize(mdp)
+    assert quotient.nb_states == 4
+    assert quotient.get_transitions(quotient.get_pairs(0)[0]) == ({"l1": 1.0}, 0.0)
+
+
+def test_solve_minimized(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that solving on the quotient gives the optimal policy."""
+    mdp = composition_sparse_mdp(
+        garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+    )
+    expected = solve(mdp, tol=1e-8)
+
+    quotient, blocks = minimize(mdp)
+    actual = solve_minimized(mdp, tol=1e-8)
+
+    assert quotient.nb_states < mdp.nb_states
+    assert len(blocks) == mdp.nb_states
+    probability_sums = np.add.reduceat(quotient.probabilities, quotient.pair_ptr[:-1])
+    np.testing.assert_allclose(probability_sums, 1.0)
+    assert actual.policy_data == expected.policy_data
+    np.testing.assert_allclose(actual.values, expected.values)
+
+
+def test_solve_minimized_mdp(target_service, bathroom_heating_device, bathtub_device):
+    """Test the minimization of an instance of mdp_dp_rl.processes.mdp.MDP."""
+    mdp = composition_mdp(target_service, bathroom_heating_device, bathtub_device)
+    expected = mdp.get_optimal_policy()
+
+    actual = solve_minimized(mdp)
+
+    assert actual.get_state_to_action_map() == {
+        state: next(iter(action_dist))
+        for state, action_dist in expected.policy_data.items()
+    }
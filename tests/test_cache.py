@@ -0,0 +1,120 @@
+"""This module contains the tests for the cache.py module."""
+import copy
+import json
+import pickle  # nosec
+
+from stochastic_service_composition.cache import (
+    CompositionCache,
+    cached_composition,
+    composition_size,
+    spec_hash,
+)
+from stochastic_service_composition.services import build_service_from_transitions
+from stochastic_service_composition.solvers import GAUSS_SEIDEL
+
+
+def test_spec_hash_is_canonical(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the hash does not depend on the encoding of equal specs."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = spec_hash(garden_bots_system_target, services)
+
+    # JSON round trip: transitions become lists, integer rewards become ints
+    transition_function = json.loads(json.dumps(bcleaner_service.transition_function))
+    same_cleaner = build_service_from_transitions(
+        dict(reversed(list(transition_function.items()))),
+        bcleaner_service.initial_state,
+        set(bcleaner_service.final_states),
+    )
+    actual = spec_hash(garden_bots_system_target, [same_cleaner, *services[1:]])
+    assert actual == expected
+
+    assert spec_hash(garden_bots_system_target, services, gamma=0.8) != expected
+    assert spec_hash(garden_bots_system_target, services, solver_kwargs={}) == expected
+    assert (
+        spec_hash(garden_bots_system_target, services, solver_kwargs={"tol": 1e-3})
+        != expected
+    )
+    assert spec_hash(garden_bots_system_target, services[::-1]) != expected
+    changed_cleaner = copy.deepcopy(bcleaner_service)
+    changed_cleaner.transition_function["a0"]["clean"] = ({"a1": 1.0}, -1.0)
+    changed = spec_hash(garden_bots_system_target, [changed_cleaner, *services[1:]])
+    assert changed != expected
+
+
+def test_cache_lru_eviction():
+    """Test the size-based eviction of the least recently used entries."""
+    cache = CompositionCache(max_bytes=1000)
+    cache.put("a", b"x" * 400)
+    cache.put("b", b"x" * 400)
+    assert cache.get("a") is not None
+    cache.put("c", b"x" * 400)
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.nbytes <= 1000
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_explicit_size():
+    """Test that an entry with explicit size is not pickled, and is evicted by that size."""
+
+    class Unpicklable:
+        def __reduce__(self):
+            raise AssertionError("the value should not be pickled")
+
+    cache = CompositionCache(max_bytes=1000)
+    cache.put("a", Unpicklable(), size=600)
+    assert cache.nbytes == 600
+    cache.put("b", b"x" * 100, size=500)
+    assert "a" not in cache
+    assert cache.nbytes == 500
+
+
+def test_cached_composition(
+    tmp_path,
+    garden_bots_system_target,
+    bcleaner_service,
+    bmulti_service,
+    bplucker_service,
+):
+    """Test that an equal problem is a cache hit, also from disk."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    cache = CompositionCache(directory=tmp_path)
+    mdp, policy = cached_composition(cache, garden_bots_system_target, *services)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cached_mdp, cached_policy = cached_composition(
+        cache, garden_bots_system_target, *copy.deepcopy(services)
+    )
+    assert cached_mdp is mdp and cached_policy is policy
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    other_cache = CompositionCache(directory=tmp_path)
+    _, disk_policy = cached_composition(
+        other_cache, garden_bots_system_target, *services
+    )
+    assert (other_cache.hits, other_cache.misses) == (1, 0)
+    assert disk_policy.policy_data == policy.policy_data
+
+
+def test_cached_composition_solver_kwargs(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the policies solved with different arguments are cached separately."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    cache = CompositionCache()
+    mdp, policy = cached_composition(cache, garden_bots_system_target, *services)
+    _, other_policy = cached_composition(
+        cache, garden_bots_system_target, *services, method=GAUSS_SEIDEL
+    )
+    assert other_policy is not policy
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    # the size covers the states and the policy, not only the arrays of the MDP
+    size = composition_size(mdp, policy)
+    assert size > mdp.nbytes + policy.values.nbytes
+    # the same order of magnitude of the pickled entry
+    assert size >= 0.5 * len(pickle.dumps((mdp, policy)))  # nosec
@@ -0,0 +1,71 @@
+"""This module contains the tests for the compiled_policy.py module."""
+import numpy as np
+import pytest
+
+from stochastic_service_composition.compiled_policy import (
+    MISSING_CODE,
+    MISSING_KEY,
+    UNDEFINED_CODE,
+    CompiledPolicy,
+)
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_STATE,
+    composition_mdp,
+)
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+
+
+def test_compiled_policy(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the compiled policy takes the same decisions of the policy."""
+    mdp = composition_sparse_mdp(
+        garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+    )
+    policy = solve(mdp)
+
+    compiled_policy = CompiledPolicy.from_policy(policy)
+
+    states = [state for state in mdp.states if state != COMPOSITION_MDP_INITIAL_STATE]
+    assert compiled_policy.nb_services == 3
+    assert compiled_policy.nb_states == len(states)
+    # the keys are unique, and the decision table is one entry per state
+    assert len(np.unique(compiled_policy.keys)) == len(states)
+    for state in states:
+        expected = policy.get_action_for_state(state)
+        assert compiled_policy.get_action_for_state(state) == expected
+    action_codes = compiled_policy.get_action_codes(
+        compiled_policy.encode_states(states)
+    )
+    expected_codes = [
+        UNDEFINED_CODE if action == "undefined" else action
+        for action in (policy.get_action_for_state(state) for state in states)
+    ]
+    np.testing.assert_array_equal(action_codes, expected_codes)
+
+
+def test_compiled_policy_missing_state(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test lookups of states that are not states of the policy."""
+    mdp = composition_mdp(
+        garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+    )
+    compiled_policy = CompiledPolicy.from_policy(mdp.get_optimal_policy())
+    # the state is not reachable, but its components are in their domains
+    unreachable_state = (("a1", "b1", "c1"), "t0", "clean")
+    assert unreachable_state not in mdp.all_states
+    # the target state is not in its domain
+    unknown_state = (("a0", "b0", "c0"), "unknown", "clean")
+
+    with pytest.raises(KeyError):
+        compiled_policy.get_action_for_state(unreachable_state)
+    with pytest.raises(KeyError):
+        compiled_policy.encode(unknown_state)
+    keys = compiled_policy.encode_states([unreachable_state, unknown_state])
+    assert keys[0] == compiled_policy.encode(unreachable_state)
+    assert keys[1] == MISSING_KEY
+    np.testing.assert_array_equal(
+        compiled_policy.get_action_codes(keys), [MISSING_CODE, MISSING_CODE]
+    )
@@ -2,7 +2,11 @@
 from graphviz import Digraph
 from mdp_dp_rl.processes.mdp import MDP
 
-from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_STATE,
+    composition_mdp,
+    iter_composition,
+)
 from stochastic_service_composition.rendering import mdp_to_graphviz
 from stochastic_service_composition.services import (
     build_service_from_transitions,
@@ -89,3 +93,33 @@ def test_garden_bots_system_composition(
     assert isinstance(mdp, MDP)
     mdp_graphviz = mdp_to_graphviz(mdp)
     assert isinstance(mdp_graphviz, Digraph)
+
+
+def test_factored_composition(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the composition with the factored system service is the same."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = composition_mdp(garden_bots_system_target, *services)
+    actual = composition_mdp(garden_bots_system_target, *services, factored=True)
+    assert actual.transitions == expected.transitions
+    assert actual.rewards == expected.rewards
+
+
+def test_iter_composition(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the streamed transitions are the ones of the composition MDP, lazily."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    stream = iter_composition(garden_bots_system_target, *services)
+    first_transition = next(stream)
+    assert first_transition.state == COMPOSITION_MDP_INITIAL_STATE
+    assert first_transition.action == "initial"
+
+    mdp = composition_mdp(garden_bots_system_target, *services)
+    expected = [
+        (state, action, next_state_dist, mdp.rewards[state][action])
+        for state, transitions in mdp.transitions.items()
+        for action, next_state_dist in transitions.items()
+    ]
+    assert [first_transition, *stream] == expected
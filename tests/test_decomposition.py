@@ -0,0 +1,88 @@
+"""This module contains the tests for the decomposition.py module."""
+import pytest
+
+from stochastic_service_composition.decomposition import (
+    alphabet_groups,
+    decomposed_composition,
+)
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+@pytest.fixture()
+def workshop_target():
+    """Get the target of a workshop, with a random choice between two jobs."""
+    return build_target_from_transitions(
+        {
+            "t0": {"cut": ("t1", 0.6, 0.0), "weld": ("t1", 0.4, 0.0)},
+            "t1": {"ship": ("t0", 1.0, 1.0)},
+        },
+        "t0",
+        {"t0"},
+    )
+
+
+@pytest.fixture()
+def workshop_services(machine_factory):
+    """Get the services of the workshop."""
+    return [
+        machine_factory("cut", 0.3, -1.0),
+        machine_factory("weld", 0.1, -1.0),
+        machine_factory("cut", 0.0, -3.0),
+        machine_factory("ship", 0.0, -1.0),
+        machine_factory("weld", 0.0, -2.0),
+    ]
+
+
+def test_alphabet_groups(
+    workshop_services, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test the groups of services with overlapping alphabets."""
+    assert alphabet_groups(workshop_services) == [[0, 2], [1, 4], [3]]
+    garden_services = [bcleaner_service, bmulti_service, bplucker_service]
+    assert alphabet_groups(garden_services) == [[0, 1, 2]]
+
+
+def test_decomposed_composition(workshop_target, workshop_services):
+    """Test that the decomposition takes the same choices of the monolithic composition."""
+    decomposition = decomposed_composition(
+        workshop_target, *workshop_services, tol=1e-10
+    )
+    assert decomposition.is_exact
+
+    mdp = composition_sparse_mdp(workshop_target, *workshop_services)
+    policy = solve(mdp, tol=1e-10)
+    assert all(group.mdp.nb_states < mdp.nb_states for group in decomposition.groups)
+    for state in mdp.states:
+        expected = policy.get_action_for_state(state)
+        assert decomposition.get_action_for_state(state) == expected
+
+
+def test_decomposed_composition_with_failures(
+    target_service,
+    bathroom_heating_device,
+    bathtub_device,
+    kitchen_door_device,
+    bathroom_door_device,
+    kitchen_exhaust_fan_device,
+    user_behaviour,
+):
+    """Test the decomposition of a community that cannot always serve the target."""
+    services = [
+        bathroom_heating_device,
+        bathtub_device,
+        kitchen_door_device,
+        bathroom_door_device,
+        kitchen_exhaust_fan_device,
+        user_behaviour,
+    ]
+    decomposition = decomposed_composition(target_service, *services)
+    assert len(decomposition.groups) == len(services)
+    assert not decomposition.is_exact
+
+    mdp = composition_sparse_mdp(target_service, *services)
+    policy = solve(mdp)
+    for state in mdp.states:
+        expected = policy.get_action_for_state(state)
+        assert decomposition.get_action_for_state(state) == expected
@@ -0,0 +1,116 @@
+"""This module contains the tests for the estimation.py module."""
+import pickle  # nosec
+
+import pytest
+
+from stochastic_service_composition.decomposition import DecomposedComposition
+from stochastic_service_composition.estimation import (
+    DECOMPOSED_ENGINE,
+    FACTORED_ENGINE,
+    MONOLITHIC_ENGINE,
+    CompositionBudget,
+    CompositionTooLargeError,
+    choose_engine,
+    compose_within_budget,
+    estimate_composition_size,
+)
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+@pytest.fixture()
+def garden_services(bcleaner_service, bmulti_service, bplucker_service):
+    """Get the services of the garden."""
+    return [bcleaner_service, bmulti_service, bplucker_service]
+
+
+def test_estimate_composition_size(garden_bots_system_target, garden_services):
+    """Test that the estimate is an upper bound, and exact when the composition is explored."""
+    mdp = composition_sparse_mdp(garden_bots_system_target, *garden_services)
+    bounds = estimate_composition_size(
+        garden_bots_system_target, *garden_services, max_explored_states=0
+    )
+    assert bounds.nb_system_states == 8
+    assert bounds.nb_states >= mdp.nb_states
+    assert bounds.nb_pairs >= mdp.nb_pairs
+    assert bounds.nb_transitions >= mdp.nb_transitions
+
+    estimate = estimate_composition_size(garden_bots_system_target, *garden_services)
+    assert estimate == (8, mdp.nb_states, mdp.nb_pairs, mdp.nb_transitions)
+
+
+def test_choose_engine(garden_bots_system_target, garden_services):
+    """Test the choice of the engine, and the refusal of the requests over budget."""
+    estimate = estimate_composition_size(garden_bots_system_target, *garden_services)
+    assert (
+        choose_engine(
+            garden_bots_system_target, *garden_services, budget=CompositionBudget()
+        )
+        == MONOLITHIC_ENGINE
+    )
+    budget = CompositionBudget(max_states=estimate.nb_states, max_system_states=4)
+    assert (
+        choose_engine(garden_bots_system_target, *garden_services, budget=budget)
+        == FACTORED_ENGINE
+    )
+    budget = CompositionBudget(max_transitions=estimate.nb_transitions - 1)
+    with pytest.raises(CompositionTooLargeError) as excinfo:
+        choose_engine(garden_bots_system_target, *garden_services, budget=budget)
+    assert excinfo.value.estimate == estimate
+    assert isinstance(excinfo.value, ValueError)
+    # the error can cross process boundaries
+    error = pickle.loads(pickle.dumps(excinfo.value))  # nosec
+    assert (error.estimate, error.budget) == (estimate, budget)
+    assert str(error) == str(excinfo.value)
+
+
+def test_compose_within_budget(machine_factory):
+    """Test that a community with independent groups is decomposed to fit the budget."""
+    target = build_target_from_transitions(
+        {
+            "t0": {"cut": ("t1", 0.5, 0.0), "weld": ("t1", 0.5, 0.0)},
+            "t1": {"ship": ("t0", 1.0, 1.0)},
+        },
+        "t0",
+        {"t0"},
+    )
+    services = [
+        machine_factory("cut", 0.1),
+        machine_factory("cut", 0.2),
+        machine_factory("weld", 0.1),
+        machine_factory("weld", 0.2),
+        machine_factory("ship", 0.0),
+    ]
+    estimate = estimate_composition_size(target, *services)
+    budget = CompositionBudget(max_states=estimate.nb_states - 1)
+    assert choose_engine(target, *services, budget=budget) == DECOMPOSED_ENGINE
+    orchestrator = compose_within_budget(target, *services, budget=budget)
+    assert isinstance(orchestrator, DecomposedComposition)
+    assert len(orchestrator.groups) == 3
+
+
+def test_estimate_with_zero_probability_symbols(machine_factory):
+    """Test that the bounds hold when the target may request an action with probability zero."""
+    target = build_target_from_transitions(
+        {
+            "t0": {"cut": ("t1", 1.0, 0.0), "weld": ("t1", 0.0, 0.0)},
+            "t1": {"ship": ("t0", 1.0, 1.0)},
+        },
+        "t0",
+        {"t0"},
+    )
+    services = [
+        machine_factory("cut", 0.1),
+        machine_factory("weld", 0.1),
+        machine_factory("ship", 0.0),
+    ]
+    mdp = composition_sparse_mdp(target, *services)
+    bounds = estimate_composition_size(target, *services, max_explored_states=0)
+    assert bounds.nb_states >= mdp.nb_states
+    assert bounds.nb_pairs >= mdp.nb_pairs
+    assert bounds.nb_transitions >= mdp.nb_transitions
+    estimate = estimate_composition_size(target, *services)
+    assert estimate[1:] == (mdp.nb_states, mdp.nb_pairs, mdp.nb_transitions)
+
+    with pytest.raises(ValueError, match="no services"):
+        estimate_composition_size(target)
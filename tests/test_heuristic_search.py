@@ -0,0 +1,37 @@
+"""This module contains the tests for the heuristic_search.py module."""
+import pytest
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_ACTION,
+    COMPOSITION_MDP_INITIAL_STATE,
+)
+from stochastic_service_composition.heuristic_search import lao_star
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+
+
+def test_lao_star(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that LAO* finds the optimal policy, without expanding all the states."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    mdp = composition_sparse_mdp(garden_bots_system_target, *services)
+    expected = solve(mdp, tol=1e-10)
+
+    policy = lao_star(garden_bots_system_target, *services, tol=1e-10)
+
+    assert policy.nb_expanded < mdp.nb_states
+    assert (
+        policy.get_action_for_state(COMPOSITION_MDP_INITIAL_STATE)
+        == COMPOSITION_MDP_INITIAL_ACTION
+    )
+    dict_mdp = mdp.to_mdp()
+    for state, value in policy.values.items():
+        assert value == pytest.approx(expected.get_value_for_state(state), abs=1e-6)
+        # the chosen action attains the optimal value
+        action = policy.get_action_for_state(state)
+        q_value = dict_mdp.rewards[state][action] + dict_mdp.gamma * sum(
+            prob * expected.get_value_for_state(next_state)
+            for next_state, prob in dict_mdp.transitions[state][action].items()
+        )
+        assert q_value == pytest.approx(value, abs=1e-6)
@@ -0,0 +1,88 @@
+"""This module contains the tests for the hierarchical.py module."""
+import pytest
+
+from stochastic_service_composition.hierarchical import (
+    hierarchical_composition,
+    segment_target,
+)
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+@pytest.fixture()
+def production_line_target():
+    """Get the target of a production line, with two cells."""
+    return build_target_from_transitions(
+        {
+            "t0": {"load": ("t1", 1.0, 0.0)},
+            "t1": {"press": ("t2", 1.0, 0.0)},
+            "t2": {"paint": ("t3", 1.0, 0.0)},
+            "t3": {"ship": ("t0", 1.0, 1.0)},
+        },
+        "t0",
+        {"t0"},
+    )
+
+
+@pytest.fixture()
+def production_line_services(machine_factory):
+    """Get the services of the production line."""
+    return [
+        machine_factory("load", 0.0, -1.0),
+        machine_factory("press", 0.1, -1.0),
+        machine_factory("press", 0.0, -2.0),
+        machine_factory("paint", 0.2, -1.0),
+        machine_factory("paint", 0.0, -2.0),
+        machine_factory("ship", 0.0, -1.0),
+    ]
+
+
+def test_segment_target(production_line_target):
+    """Test that the transitions leaving the segment are redirected to the segment."""
+    segment = segment_target(production_line_target, {"load", "ship"})
+    assert segment.initial_state == "t0"
+    assert segment.transition_function == {
+        "t0": {"load": "t3"},
+        "t3": {"ship": "t0"},
+    }
+    assert segment.reward["t3"]["ship"] == 1.0
+
+    with pytest.raises(ValueError, match="no target state"):
+        segment_target(production_line_target, {"weld"})
+
+
+def test_hierarchical_composition(production_line_target, production_line_services):
+    """Test that the controller of the cells takes the same choices of the flat policy."""
+    cells = {"front": [0, 1, 2], "back": [3, 4, 5]}
+    controller = hierarchical_composition(
+        production_line_target, *production_line_services, cells=cells, tol=1e-10
+    )
+    assert [cell.name for cell in controller.cells] == ["front", "back"]
+
+    flat_mdp = composition_sparse_mdp(
+        production_line_target, *production_line_services
+    )
+    flat_policy = solve(flat_mdp, tol=1e-10)
+    # every cell is much smaller than the flat composition
+    assert all(cell.mdp.nb_states < flat_mdp.nb_states for cell in controller.cells)
+    for state in flat_mdp.states:
+        expected = flat_policy.get_action_for_state(state)
+        assert controller.get_action_for_state(state) == expected
+
+
+def test_hierarchical_composition_with_singleton_cell(
+    production_line_target, production_line_services
+):
+    """Test the composition of cells with a single service."""
+    cells = {"front": [0, 1, 2, 3, 4], "shipping": [5]}
+    controller = hierarchical_composition(
+        production_line_target, *production_line_services, cells=cells, tol=1e-10
+    )
+    flat_mdp = composition_sparse_mdp(
+        production_line_target, *production_line_services
+    )
+    flat_policy = solve(flat_mdp, tol=1e-10)
+    for state in flat_mdp.states:
+        expected = flat_policy.get_action_for_state(state)
+        assert controller.get_action_for_state(state) == expected
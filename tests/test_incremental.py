@@ -0,0 +1,57 @@
+"""This module contains the tests for the incremental.py module."""
+from stochastic_service_composition.incremental import update_composition
+from stochastic_service_composition.sparse import composition_sparse_mdp
+
+
+def test_update_composition_same_structure(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test an update that changes only rewards."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    mdp = composition_sparse_mdp(garden_bots_system_target, *services)
+    new_transition_function = {
+        "a0": {"clean": ({"a1": 1.0}, -1.0)},
+        "a1": {"empty": ({"a0": 1.0}, 0.0)},
+    }
+
+    mdp, touched_states = update_composition(
+        mdp, garden_bots_system_target, services, 0, new_transition_function
+    )
+
+    bcleaner_service.transition_function = new_transition_function
+    expected = composition_sparse_mdp(garden_bots_system_target, *services).to_mdp()
+    actual = mdp.to_mdp()
+    assert actual.transitions == expected.transitions
+    assert actual.rewards == expected.rewards
+    assert len(touched_states) > 0
+    for state_id in touched_states:
+        (cleaner_state, _, _), _target_state, symbol = mdp.states[state_id]
+        assert (cleaner_state, symbol) == ("a0", "clean")
+
+
+def test_update_composition_new_states(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test an update that makes new composition states reachable."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    mdp = composition_sparse_mdp(garden_bots_system_target, *services)
+    nb_states = mdp.nb_states
+    new_transition_function = {
+        "a0": {"clean": ({"a1": 0.9, "broken": 0.1}, 0.0)},
+        "a1": {"empty": ({"a0": 1.0}, 0.0)},
+        "broken": {},
+    }
+
+    new_mdp, touched_states = update_composition(
+        mdp, garden_bots_system_target, services, 0, new_transition_function
+    )
+
+    bcleaner_service.transition_function = new_transition_function
+    expected = composition_sparse_mdp(garden_bots_system_target, *services).to_mdp()
+    actual = new_mdp.to_mdp()
+    assert new_mdp.states[:nb_states] == mdp.states
+    assert expected.all_states <= actual.all_states
+    for state in expected.all_states:
+        assert actual.transitions[state] == expected.transitions[state]
+        assert actual.rewards[state] == expected.rewards[state]
+    assert max(touched_states) >= nb_states
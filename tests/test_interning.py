@@ -0,0 +1,93 @@
+"""This module contains the tests for the interning.py module."""
+import pytest
+
+from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.interning import Interner
+from stochastic_service_composition.services import build_service_from_transitions
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+def test_interner():
+    """Test the interning of states and distributions."""
+    interner = Interner()
+    state = ("".join(["a", "0"]), "b0")
+    equal_state = ("".join(["a", "0"]), "b0")
+    assert state[0] is not equal_state[0]
+
+    canonical_state = interner.intern(state)
+    assert interner.intern(equal_state) is canonical_state
+    assert interner.intern(equal_state)[0] is canonical_state[0]
+    # only strings and tuples of strings are interned
+    assert interner.intern((1, "a")) == (1, "a")
+    assert interner.intern(1.0) == 1.0 and isinstance(interner.intern(1.0), float)
+
+    distribution = interner.intern_distribution({state: 0.5, ("a1", "b0"): 0.5})
+    assert interner.intern_distribution({equal_state: 0.5, ("a1", "b0"): 0.5}) is (
+        distribution
+    )
+    assert next(iter(distribution)) is canonical_state
+    assert interner.intern_distribution({("a1", "b0"): 0.5, state: 0.5}) is not (
+        distribution
+    )
+
+    report = interner.report()
+    assert report.nb_hits > 0
+    assert report.bytes_saved > 0
+
+
+@pytest.mark.parametrize("factored", [False, True])
+def test_composition_with_interner(
+    factored,
+    garden_bots_system_target,
+    bcleaner_service,
+    bmulti_service,
+    bplucker_service,
+):
+    """Test that interning does not change the composition MDP."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = composition_mdp(garden_bots_system_target, *services, factored=factored)
+
+    interner = Interner()
+    interned_services = [
+        build_service_from_transitions(
+            service.transition_function,
+            service.initial_state,
+            service.final_states,
+            interner=interner,
+        )
+        for service in services
+    ]
+    actual = composition_mdp(
+        garden_bots_system_target,
+        *interned_services,
+        factored=factored,
+        interner=interner,
+    )
+
+    assert list(actual.transitions) == list(expected.transitions)
+    assert actual.transitions == expected.transitions
+    assert actual.rewards == expected.rewards
+    assert interner.report().bytes_saved > 0
+
+
+def test_build_target_with_interner(garden_bots_system_target):
+    """Test that interning does not change the target."""
+    interner = Interner()
+    dynamics = {
+        state: {
+            action: (
+                garden_bots_system_target.transition_function[state][action],
+                garden_bots_system_target.policy[state][action],
+                garden_bots_system_target.reward[state][action],
+            )
+            for action in garden_bots_system_target.transition_function[state]
+        }
+        for state in garden_bots_system_target.transition_function
+    }
+
+    target = build_target_from_transitions(dynamics, "t0", {"t0"}, interner=interner)
+
+    assert target.transition_function == garden_bots_system_target.transition_function
+    assert target.policy == garden_bots_system_target.policy
+    assert target.reward == garden_bots_system_target.reward
+    assert target.initial_state is interner.intern("t0")
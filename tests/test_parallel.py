@@ -0,0 +1,80 @@
+"""This module contains the tests for the parallel.py module."""
+import itertools
+
+import numpy as np
+
+from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.parallel import (
+    parallel_build_system_service,
+    parallel_composition_dynamics,
+    parallel_composition_mdp,
+    parallel_composition_sparse_mdp,
+)
+from stochastic_service_composition.services import build_system_service
+from stochastic_service_composition.sparse import composition_sparse_mdp
+
+
+def test_parallel_build_system_service(
+    bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the parallel system service is identical to the sequential one."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = build_system_service(*services)
+    actual = parallel_build_system_service(*services, max_workers=2, chunk_size=2)
+    assert actual.states == expected.states
+    assert actual.actions == expected.actions
+    assert actual.initial_state == expected.initial_state
+    assert actual.final_states == expected.final_states
+    assert actual.transition_function == expected.transition_function
+
+
+def test_parallel_composition(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the parallel composition is identical to the sequential one."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = composition_mdp(garden_bots_system_target, *services)
+    actual = parallel_composition_mdp(
+        garden_bots_system_target, *services, max_workers=2, chunk_size=2
+    )
+    assert list(actual.transitions) == list(expected.transitions)
+    assert actual.transitions == expected.transitions
+    assert actual.rewards == expected.rewards
+
+
+def test_parallel_composition_sparse(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the parallel sparse composition has the same state numbering."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = composition_sparse_mdp(garden_bots_system_target, *services)
+    actual = parallel_composition_sparse_mdp(
+        garden_bots_system_target, *services, max_workers=2, chunk_size=3
+    )
+    assert actual.states == expected.states
+    assert actual.actions == expected.actions
+    for name in (
+        "state_ptr",
+        "pair_actions",
+        "rewards",
+        "pair_ptr",
+        "next_states",
+        "probabilities",
+    ):
+        assert np.array_equal(getattr(actual, name), getattr(expected, name))
+
+
+def test_parallel_composition_dynamics_stopped_early(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the exploration can be stopped before the end of the stream."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = list(composition_mdp(garden_bots_system_target, *services).transitions)
+    dynamics = parallel_composition_dynamics(
+        garden_bots_system_target, *services, max_workers=2, chunk_size=1
+    )
+    first_states = [state for state, _ in itertools.islice(dynamics, 3)]
+    # closing the stream shuts the pool down
+    dynamics.close()
+    assert first_states == expected[:3]
+    assert next(dynamics, None) is None
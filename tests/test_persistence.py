@@ -0,0 +1,71 @@
+"""This module contains the tests for the persistence.py module."""
+import numpy as np
+import pytest
+
+from stochastic_service_composition.persistence import (
+    load_composition,
+    save_composition,
+)
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load_composition(
+    tmp_path,
+    mmap,
+    garden_bots_system_target,
+    bcleaner_service,
+    bmulti_service,
+    bplucker_service,
+):
+    """Test that a saved composition is loaded back unchanged."""
+    mdp = composition_sparse_mdp(
+        garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+    )
+    policy = solve(mdp)
+    path = tmp_path / "composition.bin"
+    save_composition(path, mdp, policy, metadata={"spec_hash": "0123"})
+
+    loaded_mdp, loaded_policy, metadata = load_composition(path, mmap=mmap)
+
+    assert metadata == {"spec_hash": "0123"}
+    assert loaded_mdp.states == mdp.states
+    assert loaded_mdp.actions == mdp.actions
+    assert loaded_mdp.gamma == mdp.gamma
+    for name in ("state_ptr", "pair_actions", "rewards", "pair_ptr", "next_states"):
+        np.testing.assert_array_equal(getattr(loaded_mdp, name), getattr(mdp, name))
+    np.testing.assert_array_equal(loaded_mdp.probabilities, mdp.probabilities)
+    assert isinstance(loaded_mdp.rewards, np.memmap) == mmap
+    assert loaded_policy.policy_data == policy.policy_data
+    np.testing.assert_array_equal(loaded_policy.values, policy.values)
+    # the loaded MDP can be solved again
+    assert solve(loaded_mdp).policy_data == policy.policy_data
+
+
+def test_load_composition_without_policy(
+    tmp_path, garden_bots_system_target, bcleaner_service, bmulti_service
+):
+    """Test a composition file without policy."""
+    mdp = composition_sparse_mdp(
+        garden_bots_system_target, bcleaner_service, bmulti_service
+    )
+    path = tmp_path / "composition.bin"
+    save_composition(path, mdp)
+
+    loaded = load_composition(path)
+
+    assert loaded.policy is None
+    assert loaded.metadata == {}
+    assert loaded.mdp.to_dynamics() == mdp.to_dynamics()
+    # the policy must be the one of the saved MDP
+    with pytest.raises(ValueError, match="defined over the saved MDP"):
+        save_composition(path, mdp, solve(loaded.mdp))
+
+
+def test_load_composition_wrong_file(tmp_path):
+    """Test that loading a file with the wrong format fails."""
+    path = tmp_path / "composition.bin"
+    path.write_bytes(b"not a composition")
+    with pytest.raises(ValueError):
+        load_composition(path)
@@ -0,0 +1,152 @@
+"""This module contains the tests for the digital_twins/policy_atlas.py module."""
+import json
+
+import pytest
+
+from digital_twins.policy_atlas import (
+    PolicyAtlas,
+    build_policy_atlas,
+    degradation_levels,
+)
+from stochastic_service_composition.composition import COMPOSITION_MDP_INITIAL_STATE
+from stochastic_service_composition.services import (
+    Service,
+    build_service_from_transitions,
+)
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+@pytest.fixture()
+def breakable_machine(machine_factory):
+    """Get the factory of painting machines in the form expected by BreakableServiceWrapper."""
+
+    def _breakable_machine(broken_prob: float, action_reward: float) -> Service:
+        machine = machine_factory(
+            "painting", broken_prob, action_reward, check_action="check_painting"
+        )
+        # JSON round trip: the wrapper updates the transitions, as lists
+        return build_service_from_transitions(
+            json.loads(json.dumps(machine.transition_function)),
+            machine.initial_state,
+            machine.final_states,
+        )
+
+    return _breakable_machine
+
+
+@pytest.fixture()
+def painting_target():
+    """Get the target of a painting cell."""
+    return build_target_from_transitions(
+        {
+            "t0": {"painting": ("t1", 1.0, 0.0)},
+            "t1": {"check_painting": ("t0", 1.0, 1.0)},
+        },
+        "t0",
+        {"t0"},
+    )
+
+
+@pytest.fixture()
+def painting_services(breakable_machine):
+    """Get two painting machines, the second more reliable but more expensive."""
+    return [breakable_machine(0.05, -1.0), breakable_machine(0.0, -3.0)]
+
+
+def _degraded_services(services, levels, point):
+    """Get the services at a point of the lattice of degradation levels."""
+    return [
+        Service(
+            service.states,
+            service.actions,
+            service.final_states,
+            service.initial_state,
+            service_levels[level],
+        )
+        for service, service_levels, level in zip(services, levels, point)
+    ]
+
+
+def test_degradation_levels(painting_services, bcleaner_service):
+    """Test the transition functions at every degradation level."""
+    levels = degradation_levels(painting_services[0], max_level=3)
+    assert len(levels) == 4
+    assert levels[0] == painting_services[0].transition_function
+    broken_probs = [level["available"]["painting"][0]["broken"] for level in levels]
+    assert broken_probs == pytest.approx([0.05, 0.10, 0.15, 0.20])
+    rewards = [level["available"]["painting"][1] for level in levels]
+    assert rewards == pytest.approx([-1.0, -2.0, -3.0, -4.0])
+    # a service that is not breakable has only one level
+    assert degradation_levels(bcleaner_service) == [
+        bcleaner_service.transition_function
+    ]
+
+
+def test_policy_atlas(
+    tmp_path, painting_target, painting_services, breakable_machine
+):
+    """Test that the policy of the current degradation levels is the one of the composition."""
+    atlas = build_policy_atlas(
+        painting_target, *painting_services, max_level=3, max_workers=1
+    )
+    assert atlas.nb_points == 4 * 4
+    # the policy changes with the degradation of the cheaper machine
+    assert 1 < len(atlas.policies) < atlas.nb_points
+
+    for point in atlas.policy_ids:
+        services = _degraded_services(painting_services, atlas.levels, point)
+        transition_functions = [service.transition_function for service in services]
+        assert atlas.get_degradation_vector(transition_functions) == point
+        policy = atlas.get_policy(transition_functions)
+        mdp = composition_sparse_mdp(painting_target, *services)
+        expected_policy = solve(mdp)
+        for state in mdp.states:
+            if state == COMPOSITION_MDP_INITIAL_STATE:
+                continue
+            expected = expected_policy.get_action_for_state(state)
+            assert policy.get_action_for_state(state) == expected
+
+    # transition functions outside of the lattice are not in the atlas
+    outside = breakable_machine(0.5, -1.0).transition_function
+    transition_functions = [outside, painting_services[1].transition_function]
+    assert atlas.get_degradation_vector(transition_functions) is None
+    assert atlas.get_policy(transition_functions) is None
+
+    path = tmp_path / "atlas.pkl"
+    atlas.save(path)
+    loaded_atlas = PolicyAtlas.load(path)
+    assert loaded_atlas.policy_ids == atlas.policy_ids
+    assert loaded_atlas.levels == atlas.levels
+
+
+def test_sampled_policy_atlas(painting_target, painting_services):
+    """Test that a sampled atlas always includes the non-degraded point."""
+    atlas = build_policy_atlas(
+        painting_target,
+        *painting_services,
+        max_level=3,
+        nb_samples=5,
+        seed=0,
+        max_workers=1,
+    )
+    assert atlas.nb_points == 5
+    assert (0, 0) in atlas.policy_ids
+
+
+def test_policy_atlas_too_many_points(painting_target, painting_services):
+    """Test that a lattice with more points than the maximum is refused before solving."""
+    with pytest.raises(ValueError, match="set max_level or nb_samples"):
+        build_policy_atlas(
+            painting_target, *painting_services, max_level=3, max_points=15
+        )
+    atlas = build_policy_atlas(
+        painting_target,
+        *painting_services,
+        max_level=3,
+        nb_samples=3,
+        max_points=15,
+        max_workers=1,
+    )
+    assert atlas.nb_points == 3
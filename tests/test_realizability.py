@@ -0,0 +1,70 @@
+"""This module contains the tests for the realizability.py module."""
+from functools import partial
+
+import pytest
+
+from stochastic_service_composition.realizability import (
+    UnservableRequest,
+    find_unservable_request,
+    is_realizable,
+)
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+@pytest.fixture()
+def cutting_machine(machine_factory):
+    """Get the factory of cutting machines, that the target cannot repair."""
+    return partial(machine_factory, "cut", repair_action="repair")
+
+
+@pytest.fixture()
+def cutting_target():
+    """Get a target that cuts forever."""
+    return build_target_from_transitions(
+        {"t0": {"cut": ("t0", 1.0, 1.0)}}, "t0", {"t0"}
+    )
+
+
+def test_realizable(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the garden target is realizable."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    assert find_unservable_request(garden_bots_system_target, *services) is None
+    assert is_realizable(garden_bots_system_target, *services)
+
+
+def test_unservable_request(cutting_target, cutting_machine):
+    """Test the counterexample of a machine that can break."""
+    unservable_request = find_unservable_request(cutting_target, cutting_machine(0.1))
+    assert unservable_request == UnservableRequest(("broken",), "t0", "cut")
+    # a reliable machine can always be chosen instead
+    assert is_realizable(cutting_target, cutting_machine(0.1), cutting_machine(0.0))
+    # both machines can break, one after the other
+    assert not is_realizable(cutting_target, cutting_machine(0.1), cutting_machine(0.1))
+
+
+def test_unrealizable_home(
+    target_service,
+    bathroom_heating_device,
+    bathtub_device,
+    kitchen_door_device,
+    bathroom_door_device,
+    kitchen_exhaust_fan_device,
+    user_behaviour,
+):
+    """Test the counterexample of a community that cannot always serve the target."""
+    services = [
+        bathroom_heating_device,
+        bathtub_device,
+        kitchen_door_device,
+        bathroom_door_device,
+        kitchen_exhaust_fan_device,
+        user_behaviour,
+    ]
+    unservable_request = find_unservable_request(target_service, *services)
+    assert unservable_request is not None
+    assert not any(
+        unservable_request.action in service.transition_function[state]
+        for service, state in zip(services, unservable_request.system_state)
+    )
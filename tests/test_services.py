@@ -2,7 +2,12 @@
 from graphviz import Digraph
 
 from stochastic_service_composition.rendering import service_to_graphviz
-from stochastic_service_composition.services import Service, build_system_service
+from stochastic_service_composition.services import (
+    CapabilityIndex,
+    FactoredSystemService,
+    Service,
+    build_system_service,
+)
 
 
 class TestInitialization:
@@ -112,3 +117,40 @@ def test_rendering(all_services):
     current_service = all_services
     result = service_to_graphviz(current_service)
     assert isinstance(result, Digraph)
+
+
+def test_factored_system_service(bathtub_device, kitchen_exhaust_fan_device):
+    """Test that the factored system service has the same transitions of the product."""
+    services = [bathtub_device, kitchen_exhaust_fan_device]
+    system_service = build_system_service(*services)
+    factored_system_service = FactoredSystemService(services)
+
+    assert factored_system_service.initial_state == system_service.initial_state
+    assert factored_system_service.actions == system_service.actions
+    for state in system_service.states:
+        assert (
+            factored_system_service.transition_function[state]
+            == system_service.transition_function[state]
+        )
+        assert factored_system_service.is_final(state) == (
+            state in system_service.final_states
+        )
+    assert factored_system_service.successors(
+        ("empty", "unique"), ("fill_up_bathtub", 0)
+    ) == ({("filled", "unique"): 1.0}, 0.0)
+
+
+def test_capability_index(bcleaner_service, bmulti_service, bplucker_service):
+    """Test that the capability index finds the services that can perform an action."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    system_service = build_system_service(*services)
+    capabilities = CapabilityIndex.from_services(services)
+    from_system_service = CapabilityIndex.from_system_service(system_service)
+
+    assert capabilities.services_by_action["clean"] == (0, 2)
+    for state, transitions in system_service.transition_function.items():
+        for action in system_service.actions:
+            expected = sorted(i for a, i in transitions if a == action[0])
+            assert capabilities.candidates(state, action[0]) == expected
+            assert from_system_service.candidates(state, action[0]) == expected
+    assert capabilities.candidates(("a0", "b0", "c0"), "unknown") == []
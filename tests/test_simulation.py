@@ -0,0 +1,112 @@
+"""This module contains the tests for the simulation.py module."""
+from functools import partial
+
+import pytest
+
+from stochastic_service_composition.simulation import dominated_services, dominates
+from stochastic_service_composition.slicing import slice_community
+from stochastic_service_composition.solvers import solve
+from stochastic_service_composition.sparse import composition_sparse_mdp
+from stochastic_service_composition.target import build_target_from_transitions
+
+
+@pytest.fixture()
+def painting_machine(machine_factory):
+    """Get the factory of painting machines, that have to be checked after painting."""
+    return partial(machine_factory, "painting", check_action="check_painting")
+
+
+@pytest.fixture()
+def painting_target():
+    """Get the target of a painting cell."""
+    return build_target_from_transitions(
+        {
+            "t0": {"painting": ("t1", 1.0, 0.0)},
+            "t1": {"check_painting": ("t0", 1.0, 1.0)},
+        },
+        "t0",
+        {"t0"},
+    )
+
+
+def test_dominates(painting_machine):
+    """Test the domination between machines with different failure probabilities and rewards."""
+    actions = {"painting", "check_painting"}
+    reliable, unreliable = painting_machine(0.01, -1.0), painting_machine(0.05, -1.0)
+    assert dominates(reliable, unreliable, actions)
+    assert not dominates(unreliable, reliable, actions)
+    # cheaper but less reliable: neither dominates the other
+    cheap = painting_machine(0.05, -0.5)
+    assert not dominates(cheap, reliable, actions)
+    assert not dominates(reliable, cheap, actions)
+    # a machine that never breaks dominates regardless of the repair reward
+    assert dominates(painting_machine(0.0, -1.0, -100.0), reliable, actions)
+    # the actions outside of the considered ones are ignored
+    assert dominates(unreliable, reliable, {"check_painting"})
+
+
+def test_dominated_services(painting_machine):
+    """Test the dominated services of a community, with equivalent services."""
+    services = [
+        painting_machine(0.05, -1.0),
+        painting_machine(0.01, -1.0),
+        painting_machine(0.05, -0.5),
+        painting_machine(0.01, -1.0),
+    ]
+    actions = {"painting", "check_painting"}
+    assert dominated_services(services, actions) == {0: 1, 3: 1}
+
+
+def test_pruned_composition(painting_target, painting_machine):
+    """Test that the pruned composition is smaller, and a lower bound of the composition."""
+    services = [
+        painting_machine(0.05, -1.0),
+        painting_machine(0.01, -1.0),
+        painting_machine(0.05, -0.5),
+        painting_machine(0.01, -1.0),
+    ]
+    community = slice_community(
+        painting_target.actions, services, prune_dominated=True
+    )
+    assert community.service_ids == [1, 2]
+    assert community.spares == {0: 1, 3: 1}
+
+    mdp = composition_sparse_mdp(painting_target, *services)
+    pruned_mdp = composition_sparse_mdp(painting_target, *services, pruned=True)
+    assert pruned_mdp.nb_states < mdp.nb_states
+    assert set(pruned_mdp.states).issubset(mdp.states)
+
+    policy = solve(mdp, tol=1e-10)
+    pruned_policy = solve(pruned_mdp, tol=1e-10)
+    for state in pruned_mdp.states:
+        assert pruned_policy.get_action_for_state(state) not in community.spares
+        value = policy.get_value_for_state(state)
+        assert pruned_policy.get_value_for_state(state) <= value + 1e-8
+
+
+def test_swap_spares(painting_target, painting_machine):
+    """Test that a failed dominating service is replaced by its spares."""
+    services = [
+        painting_machine(0.05, -1.0),
+        painting_machine(0.01, -1.0),
+        painting_machine(0.05, -0.5),
+    ]
+    community = slice_community(
+        painting_target.actions, services, prune_dominated=True
+    )
+    assert community.spares == {0: 1}
+    with pytest.raises(ValueError, match="no spares"):
+        community.swap_spares(2)
+
+    swapped_community = community.swap_spares(1)
+    assert swapped_community.service_ids == [0, 2]
+    assert swapped_community.spares == {}
+    mdp = composition_sparse_mdp(
+        painting_target, *services, community=swapped_community
+    )
+    expected_mdp = composition_sparse_mdp(
+        painting_target, services[0], services[2], sliced=True
+    )
+    assert mdp.nb_states == expected_mdp.nb_states
+    policy = solve(mdp)
+    assert 1 not in set(policy.get_state_to_action_map().values())
@@ -0,0 +1,86 @@
+"""This module contains the tests for the slicing.py module."""
+import pytest
+
+from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.services import build_service_from_transitions
+from stochastic_service_composition.slicing import slice_community, slice_service
+from stochastic_service_composition.sparse import composition_sparse_mdp
+
+
+@pytest.fixture()
+def catalog_service():
+    """Get a generic service, with a large repertoire of actions unused by the garden target."""
+    transition_function = {
+        f"q{i}": {f"x{j}": ({f"q{(i + j) % 10}": 1.0}, -1.0) for j in range(1, 4)}
+        for i in range(10)
+    }
+    transition_function["q0"]["clean"] = ({"q0": 0.5, "q1": 0.5}, -2.0)
+    return build_service_from_transitions(transition_function, "q0", {"q0"})
+
+
+@pytest.fixture()
+def unused_service():
+    """Get a service that can clean only after an action unused by the garden target."""
+    return build_service_from_transitions(
+        {"z0": {"x1": ({"z1": 1.0}, 0.0)}, "z1": {"clean": ({"z0": 1.0}, 0.0)}},
+        "z0",
+        {"z0"},
+    )
+
+
+def test_slice_service(catalog_service):
+    """Test that a service is restricted to the actions and the states reachable with them."""
+    sliced_service = slice_service(catalog_service, {"clean", "water"})
+    assert sliced_service.actions == {"clean"}
+    assert sliced_service.states == {"q0", "q1"}
+    assert sliced_service.transition_function == {
+        "q0": {"clean": ({"q0": 0.5, "q1": 0.5}, -2.0)},
+        "q1": {},
+    }
+
+
+@pytest.mark.parametrize("factored", [False, True])
+def test_sliced_composition(
+    factored,
+    garden_bots_system_target,
+    bcleaner_service,
+    bmulti_service,
+    bplucker_service,
+    catalog_service,
+    unused_service,
+):
+    """Test that the composition of the sliced community is the same of the community."""
+    services = [
+        bcleaner_service,
+        unused_service,
+        bmulti_service,
+        catalog_service,
+        bplucker_service,
+    ]
+    community = slice_community(garden_bots_system_target.actions, services)
+    assert community.service_ids == [0, 2, 3, 4]
+    assert community.lift_action(1) == 2
+    assert community.lift_system_state(("a0", "b0", "q1", "c0")) == (
+        "a0",
+        "z0",
+        "b0",
+        "q1",
+        "c0",
+    )
+
+    expected = composition_mdp(garden_bots_system_target, *services, factored=True)
+    actual = composition_mdp(
+        garden_bots_system_target, *services, factored=factored, sliced=True
+    )
+    assert list(actual.transitions) == list(expected.transitions)
+    assert actual.transitions == expected.transitions
+    assert actual.rewards == expected.rewards
+
+    expected_sparse = composition_sparse_mdp(
+        garden_bots_system_target, *services, factored=True
+    )
+    actual_sparse = composition_sparse_mdp(
+        garden_bots_system_target, *services, factored=factored, sliced=True
+    )
+    assert actual_sparse.states == expected_sparse.states
+    assert actual_sparse.to_dynamics() == expected_sparse.to_dynamics()
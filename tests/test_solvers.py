@@ -0,0 +1,218 @@
+"""This module contains the tests for the solvers.py module."""
+import numpy as np
+import pytest
+
+from stochastic_service_composition.composition import composition_mdp
+from stochastic_service_composition.incremental import update_composition
+from stochastic_service_composition.solvers import (
+    GAUSS_SEIDEL,
+    MODIFIED_POLICY_ITERATION,
+    PRIORITIZED_SWEEPING,
+    TOPOLOGICAL_VALUE_ITERATION,
+    VALUE_ITERATION,
+    _strongly_connected_components,
+    evaluate_policy,
+    prioritized_sweeping,
+    solve,
+    solve_variants,
+    value_iteration,
+)
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
+
+
+@pytest.fixture()
+def garden_bots_system_mdp(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+) -> SparseMDP:
+    """Get the sparse composition MDP of the garden bots system."""
+    return composition_sparse_mdp(
+        garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+    )
+
+
+@pytest.mark.parametrize(
+    "method",
+    [
+        VALUE_ITERATION,
+        GAUSS_SEIDEL,
+        MODIFIED_POLICY_ITERATION,
+        PRIORITIZED_SWEEPING,
+        TOPOLOGICAL_VALUE_ITERATION,
+    ],
+)
+def test_solvers_agree(garden_bots_system_mdp, method):
+    """Test that all the solvers converge to the same value function."""
+    expected = solve(garden_bots_system_mdp, tol=1e-10)
+    actual = solve(garden_bots_system_mdp, method=method, tol=1e-10)
+    assert np.allclose(actual.values, expected.values, atol=1e-8)
+
+    # the chosen actions are optimal, i.e. they attain the optimal value
+    mdp = garden_bots_system_mdp.to_mdp()
+    for state in mdp.all_states:
+        action = actual.get_action_for_state(state)
+        q_value = mdp.rewards[state][action] + mdp.gamma * sum(
+            prob * expected.get_value_for_state(next_state)
+            for next_state, prob in mdp.transitions[state][action].items()
+        )
+        assert q_value == pytest.approx(expected.get_value_for_state(state), abs=1e-6)
+
+def test_solve_mdp(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the solver accepts mdp_dp_rl MDPs and the policy covers all states."""
+    mdp = composition_mdp(
+        garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+    )
+    policy = solve(mdp)
+    assert set(policy.policy_data.keys()) == mdp.all_states
+    for state, action_probs in policy.policy_data.items():
+        assert list(action_probs.values()) == [1.0]
+        assert policy.get_action_for_state(state) in mdp.state_action_dict[state]
+
+
+def test_solve_unknown_method(garden_bots_system_mdp):
+    """Test that an unknown solver raises an error."""
+    with pytest.raises(ValueError, match="method 'foo' not supported"):
+        solve(garden_bots_system_mdp, method="foo")
+
+
+@pytest.mark.parametrize("method", [VALUE_ITERATION, PRIORITIZED_SWEEPING])
+def test_warm_start_after_update(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service, method
+):
+    """Test that warm-started solvers converge after an incremental update."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    mdp = composition_sparse_mdp(garden_bots_system_target, *services)
+    old_policy = solve(mdp, tol=1e-10)
+    new_transition_function = {
+        "a0": {"clean": ({"a1": 0.9, "broken": 0.1}, -1.0)},
+        "a1": {"empty": ({"a0": 1.0}, 0.0)},
+        "broken": {},
+    }
+    new_mdp, touched_states = update_composition(
+        mdp, garden_bots_system_target, services, 0, new_transition_function
+    )
+
+    expected = solve(new_mdp, tol=1e-10)
+    actual = solve(
+        new_mdp,
+        method=method,
+        tol=1e-10,
+        initial_policy=old_policy,
+        **({"changed_states": touched_states} if method == PRIORITIZED_SWEEPING else {}),
+    )
+    assert np.allclose(actual.values, expected.values, atol=1e-8)
+
+
+def test_too_many_initial_values(garden_bots_system_mdp):
+    """Test that warm-starting with more values than states raises an error."""
+    with pytest.raises(ValueError, match="expected at most"):
+        solve(
+            garden_bots_system_mdp,
+            initial_values=np.zeros(garden_bots_system_mdp.nb_states + 1),
+        )
+
+
+def test_strongly_connected_components(garden_bots_system_mdp):
+    """Test that the components are numbered in reverse topological order."""
+    mdp = garden_bots_system_mdp
+    components, nb_components = _strongly_connected_components(mdp)
+    assert set(components.tolist()) == set(range(nb_components))
+
+    sources = components[mdp.pair_states[mdp.transition_pairs]]
+    targets = components[mdp.next_states]
+    assert np.all(targets <= sources)
+    # the initial state is transient, the sink state is a component by itself
+    assert np.sum(components == components[mdp.states.index(0)]) == 1
+    assert components[mdp.states.index(0)] == nb_components - 1
+
+
+def test_prioritized_sweeping_max_iterations(garden_bots_system_mdp):
+    """Test that the maximum number of iterations of prioritized sweeping counts sweeps, not backups."""
+    expected = solve(garden_bots_system_mdp, tol=1e-10)
+    # value iteration converges within 200 sweeps, and so does prioritized sweeping
+    swept = value_iteration(garden_bots_system_mdp, tol=1e-10, max_iterations=200)
+    assert np.allclose(swept.values, expected.values, atol=1e-6)
+    actual = prioritized_sweeping(
+        garden_bots_system_mdp, tol=1e-10, max_iterations=200
+    )
+    assert np.allclose(actual.values, expected.values, atol=1e-6)
+    # a single sweep backs up every state at most once
+    single_sweep = prioritized_sweeping(
+        garden_bots_system_mdp, tol=1e-10, max_iterations=1
+    )
+    assert not np.allclose(single_sweep.values, expected.values, atol=1e-6)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_topological_value_iteration_threads(garden_bots_system_mdp, max_workers):
+    """Test that solving independent components concurrently gives the same solution."""
+    expected = solve(garden_bots_system_mdp, tol=1e-10)
+    actual = solve(
+        garden_bots_system_mdp,
+        method=TOPOLOGICAL_VALUE_ITERATION,
+        tol=1e-10,
+        max_workers=max_workers,
+    )
+    assert np.allclose(actual.values, expected.values, atol=1e-8)
+    assert actual.policy_data == expected.policy_data
+
+
+@pytest.mark.parametrize("max_direct_states", [0, 1_000_000])
+def test_evaluate_policy(garden_bots_system_mdp, max_direct_states):
+    """Test that the evaluation of the optimal policy gives the optimal values."""
+    optimal = solve(garden_bots_system_mdp, tol=1e-12)
+
+    actual = evaluate_policy(
+        garden_bots_system_mdp, optimal, tol=1e-12, max_direct_states=max_direct_states
+    )
+    assert np.allclose(actual.values, optimal.values, atol=1e-8)
+    assert np.array_equal(actual.pair_ids, optimal.pair_ids)
+
+    # the policy can also be given as a mapping from states to actions
+    state_to_action = optimal.get_state_to_action_map()
+    from_mapping = evaluate_policy(garden_bots_system_mdp.to_mdp(), state_to_action)
+    assert np.allclose(from_mapping.values, optimal.values, atol=1e-8)
+
+
+def test_evaluate_suboptimal_policy(garden_bots_system_mdp):
+    """Test that a suboptimal policy has lower values than the optimal one."""
+    mdp = garden_bots_system_mdp
+    optimal = solve(mdp, tol=1e-12)
+    # choose the first available action of every state
+    first_actions = {
+        state: mdp.actions[mdp.pair_actions[mdp.state_ptr[state_id]]]
+        for state_id, state in enumerate(mdp.states)
+    }
+    values = evaluate_policy(mdp, first_actions).values
+    assert np.all(values <= optimal.values + 1e-8)
+    assert np.any(values < optimal.values - 1e-6)
+
+    del first_actions[mdp.states[-1]]
+    with pytest.raises(ValueError, match="does not choose any action"):
+        evaluate_policy(mdp, first_actions)
+
+
+def test_solve_variants(garden_bots_system_mdp):
+    """Test that every variant has the same solution as if solved alone."""
+    mdp = garden_bots_system_mdp
+    gammas = [0.5, 0.9, 0.99]
+    scaled_rewards = np.where(mdp.rewards < 0, 2.0 * mdp.rewards, mdp.rewards)
+
+    policies = solve_variants(mdp, gammas=gammas, tol=1e-10)
+    assert len(policies) == len(gammas)
+    for gamma, policy in zip(gammas, policies):
+        expected = solve(mdp.with_rewards(gamma=gamma), tol=1e-10)
+        assert policy.mdp.gamma == gamma
+        assert np.allclose(policy.values, expected.values, atol=1e-8)
+        assert np.array_equal(policy.pair_ids, expected.pair_ids)
+
+    policies = solve_variants(
+        mdp, gammas=[0.8, 0.9], rewards=[mdp.rewards, scaled_rewards], tol=1e-10
+    )
+    expected = solve(mdp.with_rewards(scaled_rewards, 0.9), tol=1e-10)
+    assert np.allclose(policies[1].values, expected.values, atol=1e-8)
+    assert np.array_equal(policies[1].pair_ids, expected.pair_ids)
+
+    with pytest.raises(ValueError):
+        solve_variants(mdp, gammas=[0.8, 0.9], rewards=[mdp.rewards] * 3)
@@ -0,0 +1,61 @@
+"""This module contains the tests for the sparse.py module."""
+import numpy as np
+from mdp_dp_rl.processes.mdp import MDP
+
+from stochastic_service_composition.composition import (
+    COMPOSITION_MDP_INITIAL_STATE,
+    composition_mdp,
+)
+from stochastic_service_composition.sparse import SparseMDP, composition_sparse_mdp
+
+
+def test_composition_sparse_mdp(
+    garden_bots_system_target, bcleaner_service, bmulti_service, bplucker_service
+):
+    """Test that the sparse composition is equivalent to the dictionary-based one."""
+    services = [bcleaner_service, bmulti_service, bplucker_service]
+    expected = composition_mdp(garden_bots_system_target, *services)
+    sparse_mdp = composition_sparse_mdp(garden_bots_system_target, *services)
+
+    assert sparse_mdp.nb_states == len(expected.all_states)
+    assert sparse_mdp.get_state_id(COMPOSITION_MDP_INITIAL_STATE) == 0
+    assert sparse_mdp.actions[:3] == [0, 1, 2]
+    assert sparse_mdp.state_ptr[-1] == sparse_mdp.nb_pairs
+    assert sparse_mdp.pair_ptr[-1] == sparse_mdp.nb_transitions
+
+    actual = sparse_mdp.to_mdp()
+    assert isinstance(actual, MDP)
+    assert actual.transitions == expected.transitions
+    assert actual.rewards == expected.rewards
+
+
+def test_from_dynamics_unordered_states():
+    """Test that pairs are grouped by state, whatever the order of the input."""
+    dynamics = [
+        ("s1", {"b": ({"s0": 1.0}, 2.0)}),
+        ("s0", {"a": ({"s1": 0.5, "s0": 0.5}, 1.0), "b": ({"s0": 1.0}, 0.0)}),
+    ]
+    sparse_mdp = SparseMDP.from_dynamics(dynamics, gamma=0.5)
+
+    assert sparse_mdp.states == ["s1", "s0"]
+    assert sparse_mdp.actions == ["b", "a"]
+    assert np.array_equal(sparse_mdp.state_ptr, [0, 1, 3])
+    assert np.array_equal(sparse_mdp.pair_states, [0, 1, 1])
+    assert np.array_equal(sparse_mdp.rewards, [2.0, 1.0, 0.0])
+    assert sparse_mdp.to_dynamics() == dict(dynamics)
+
+
+def test_from_dynamics_states_discovered_out_of_order():
+    """Test that pairs are sorted by state id, when states are expanded after their discovery."""
+    dynamics = [
+        ("s0", {"a": ({"s1": 0.5, "s2": 0.5}, 1.0)}),
+        ("s2", {"a": ({"s0": 1.0}, 3.0), "b": ({"s1": 0.2, "s2": 0.8}, 4.0)}),
+        ("s1", {"b": ({"s0": 1.0}, 2.0)}),
+    ]
+    sparse_mdp = SparseMDP.from_dynamics(dynamics, gamma=0.5)
+
+    assert sparse_mdp.states == ["s0", "s1", "s2"]
+    assert np.array_equal(sparse_mdp.state_ptr, [0, 1, 2, 4])
+    assert np.array_equal(sparse_mdp.rewards, [1.0, 2.0, 3.0, 4.0])
+    assert np.array_equal(sparse_mdp.pair_ptr, [0, 2, 3, 4, 6])
+    assert sparse_mdp.to_dynamics() == dict(dynamics)